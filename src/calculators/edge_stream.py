@@ -0,0 +1,208 @@
+import hashlib
+import itertools
+import os
+import fiona
+import geopandas as gpd
+import numpy as np
+import shapely
+from pyproj import CRS, Transformer
+from shapely.geometry import mapping
+from src.calculators.shared_edges import SharedEdges, ARRAY_NAMES, DEFAULT_CHUNK_SIZE, LINESTRING, MULTILINESTRING
+from src.calculators.tile_graph import OSW_ENDPOINT_COLUMNS
+
+# GeoJSON coordinates are WGS84 by definition
+DEFAULT_CRS = 'epsg:4326'
+NUMERIC_FIELD_TYPES = ('int', 'int32', 'int64', 'float')
+
+
+class _ArrayWriter:
+    """
+    Appends chunks of an array to a spill file and turns it into a `.npy` file at the end.
+    """
+
+    def __init__(self, directory, name, dtype, width=None):
+        self.path = os.path.join(directory, f'{name}.npy')
+        self.spill_path = os.path.join(directory, f'{name}.part')
+        self.dtype = np.dtype(dtype)
+        self.width = width
+        self.length = 0
+        self._file = open(self.spill_path, 'wb')
+
+    def write(self, chunk):
+        chunk = np.ascontiguousarray(chunk, dtype=self.dtype)
+        self._file.write(chunk.tobytes())
+        self.length += len(chunk)
+
+    def close(self):
+        self._file.close()
+        shape = (self.length,) if self.width is None else (self.length, self.width)
+        header = {'descr': np.lib.format.dtype_to_descr(self.dtype), 'fortran_order': False, 'shape': shape}
+        with open(self.path, 'wb') as array_file, open(self.spill_path, 'rb') as spill_file:
+            np.lib.format.write_array_header_1_0(array_file, header)
+            while True:
+                block = spill_file.read(1 << 24)
+                if not block:
+                    break
+                array_file.write(block)
+        os.remove(self.spill_path)
+
+
+def _id_hashes(value):
+    """
+    Hashes an id to its 53 bit code and an independent 64 bit check.
+    """
+    digest = hashlib.blake2b(str(value).encode(), digest_size=16).digest()
+    return int.from_bytes(digest[:8], 'little') >> 11, int.from_bytes(digest[8:], 'little')
+
+
+def id_code(value):
+    """
+    Maps an id to a float that is equal for equal ids, without a table of all ids.
+
+    The code is a 53 bit hash, so it is exact in float64. Two different ids of a dataset
+    with a million nodes share a code with a probability of about 1e-4, `stream_edges`
+    detects that with the check hash of the ids.
+
+    Args:
+        value: The id.
+
+    Returns:
+        float: The code.
+    """
+    return float(_id_hashes(value)[0])
+
+
+def check_id_codes(path):
+    """
+    Checks that no two different ids share a code.
+
+    Args:
+        path (str): `.npy` file of the (code, check) pairs of the ids, see `_id_hashes`.
+
+    Raises:
+        ValueError: If a code belongs to ids with different checks.
+    """
+    pairs = np.unique(np.load(path), axis=0)
+    collisions = int((pairs[1:, 0] == pairs[:-1, 0]).sum())
+    if collisions:
+        raise ValueError(f'{collisions + 1} different ids share a code when streaming the edges, read them into memory instead')
+
+
+def stream_edges(file_path, directory, crs, columns=None, osw_endpoints=False, chunk_size=DEFAULT_CHUNK_SIZE, bbox=None, mask=None):
+    """
+    Streams the OSW edges of a file into `SharedEdges` arrays, projecting them chunk by chunk.
+
+    Only `chunk_size` features are held in memory at a time, the arrays are written to spill
+    files under `directory` and the workers map them like the ones of `SharedEdges.from_gdf`.
+    Numeric columns are stored as float64, the others (e.g. `_u_id`/`_v_id`) by `id_code`.
+    Geometries other than lines are not scored, they are stored as missing.
+
+    Raises:
+        ValueError: If two different ids of the non-numeric columns share a code, which would join distinct nodes.
+
+    Args:
+        file_path (str): Path to the edges file.
+        directory (str): Existing directory the arrays are written to. It must outlive every reader.
+        crs: The CRS the edges are projected to.
+        columns (list, optional): Attribute columns to keep, missing ones are left out. Defaults to None.
+        osw_endpoints (bool, optional): Also store the `OSW_ENDPOINT_COLUMNS` of the osw topology, when `_u_id` and `_v_id` are kept. Defaults to False.
+        chunk_size (int, optional): Number of features parsed and projected at a time. Defaults to DEFAULT_CHUNK_SIZE.
+        bbox (tuple, optional): Only read the edges intersecting this (minx, miny, maxx, maxy), in the CRS of the file. Defaults to None.
+        mask (Polygon, optional): Only read the edges intersecting this geometry, in the CRS of the file. Defaults to None.
+
+    Returns:
+        tuple: (edges, hull) with the `SharedEdges` and a GeoSeries of the convex hull of the lines, in the CRS of the file.
+    """
+    with fiona.open(file_path) as source:
+        fields = source.schema['properties']
+        columns = [column for column in (columns or []) if column in fields]
+        numeric = [fields[column].split(':')[0] in NUMERIC_FIELD_TYPES for column in columns]
+        source_crs = CRS.from_user_input(source.crs_wkt or DEFAULT_CRS)
+        transformer = Transformer.from_crs(source_crs, crs, always_xy=True)
+        endpoints = osw_endpoints and {'_u_id', '_v_id'}.issubset(columns)
+        column_names = columns + (OSW_ENDPOINT_COLUMNS if endpoints else [])
+        writers = {
+            'type_ids': _ArrayWriter(directory, 'type_ids', np.int8),
+            'geom_offsets': _ArrayWriter(directory, 'geom_offsets', np.int64),
+            'part_offsets': _ArrayWriter(directory, 'part_offsets', np.int64),
+            'coords': _ArrayWriter(directory, 'coords', np.float64, 2),
+            'columns': _ArrayWriter(directory, 'columns', np.float64, len(column_names)),
+        }
+        # (code, check) of the ids, spilled like the arrays and only kept until they are checked
+        id_writer = None if all(numeric) else _ArrayWriter(directory, 'id_hashes', np.uint64, 2)
+        writers['geom_offsets'].write([0])
+        writers['part_offsets'].write([0])
+        total_parts, total_coords = 0, 0
+        hulls = []
+
+        features = iter(source.filter(bbox=bbox, mask=None if mask is None else mapping(mask)))
+        while True:
+            # only the coordinates and values of a chunk are buffered, not the parsed features
+            type_ids, parts_per_geom, coords_per_part, coords, rows, id_hashes = [], [], [], [], [], []
+            for feature in itertools.islice(features, chunk_size):
+                properties = feature['properties']
+                row = [np.nan] * len(column_names)
+                for column_position, (column, is_numeric) in enumerate(zip(columns, numeric)):
+                    value = properties[column]
+                    if value is None:
+                        continue
+                    if is_numeric:
+                        row[column_position] = value
+                    else:
+                        code, check = _id_hashes(value)
+                        row[column_position] = float(code)
+                        id_hashes.append((code, check))
+                rows.append(row)
+                geometry = feature['geometry']
+                n_parts = 0
+                if geometry is not None and geometry['type'] in ('LineString', 'MultiLineString'):
+                    lines = [geometry['coordinates']] if geometry['type'] == 'LineString' else geometry['coordinates']
+                    type_ids.append(LINESTRING if geometry['type'] == 'LineString' else MULTILINESTRING)
+                    for line in lines:
+                        if line:
+                            coords.extend(point[:2] for point in line)
+                            coords_per_part.append(len(line))
+                            n_parts += 1
+                else:
+                    type_ids.append(-1)
+                parts_per_geom.append(n_parts)
+            if not rows:
+                break
+            type_ids = np.asarray(type_ids, dtype=np.int8)
+            parts_per_geom = np.asarray(parts_per_geom, dtype=np.int64)
+            values = np.asarray(rows, dtype=float).reshape(len(rows), len(column_names))
+
+            source_coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+            if len(source_coords):
+                hulls.append(shapely.convex_hull(shapely.multipoints(source_coords)))
+            x, y = transformer.transform(source_coords[:, 0], source_coords[:, 1])
+            projected = np.column_stack([x, y])
+            coords_per_part = np.asarray(coords_per_part, dtype=np.int64)
+            if endpoints:
+                # the first and last coordinates of the part of every non-empty LineString
+                part_ends = np.cumsum(coords_per_part)
+                is_line = (type_ids == LINESTRING) & (parts_per_geom == 1)
+                parts = (np.cumsum(parts_per_geom) - 1)[is_line]
+                values[is_line, len(columns):len(columns) + 2] = projected[part_ends[parts] - coords_per_part[parts]]
+                values[is_line, len(columns) + 2:] = projected[part_ends[parts] - 1]
+
+            writers['type_ids'].write(type_ids)
+            writers['geom_offsets'].write(total_parts + np.cumsum(parts_per_geom))
+            writers['part_offsets'].write(total_coords + np.cumsum(coords_per_part))
+            writers['coords'].write(projected)
+            writers['columns'].write(values)
+            if id_writer is not None and id_hashes:
+                id_writer.write(np.unique(np.asarray(id_hashes, dtype=np.uint64), axis=0))
+            total_parts += len(coords_per_part)
+            total_coords += len(projected)
+
+    for name in ARRAY_NAMES:
+        writers[name].close()
+    if id_writer is not None:
+        id_writer.close()
+        try:
+            check_id_codes(id_writer.path)
+        finally:
+            os.remove(id_writer.path)
+    hull = shapely.convex_hull(shapely.geometrycollections(hulls)) if hulls else shapely.Polygon()
+    return SharedEdges(directory, CRS.from_user_input(crs), column_names), gpd.GeoSeries([hull], crs=source_crs)
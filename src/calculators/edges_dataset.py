@@ -0,0 +1,123 @@
+import threading
+from src.calculators.feature_reader import read_features
+from src.calculators.edge_stream import stream_edges
+from src.calculators.shared_edges import DEFAULT_CHUNK_SIZE
+
+# GeoJSON coordinates are WGS84 by definition
+DEFAULT_CRS = 'epsg:4326'
+
+
+class EdgesDataset:
+    """
+    The OSW edges of a job, read and validated once and shared by every calculator of the job.
+
+    Projections are made on first use and kept, so calculators working in the same
+    projection share one projected frame and its spatial index. The frame in the CRS of
+    the file is dropped once the projection of every calculator is made, unless one of
+    them works in the CRS of the file. Calculators running
+    concurrently wait for each other instead of reading the file twice. The frames are
+    shared, calculators must not modify them in place.
+
+    Calculators declare the columns they need with `require` before reading, and only
+    the union of them is read from the file.
+    """
+
+    def __init__(self, file_path:str, bbox=None, mask=None):
+        """
+        Initializes the EdgesDataset class.
+
+        Args:
+            file_path (str): Path to the file containing the OSW edge data.
+            bbox (tuple, optional): Only read the edges intersecting this (minx, miny, maxx, maxy). Defaults to None.
+            mask (Polygon, optional): Only read the edges intersecting this geometry. Defaults to None.
+        """
+        self.file_path = file_path
+        self.bbox = bbox
+        self.mask = mask
+        self._requirements = []
+        self._crs_requirements = set()
+        self._gdf = None
+        self._projected = {}
+        self._lock = threading.RLock()
+
+    @property
+    def columns(self):
+        """
+        The columns read from the file, None for all of them.
+        """
+        if not self._requirements or None in self._requirements:
+            return None
+        return sorted(set().union(*self._requirements))
+
+    def require(self, columns, crs=None):
+        """
+        Adds the columns a calculator needs. Frames read without them are dropped.
+
+        Args:
+            columns (list): Attribute columns, None for all of them.
+            crs (optional): The CRS the calculator works in. Defaults to None, the CRS of the file.
+        """
+        with self._lock:
+            before = self.columns
+            self._requirements.append(None if columns is None else set(columns))
+            self._crs_requirements.add(crs)
+            if self.columns != before:
+                self.release()
+
+    def read(self):
+        """
+        Returns the edges in the CRS of the file, reading them on the first call.
+
+        Returns:
+            gpd.GeoDataFrame: The edges. A file without CRS is taken to be in WGS84.
+        """
+        with self._lock:
+            if self._gdf is None:
+                gdf = read_features(self.file_path, self.columns, self.bbox, self.mask)
+                if gdf.crs is None:
+                    gdf = gdf.set_crs(DEFAULT_CRS)
+                self._gdf = gdf
+            return self._gdf
+
+    def projected(self, crs):
+        """
+        Returns the edges in `crs`, projecting them on the first call.
+
+        The edges in the CRS of the file are dropped once no calculator needs them any more.
+
+        Args:
+            crs: The target CRS.
+
+        Returns:
+            gpd.GeoDataFrame: The projected edges.
+        """
+        with self._lock:
+            if crs not in self._projected:
+                self._projected[crs] = self.read().to_crs(crs)
+                if all(required in self._projected for required in self._crs_requirements):
+                    self._gdf = None
+            return self._projected[crs]
+
+    def stream(self, directory, crs, columns=None, osw_endpoints=False, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Streams the edges to memory-mapped arrays under `directory` without reading them into memory.
+
+        Args:
+            directory (str): Existing directory the arrays are written to.
+            crs: The CRS the edges are projected to.
+            columns (list, optional): Attribute columns to keep. Defaults to None.
+            osw_endpoints (bool, optional): Also store the endpoints the osw topology needs. Defaults to False.
+            chunk_size (int, optional): Number of features held in memory at a time. Defaults to DEFAULT_CHUNK_SIZE.
+
+        Returns:
+            tuple: (edges, hull) with the `SharedEdges` and a GeoSeries of their convex hull, see `stream_edges`.
+        """
+        return stream_edges(self.file_path, directory, crs, columns, osw_endpoints, chunk_size, self.bbox, self.mask)
+
+    def release(self):
+        """
+        Drops the frames, the next call reads the file again.
+        """
+        with self._lock:
+            self._gdf = None
+            self._projected = {}
@@ -0,0 +1,76 @@
+import fiona
+import geopandas as gpd
+import numpy as np
+import shapely
+from shapely.geometry import mapping, shape
+
+try:
+    import pyogrio
+except ImportError:
+    pyogrio = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+def read_features(file_path, columns=None, bbox=None, mask=None):
+    """
+    Reads the features of a vector file with only the attribute columns that are needed.
+
+    With pyogrio installed the columns are selected by GDAL (through Arrow when pyarrow is
+    installed too). Otherwise the features are streamed through fiona and only `columns`
+    are kept, since drivers like GeoJSON cannot skip fields.
+
+    Args:
+        file_path (str): Path to the file.
+        columns (list, optional): Attribute columns to read, missing ones are left out. Defaults to None (all columns).
+        bbox (tuple, optional): (minx, miny, maxx, maxy) the features must intersect, in the CRS of the file. Defaults to None.
+        mask (Polygon, optional): Geometry the features must intersect, in the CRS of the file. Defaults to None.
+
+    Returns:
+        gpd.GeoDataFrame: The features, in file order.
+    """
+    filters = {key: value for key, value in (('bbox', bbox), ('mask', mask)) if value is not None}
+    if pyogrio is not None and mask is None:
+        kwargs = {'use_arrow': True} if pyarrow is not None else {}
+        if columns is not None:
+            kwargs['columns'] = list(columns)
+        return gpd.read_file(file_path, engine='pyogrio', **filters, **kwargs)
+    if columns is None:
+        return gpd.read_file(file_path, **filters)
+    return _stream_features(file_path, columns, bbox, mask)
+
+
+def _stream_features(file_path, columns, bbox=None, mask=None):
+    with fiona.open(file_path) as source:
+        columns = [column for column in columns if column in source.schema['properties']]
+        features = source.filter(bbox=bbox, mask=None if mask is None else mapping(mask))
+        values = {column: [] for column in columns}
+        coords, counts, others = [], [], {}
+        for position, feature in enumerate(features):
+            properties = feature['properties']
+            for column in columns:
+                values[column].append(properties[column])
+            geometry = feature['geometry']
+            line = geometry['coordinates'] if geometry is not None and geometry['type'] == 'LineString' else None
+            if line and len(line[0]) == 2:
+                # 2D LineStrings, almost all OSW edges, are built in one go below
+                coords.extend(line)
+                counts.append(len(line))
+            else:
+                counts.append(0)
+                others[position] = None if geometry is None else shape(geometry)
+        crs = source.crs_wkt or None
+
+    counts = np.asarray(counts, dtype=np.int64)
+    is_line = counts > 0
+    geoms = np.empty(len(counts), dtype=object)
+    geoms[is_line] = shapely.linestrings(
+        np.asarray(coords, dtype=float).reshape(-1, 2),
+        indices=np.repeat(np.arange(is_line.sum()), counts[is_line]),
+    )
+    for position, geometry in others.items():
+        geoms[position] = geometry
+    return gpd.GeoDataFrame(values, geometry=geoms, crs=crs)
@@ -0,0 +1,98 @@
+import logging
+import threading
+import zipfile
+from src.calculators.output_formats import write_output, DEFAULT_OUTPUT_FORMAT
+
+logger = logging.getLogger("OutputArchive")
+logger.setLevel(logging.INFO)
+
+# zipfile method of every compression, zstd needs Python 3.14
+ZIP_METHODS = {
+    'stored': zipfile.ZIP_STORED,
+    'deflate': zipfile.ZIP_DEFLATED,
+    'zstd': getattr(zipfile, 'ZIP_ZSTANDARD', None),
+}
+DEFAULT_COMPRESSION = 'deflate'
+DEFAULT_COMPRESSION_LEVEL = 6
+
+
+class OutputArchive:
+    """
+    The output zip of a job, the calculators write their results straight into compressed entries of it.
+
+    A zip file has a single write handle, so calculators finishing at the same time write
+    their entries one after the other.
+    """
+    COMPRESSIONS = tuple(ZIP_METHODS)
+
+    def __init__(self, file_path:str, compression:str=DEFAULT_COMPRESSION, compression_level:int=DEFAULT_COMPRESSION_LEVEL):
+        """
+        Initializes the OutputArchive class and creates the zip file.
+
+        Args:
+            file_path (str): Path to the zip file.
+            compression (str, optional): Compression of the entries, one of `COMPRESSIONS`. 'zstd' falls back to 'deflate' where zipfile does not support it. Defaults to 'deflate'.
+            compression_level (int, optional): Level of the compression, 0 to 9 for deflate and 1 to 22 for zstd. None for the default of the compression. Defaults to DEFAULT_COMPRESSION_LEVEL.
+
+        Raises:
+            ValueError: If the compression is unknown.
+        """
+        if compression not in self.COMPRESSIONS:
+            raise ValueError(f'Unknown compression {compression}, expected one of {self.COMPRESSIONS}')
+        if ZIP_METHODS[compression] is None:
+            logger.warning(f'zipfile does not support {compression} compression, using deflate')
+            compression = 'deflate'
+            compression_level = min(compression_level, 9) if compression_level is not None else None
+        self.file_path = file_path
+        self.compression = compression
+        self.compression_level = compression_level
+        self._zip = zipfile.ZipFile(file_path, 'w', compression=ZIP_METHODS[compression], compresslevel=compression_level)
+        self._lock = threading.Lock()
+
+    def write(self, name:str, gdf, output_format:str=DEFAULT_OUTPUT_FORMAT):
+        """
+        Writes a quality metric output into an entry of the zip.
+
+        Args:
+            name (str): Name of the entry.
+            gdf (gpd.GeoDataFrame): The output.
+            output_format (str, optional): One of `OUTPUT_FORMATS`. Defaults to DEFAULT_OUTPUT_FORMAT.
+        """
+        with self._lock:
+            # the size is not known up front, zip64 lets entries grow past 2 GiB
+            with self._zip.open(name, 'w', force_zip64=True) as entry:
+                write_output(gdf, entry, output_format)
+
+    def write_file(self, file_path:str, name:str):
+        """
+        Copies a file into a compressed entry of the zip.
+
+        Args:
+            file_path (str): Path to the file.
+            name (str): Name of the entry.
+        """
+        with self._lock:
+            self._zip.write(file_path, name)
+
+    def names(self):
+        """
+        Returns the names of the entries written so far.
+
+        Returns:
+            list: The entry names.
+        """
+        with self._lock:
+            return self._zip.namelist()
+
+    def close(self):
+        """
+        Writes the central directory of the zip and closes it.
+        """
+        with self._lock:
+            self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,104 @@
+import datetime
+import importlib.util
+import itertools
+import json
+import numpy as np
+
+# OGR driver and file extension of every output format, GeoParquet is written by pyarrow
+OUTPUT_FORMATS = {
+    'geojson': ('GeoJSON', '.geojson'),
+    'flatgeobuf': ('FlatGeobuf', '.fgb'),
+    'geoparquet': (None, '.parquet'),
+}
+DEFAULT_OUTPUT_FORMAT = 'geojson'
+# Number of GeoJSON features encoded at a time when writing to a stream
+GEOJSON_CHUNK_SIZE = 10000
+
+
+def check_output_format(output_format):
+    """
+    Checks that an output format is known and can be written.
+
+    Args:
+        output_format (str): One of `OUTPUT_FORMATS`.
+
+    Raises:
+        ValueError: If the format is unknown, or is geoparquet and pyarrow is not installed.
+    """
+    _check_known(output_format)
+    if output_format == 'geoparquet' and importlib.util.find_spec('pyarrow') is None:
+        raise ValueError('The geoparquet output_format needs pyarrow, which is not installed')
+
+
+def _check_known(output_format):
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f'Unknown output_format {output_format}, expected one of {tuple(OUTPUT_FORMATS)}')
+
+
+def output_extension(output_format):
+    """
+    Returns the file extension of an output format.
+
+    Args:
+        output_format (str): One of `OUTPUT_FORMATS`.
+
+    Returns:
+        str: The extension, with the leading dot.
+    """
+    _check_known(output_format)
+    return OUTPUT_FORMATS[output_format][1]
+
+
+def write_output(gdf, target, output_format=DEFAULT_OUTPUT_FORMAT):
+    """
+    Writes a quality metric output in the given format.
+
+    Args:
+        gdf (gpd.GeoDataFrame): The output.
+        target (str or file): Path of the file, see `output_extension`, or a binary stream opened for writing.
+        output_format (str, optional): One of `OUTPUT_FORMATS`. Defaults to DEFAULT_OUTPUT_FORMAT.
+    """
+    check_output_format(output_format)
+    driver = OUTPUT_FORMATS[output_format][0]
+    if driver is None:
+        gdf.to_parquet(target)
+    elif isinstance(target, str):
+        gdf.to_file(target, driver=driver)
+    elif output_format == 'geojson':
+        _write_geojson(gdf, target)
+    else:
+        # GDAL builds the file in memory and fiona copies it into the stream
+        gdf.to_file(target, driver=driver)
+
+
+def _write_geojson(gdf, stream, chunk_size=GEOJSON_CHUNK_SIZE):
+    # GDAL cannot write GeoJSON to a stream, the features are encoded a chunk at a time instead
+    crs_member = _geojson_crs_member(gdf.crs)
+    stream.write(f'{{"type": "FeatureCollection", {crs_member}"features": [\n'.encode())
+    features = gdf.iterfeatures(na='null', show_bbox=False, drop_id=True)
+    separator = ''
+    while True:
+        chunk = [json.dumps(feature, default=_json_default) for feature in itertools.islice(features, chunk_size)]
+        if not chunk:
+            break
+        stream.write((separator + ',\n'.join(chunk)).encode())
+        separator = ',\n'
+    stream.write(b'\n]}\n')
+
+
+def _geojson_crs_member(crs):
+    # the same member GDAL writes, CRS84 for EPSG:4326
+    epsg = None if crs is None else crs.to_epsg()
+    if epsg is None:
+        return ''
+    name = 'urn:ogc:def:crs:OGC:1.3:CRS84' if epsg == 4326 else f'urn:ogc:def:crs:EPSG::{epsg}'
+    return f'"crs": {{"type": "name", "properties": {{"name": "{name}"}}}}, '
+
+
+def _json_default(value):
+    # GDAL reads ISO dates such as check_date as datetimes, they are written back as ISO strings like GDAL does
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
@@ -13,3 +13,6 @@ class QMCalculator(ABC):
     @abstractmethod
     def algorithm_name(self) -> str:
         pass
+    def edge_columns(self):
+        # attribute columns of the edges the calculator uses, None for all of them
+        return None
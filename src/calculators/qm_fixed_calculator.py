@@ -1,4 +1,7 @@
 from src.calculators.qm_calculator import QMCalculator, QualityMetricResult
+from src.calculators.edges_dataset import EdgesDataset
+from src.calculators.output_formats import write_output, check_output_format, DEFAULT_OUTPUT_FORMAT
+from src.calculators.output_archive import OutputArchive
 import random
 import geopandas as gpd
 import sys
@@ -8,16 +11,27 @@ class QMFixedCalculator(QMCalculator):
     Dummy quality metric calculator that assigns a random score to each edge in the input file
     '''
 
-    def __init__(self, edges_file_path:str, output_file_path:str, polygon_file_path:str=None):
+    def __init__(self, edges_file_path:str, output_file_path:str, polygon_file_path:str=None, edges:EdgesDataset=None, output_format:str=DEFAULT_OUTPUT_FORMAT, output_archive:OutputArchive=None):
+        check_output_format(output_format)
         self.edges_file_path = edges_file_path
         self.output_file_path = output_file_path
         self.polygon_file_path = polygon_file_path
-        pass
+        self.output_format = output_format
+        # zip the output is written into, `output_file_path` is then the name of its entry
+        self.output_archive = output_archive
+        # edges already read by another calculator of the same job
+        self.edges = edges or EdgesDataset(edges_file_path)
+        # every column is written back to the output
+        self.edges.require(self.edge_columns())
 
     def calculate_quality_metric(self):
-        gdf = gpd.read_file(self.edges_file_path)
+        # the edges are shared with the other calculators, the score goes on a shallow copy
+        gdf = self.edges.read().copy(deep=False)
         gdf['fixed_score'] = random.randint(0, 100)
-        gdf.to_file(self.output_file_path)
+        if self.output_archive is None:
+            write_output(gdf, self.output_file_path, self.output_format)
+        else:
+            self.output_archive.write(self.output_file_path, gdf, self.output_format)
         return QualityMetricResult(success=True, message="QMFixedCalculator", output_file=self.output_file_path)
 
     def algorithm_name(self):
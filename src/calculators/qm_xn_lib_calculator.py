@@ -1,22 +1,51 @@
 from src.calculators.qm_calculator import QMCalculator, QualityMetricResult
+from src.calculators.edges_dataset import EdgesDataset
+from src.calculators.feature_reader import read_features
+from src.calculators.output_formats import write_output, check_output_format, DEFAULT_OUTPUT_FORMAT
+from src.calculators.output_archive import OutputArchive
+from src.calculators.tile_incidence import edge_incidence, EDGE_ROWS_COLUMN
+from src.calculators.tile_graph import (
+    graph_from_gdf as build_segment_graph, csr_graph_from_gdf, node_coordinates, count_merged_nodes,
+    add_osw_endpoints, osw_segments, OSW_ENDPOINT_COLUMNS
+)
+from src.calculators.shared_edges import SharedEdges, DEFAULT_CHUNK_SIZE
+from src.calculators.road_network import RoadNetworkSource
+from src.calculators.tilers import square_grid, hex_grid, junction_voronoi, split_tiles
+from src.calculators.tile_scheduling import tile_costs, pack_partitions, partition_tiles, worker_load, BoundedPoolExecutor, WORKER_COLUMNS
+from src.calculators.tile_results import TileResultStore, tile_fingerprints, FINGERPRINT_COLUMN
+from src.calculators.tile_connectivity import group_boundary_nodes, label_components, connected_segment_pairs
 import geopandas as gpd
 import sys
 import warnings
 import networkx as nx
-import traceback
 import geonetworkx as gnx
-import osmnx as ox
 import dask_geopandas 
-from shapely import Point, LineString, MultiLineString, Polygon, MultiPolygon
+from shapely import MultiPolygon
 from shapely.ops import voronoi_diagram
 import itertools
 import numpy as np
 import pandas as pd
 import os
+import logging
+import tempfile
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger("QMXNLibCalculator")
+logger.setLevel(logging.INFO)
 
 
 class QMXNLibCalculator(QMCalculator):
-    def __init__(self, edges_file_path:str, output_file_path:str, polygon_file_path:str=None, partition_count:int = os.cpu_count()):
+    TRA_ENGINES = ('components', 'pairwise')
+    GRAPH_BACKENDS = ('csr', 'networkx')
+    TOPOLOGIES = ('geometry', 'osw')
+    TILE_SCHEDULES = ('cost', 'count')
+    TILERS = ('osmnx', 'square', 'hex', 'junction_voronoi')
+    INGESTS = ('memory', 'stream')
+    # partitions per core for the cost schedule, so the workers can even out wrong estimates
+    PARTITIONS_PER_CORE = 4
+
+    def __init__(self, edges_file_path:str, output_file_path:str, polygon_file_path:str=None, partition_count:int = os.cpu_count(), tra_engine:str = 'components', snap_tolerance:float = 0, graph_backend:str = 'csr', topology:str = 'geometry', pool=None, tile_schedule:str = 'cost', road_network:RoadNetworkSource = None, tiler:str = 'osmnx', tile_size:float = 200, max_tile_cost:float = 0, result_store:TileResultStore = None, edges:EdgesDataset = None, ingest:str = 'memory', chunk_size:int = DEFAULT_CHUNK_SIZE, output_format:str = DEFAULT_OUTPUT_FORMAT, output_archive:OutputArchive = None, polygon_download:Future = None, max_workers:int = None):
         """
         Initializes the QMXNLibCalculator class.
 
@@ -24,7 +53,44 @@ class QMXNLibCalculator(QMCalculator):
             edges_file_path (str): Path to the file containing the OSW edge data.
             output_file_path (str): Path to where the output quality metric file will be saved.
             polygon_file_path (str, optional): Path to the intersection polygon file. If not provided, will use the polygon computed from the convex hull of OSW edge data. Defaults to None.
+            partition_count (int, optional): Number of partitions to split the tiles into. Defaults to the number of cores.
+            tra_engine (str, optional): Engine used to count connected segment pairs. 'components' labels the connected components once per tile, 'pairwise' runs `nx.has_path` for every boundary node pair. Defaults to 'components'.
+            snap_tolerance (float, optional): Grid size (in units of the projection) that edge endpoints are snapped to before building the graph. 0 only joins exactly equal endpoints. Defaults to 0.
+            graph_backend (str, optional): Storage of the per-tile graph. 'csr' uses a scipy.sparse adjacency matrix, 'networkx' an `nx.Graph` (required by the 'pairwise' engine). Defaults to 'csr'.
+            topology (str, optional): Where the network topology comes from. 'geometry' joins edges at shared vertex coordinates, 'osw' joins them at shared `_u_id`/`_v_id` node ids and only splits them at tile boundaries. Defaults to 'geometry'.
+            pool (multiprocessing.pool.Pool, optional): Running worker pool the tiles are scored on. Defaults to None, in which case dask starts new processes for every run.
+            tile_schedule (str, optional): How tiles are split into partitions. 'cost' packs them by estimated cost (edges times boundary vertices), 'count' splits them into equal sized chunks. Defaults to 'cost'.
+            road_network (RoadNetworkSource, optional): Source of the drive network the tiles are built from when no polygon file is given. Defaults to None, in which case it is fetched from the Overpass API every time.
+            tiler (str, optional): How tiles are made when no polygon file is given. 'osmnx' uses the Voronoi diagram of the drive network, 'square' and 'hex' a grid of `tile_size` cells, 'junction_voronoi' the Voronoi diagram of the OSW nodes where three or more edges meet. Defaults to 'osmnx'.
+            tile_size (float, optional): Cell size of the 'square' and 'hex' tilers, in meters. Defaults to 200.
+            max_tile_cost (float, optional): Tiles whose estimated cost (candidate edges + 1 times boundary vertices) is higher are split in halves until they fit, and the output gets a `parent_tile` column with the index of the original tile. Defaults to 0 (no splitting).
+            result_store (TileResultStore, optional): Cache of tile scores. Tiles whose fingerprint (geometry, clipped edges and scoring settings) is stored are not scored again, and the workers store the scores of the others. Defaults to None.
+            edges (EdgesDataset, optional): The edges, when they are already read for another calculator of the job. Defaults to None, in which case they are read from `edges_file_path`.
+            ingest (str, optional): How the edges are loaded. 'memory' reads them into a GeoDataFrame, 'stream' parses and projects them `chunk_size` features at a time into memory-mapped arrays, for files that do not fit in memory. The 'junction_voronoi' tiler reads them into memory when it makes the tiles. Defaults to 'memory'.
+            chunk_size (int, optional): Number of edges held in memory at a time by the 'stream' ingest. Defaults to DEFAULT_CHUNK_SIZE.
+            output_format (str, optional): Format of the output file, one of `OUTPUT_FORMATS`. Defaults to 'geojson'.
+            output_archive (OutputArchive, optional): Zip the output is written into as a compressed entry named `output_file_path`, instead of a file. Defaults to None.
+            polygon_download (Future, optional): Download of the polygon file that may still be running. The edges are read meanwhile, and it is waited for before the polygon file is read. Defaults to None.
+            max_workers (int, optional): Worker processes the tiles are scored on at the same time, the share of the cores the calculator gets. Defaults to None, in which case it is `partition_count`.
         """
+        if tra_engine not in self.TRA_ENGINES:
+            raise ValueError(f'Unknown tra_engine {tra_engine}, expected one of {self.TRA_ENGINES}')
+        if graph_backend not in self.GRAPH_BACKENDS:
+            raise ValueError(f'Unknown graph_backend {graph_backend}, expected one of {self.GRAPH_BACKENDS}')
+        if tra_engine == 'pairwise' and graph_backend != 'networkx':
+            raise ValueError('The pairwise tra_engine needs the networkx graph_backend')
+        if topology not in self.TOPOLOGIES:
+            raise ValueError(f'Unknown topology {topology}, expected one of {self.TOPOLOGIES}')
+        if tiler not in self.TILERS:
+            raise ValueError(f'Unknown tiler {tiler}, expected one of {self.TILERS}')
+        if tile_schedule not in self.TILE_SCHEDULES:
+            raise ValueError(f'Unknown tile_schedule {tile_schedule}, expected one of {self.TILE_SCHEDULES}')
+        check_output_format(output_format)
+        if ingest not in self.INGESTS:
+            raise ValueError(f'Unknown ingest {ingest}, expected one of {self.INGESTS}')
+        if ingest == 'stream' and tiler == 'junction_voronoi' and not polygon_file_path:
+            logger.warning('The junction_voronoi tiler needs the edges in memory, not streaming them')
+            ingest = 'memory'
         self.edges_file_path = edges_file_path
         self.output_file_path = output_file_path
         self.polygon_file_path = polygon_file_path
@@ -33,35 +99,60 @@ class QMXNLibCalculator(QMCalculator):
         self.output_projection = 'epsg:4326'
         self.precision = 1e-5
         self.partition_count = partition_count
+        self.tra_engine = tra_engine
+        self.snap_tolerance = snap_tolerance
+        self.graph_backend = graph_backend
+        self.topology = topology
+        self.pool = pool
+        self.tile_schedule = tile_schedule
+        self.road_network = road_network or RoadNetworkSource()
+        self.tiler = tiler
+        self.tile_size = tile_size
+        self.max_tile_cost = max_tile_cost
+        self.result_store = result_store
+        self.edges = edges or EdgesDataset(edges_file_path)
+        # the edges are only used in the default projection once the tiles are made
+        self.edges.require(self.edge_columns(), self.default_projection)
+        self.ingest = ingest
+        self.chunk_size = chunk_size
+        self.output_format = output_format
+        self.output_archive = output_archive
+        self.polygon_download = polygon_download
+        self.max_workers = max_workers
+
+    def edge_columns(self):
+        """
+        Returns the edge columns the scores depend on, the node ids for the osw topology and the junction tiler.
+
+        Returns:
+            list: Column names, the geometry is always read.
+        """
+        return ['_u_id', '_v_id'] if self.topology == 'osw' or self.tiler == 'junction_voronoi' else []
+
+    def __getstate__(self):
+        # qm_func ships the calculator to the workers, the pool, the edges, the output zip and the download stay in this process
+        state = self.__dict__.copy()
+        state['pool'] = None
+        state['edges'] = None
+        state['output_archive'] = None
+        state['polygon_download'] = None
+        return state
 
     def add_edges_from_linestring(self, graph, linestring, edge_attrs):
         points = list(linestring.coords)
         for start, end in zip(points[:-1], points[1:]):
             graph.add_edge(start, end, **edge_attrs)
     
-    def graph_from_gdf(self, gdf):
-        G = nx.Graph()
-        for index, row in gdf.iterrows():
-            geom = row.geometry
-            if isinstance(geom, LineString):
-                self.add_edges_from_linestring(G, geom, row.to_dict())
-            elif isinstance(geom, MultiLineString):
-                for linestring in geom.geoms:
-                    self.add_edges_from_linestring(G, linestring, row.to_dict())
-        return G
+    def graph_from_gdf(self, gdf, attributes=None):
+        segments = None
+        if self.topology == 'osw' and set(OSW_ENDPOINT_COLUMNS).issubset(gdf.columns):
+            segments = osw_segments(gdf, self.precision)
+        if self.graph_backend == 'csr' and not attributes:
+            return csr_graph_from_gdf(gdf, self.snap_tolerance, segments)
+        return build_segment_graph(gdf, attributes, self.snap_tolerance, segments)
     
     def group_G_pts(self, G, poly):
-        P = poly
-        node_pts = [Point(x) for x in G.nodes()]
-        boundary = list(P.boundary.coords)
-        segments = [LineString([boundary[i], boundary[i + 1]]) for i in range(len(boundary) - 1)]
-        segment_point_map = {index: [] for index in range(len(segments))}
-        for point in node_pts:
-            for idx, segment in enumerate(segments):
-                if segment.distance(point) < self.precision:
-                    segment_point_map[idx].append((point.x, point.y))
-                    break
-        return segment_point_map
+        return group_boundary_nodes(list(G.nodes()), poly, self.precision, node_coordinates(G))
     
     def edges_are_connected(self, G, e1_pts, e2_pts):
         for pt1 in e1_pts:
@@ -76,8 +167,14 @@ class QMXNLibCalculator(QMCalculator):
     def tile_tra_score(self, G, polygon):
         # assign each point to a polygon line
         pts_line_map = self.group_G_pts(G, polygon)
-        boundary_nodes = [item for sublist in pts_line_map.values() for item in sublist]
+        if self.tra_engine == 'pairwise':
+            return self.pairwise_tra_score(G, pts_line_map)
+        return self.component_tra_score(G, pts_line_map)
+
+    def component_tra_score(self, G, pts_line_map):
+        return connected_segment_pairs(pts_line_map, label_components(G))
 
+    def pairwise_tra_score(self, G, pts_line_map):
         # find all pair of edges
         edge_pairs = list(itertools.combinations_with_replacement(pts_line_map.keys(), 2))
 
@@ -93,7 +190,6 @@ class QMXNLibCalculator(QMCalculator):
 
     def get_stats(self, polygon, G, gdf):
         stats = {}
-        undirected_g = nx.Graph(G)
 
         try:
             n_total, n_connected, connected_pairs = self.tile_tra_score(G, polygon)
@@ -117,12 +213,117 @@ class QMXNLibCalculator(QMCalculator):
     def qm_func(self, feature, gdf):
         poly = feature.geometry
         if (poly.geom_type == 'Polygon' or poly.geom_type == 'MultiPolygon'):
+            if EDGE_ROWS_COLUMN in feature.index:
+                # only clip the edges known to touch this tile
+                gdf = gdf.take(feature[EDGE_ROWS_COLUMN])
             measures = self.get_measures_from_polygon(poly, gdf)
             feature.loc['tra_score'] = measures['tra_score']
             return feature
         else:
             return feature
     
+    def timed_qm_func(self, feature, gdf):
+        start = time.perf_counter()
+        # the row of a geometry-only tile frame has the geometry dtype, which cannot hold the scores
+        feature = feature.astype(object)
+        feature = self.qm_func(feature, gdf)
+        if FINGERPRINT_COLUMN in feature.index:
+            # stored as soon as it is scored, so a failed job keeps its finished tiles
+            self.result_store.put_many([(feature[FINGERPRINT_COLUMN], feature.get('tra_score', np.nan))])
+        feature = feature.drop([EDGE_ROWS_COLUMN, FINGERPRINT_COLUMN], errors='ignore')
+        feature.loc['_worker'] = os.getpid()
+        feature.loc['_busy_seconds'] = time.perf_counter() - start
+        return feature
+
+    def partition_tiles(self, tile_gdf, edge_index, no_of_cores):
+        """
+        Splits the tiles into dask partitions according to `tile_schedule`.
+
+        Args:
+            tile_gdf (gpd.GeoDataFrame): The tiles.
+            edge_index (pd.Series): Candidate edge positions of every tile.
+            no_of_cores (int): Number of worker processes.
+
+        Returns:
+            dask_geopandas.GeoDataFrame: The partitioned tiles.
+        """
+        if self.tile_schedule == 'count':
+            return dask_geopandas.from_geopandas(tile_gdf, npartitions=no_of_cores)
+        labels = pack_partitions(tile_costs(tile_gdf, edge_index), no_of_cores * self.PARTITIONS_PER_CORE)
+        return partition_tiles(tile_gdf, labels)
+
+    def log_worker_load(self, output):
+        load = worker_load(output)
+        for worker, row in load.iterrows():
+            logger.info(f'Worker {worker} scored {int(row.tiles)} tiles in {row.busy_seconds:.2f}s')
+        if len(load) > 0 and load.busy_seconds.mean() > 0:
+            logger.info(f'Busiest worker was busy {load.busy_seconds.max() / load.busy_seconds.mean():.2f}x the mean')
+
+    def share_edges(self, gdf, directory):
+        """
+        Stores the edges in memory-mapped arrays under `directory` so the workers do not get a pickled copy.
+
+        Args:
+            gdf (gpd.GeoDataFrame): The projected OSW edges.
+            directory (str): Directory that outlives the computation.
+
+        Returns:
+            SharedEdges | gpd.GeoDataFrame: The shared edges, or `gdf` itself if its geometries are not lines or it is already shared.
+        """
+        if isinstance(gdf, SharedEdges):
+            return gdf
+        if not SharedEdges.supports(gdf):
+            logger.info('Edges contain non-line geometries, passing them to the workers as they are')
+            return gdf
+        columns = ['_u_id', '_v_id'] + OSW_ENDPOINT_COLUMNS if set(OSW_ENDPOINT_COLUMNS).issubset(gdf.columns) else []
+        return SharedEdges.from_gdf(gdf, directory, columns)
+
+    def result_settings(self):
+        # the graph backends give the same scores, only the settings that change them are part of the fingerprint
+        return f'{self.tra_engine}|{self.snap_tolerance}|{self.topology}|{self.precision}'
+
+    def result_columns(self, gdf):
+        return ['_u_id', '_v_id'] if self.topology == 'osw' and {'_u_id', '_v_id'}.issubset(gdf.columns) else []
+
+    def score_tiles(self, tile_gdf, gdf, edge_index, fingerprints=None):
+        """
+        Scores the tiles on the workers.
+
+        Args:
+            tile_gdf (gpd.GeoDataFrame): The tiles to score.
+            gdf (gpd.GeoDataFrame): The projected OSW edges.
+            edge_index (pd.Series): Candidate edge positions of every tile.
+            fingerprints (pd.Series, optional): Fingerprint of every tile, the workers store the scores under. Defaults to None.
+
+        Returns:
+            gpd.GeoDataFrame: The tiles with their `tra_score`, in `tile_gdf` order.
+        """
+        if len(tile_gdf) == 0:
+            return tile_gdf.assign(tra_score=pd.Series(dtype='float64'))
+        no_of_cores = min(self.partition_count, os.cpu_count())
+        no_of_workers = min(self.max_workers or no_of_cores, no_of_cores)
+        # every partition carries the edge rows and fingerprints of its own tiles, instead of every task getting all of them
+        task_columns = {EDGE_ROWS_COLUMN: edge_index}
+        if fingerprints is not None:
+            task_columns[FINGERPRINT_COLUMN] = fingerprints
+        df_dask = self.partition_tiles(tile_gdf.assign(**task_columns), edge_index, no_of_cores)
+
+        with tempfile.TemporaryDirectory() as shared_dir:
+            edges = self.share_edges(gdf, shared_dir)
+            output = df_dask.apply(self.timed_qm_func,axis=1, meta=[
+                ('geometry', 'geometry'),
+                *[(column, tile_gdf[column].dtype) for column in tile_gdf.columns if column != 'geometry'],
+                ('tra_score', 'float64'),
+                ('_worker', 'int64'),
+                ('_busy_seconds', 'float64')
+            ], gdf=edges).compute(scheduler='multiprocessing', num_workers=no_of_workers, chunksize=1,
+                                  pool=None if self.pool is None else BoundedPoolExecutor(self.pool, no_of_workers))
+        # partitions are not in tile order
+        output = output.loc[tile_gdf.index]
+        self.log_worker_load(output)
+        # the rows come back as objects, the score is stored as a typed column
+        return output.drop(columns=WORKER_COLUMNS).astype({'tra_score': 'float64'})
+
     def create_voronoi_diagram(self, G_roads_simplified, bounds):
         # first thin the nodes
         gdf_roads_simplified = gnx.graph_edges_to_gdf(G_roads_simplified)
@@ -134,35 +335,97 @@ class QMXNLibCalculator(QMCalculator):
 
         return voronoi_gdf_clipped
     
+    def create_tiles(self, gdf, bounds, crs=None):
+        """
+        Creates the tiles of the edges with the configured tiler.
+
+        Args:
+            gdf (gpd.GeoDataFrame): The OSW edges, in their original CRS. Only used by the 'junction_voronoi' tiler.
+            bounds (Polygon): The convex hull of the edges, in the same CRS.
+            crs (optional): CRS of `bounds`. Defaults to None, in which case it is the CRS of `gdf`.
+
+        Returns:
+            gpd.GeoDataFrame: The tiles, in the default projection.
+        """
+        if self.tiler == 'osmnx':
+            g_roads_simplified = self.road_network.graph_from_polygon(bounds)
+            return self.create_voronoi_diagram(g_roads_simplified, bounds)
+
+        area = gpd.GeoSeries([bounds], crs=gdf.crs if crs is None else crs).to_crs(self.default_projection).iloc[0]
+        if self.tiler == 'square':
+            return square_grid(area, self.tile_size, self.default_projection)
+        if self.tiler == 'hex':
+            return hex_grid(area, self.tile_size, self.default_projection)
+        return junction_voronoi(gdf.to_crs(self.default_projection), area, crs=self.default_projection)
+
     def calculate_quality_metric(self):
+        # the streamed edges live in memory-mapped arrays until the tiles are scored
+        stream_dir = tempfile.TemporaryDirectory() if self.ingest == 'stream' else None
         try:
-            gdf = gpd.read_file(self.edges_file_path)
+            if stream_dir is not None:
+                gdf, hull = self.edges.stream(stream_dir.name, self.default_projection, self.edge_columns(),
+                                              osw_endpoints=self.topology == 'osw', chunk_size=self.chunk_size)
+                logger.info(f'Streamed {len(gdf)} edges in chunks of {self.chunk_size}')
+            else:
+                gdf = self.edges.read()
 
             if self.polygon_file_path:
-                 tile_gdf = gpd.read_file(self.polygon_file_path)
+                if self.polygon_download is not None:
+                    self.polygon_download.result()
+                tile_gdf = read_features(self.polygon_file_path, columns=[])
+            elif stream_dir is not None:
+                tile_gdf = self.create_tiles(None, hull.iloc[0], crs=hull.crs)
             else:
                 unified_geom = gdf.unary_union
                 bounding_polygon = unified_geom.convex_hull
-                g_roads_simplified = ox.graph.graph_from_polygon(bounding_polygon, network_type='drive', simplify=True, retain_all=True)
-                tile_gdf = self.create_voronoi_diagram(g_roads_simplified, bounding_polygon)
+                tile_gdf = self.create_tiles(gdf, bounding_polygon)
             
-            gdf = gdf.to_crs(self.default_projection)
+            if stream_dir is None:
+                gdf = self.edges.projected(self.default_projection)
             tile_gdf = tile_gdf.to_crs(self.default_projection)
             tile_gdf = tile_gdf[['geometry']]
-            no_of_cores = min(self.partition_count, os.cpu_count())
-            df_dask = dask_geopandas.from_geopandas(tile_gdf, npartitions=no_of_cores)
+            if self.max_tile_cost:
+                n_tiles = len(tile_gdf)
+                tile_gdf = split_tiles(tile_gdf, gdf, self.max_tile_cost)
+                logger.info(f'Split {n_tiles} tiles into {len(tile_gdf)} within a cost of {self.max_tile_cost}')
+            if self.topology == 'osw':
+                if not {'_u_id', '_v_id'}.issubset(gdf.columns):
+                    logger.warning('Edges have no _u_id/_v_id columns, using the geometry topology')
+                elif stream_dir is None:
+                    gdf = add_osw_endpoints(gdf)
+            elif self.snap_tolerance and stream_dir is None:
+                # counting needs all of the endpoints at once, streamed edges are only snapped per tile
+                logger.info(f'Snapping at {self.snap_tolerance} merged {count_merged_nodes(gdf, self.snap_tolerance)} nodes')
+            edge_index = edge_incidence(tile_gdf, gdf)
+            fingerprints = None
+            scored_gdf = tile_gdf
+            if self.result_store is not None:
+                fingerprints = tile_fingerprints(tile_gdf, gdf, edge_index, self.result_settings(), self.result_columns(gdf))
+                stored = self.result_store.get_many(fingerprints)
+                hits = fingerprints.isin(stored.keys())
+                logger.info(f'Tile results: {hits.sum()} hits, {(~hits).sum()} misses')
+                scored_gdf = tile_gdf[~hits]
 
-            output = df_dask.apply(self.qm_func,axis=1, meta=[
-                ('geometry', 'geometry'),
-                ('tra_score', 'object')
-            ], gdf=gdf).compute(scheduler='multiprocessing')
+            output = self.score_tiles(scored_gdf, gdf, edge_index.loc[scored_gdf.index],
+                                      None if fingerprints is None else fingerprints[scored_gdf.index])
+            if fingerprints is not None:
+                logger.info(f'Evicted {self.result_store.evict()} tile results')
+                reused = tile_gdf[hits].copy()
+                reused['tra_score'] = fingerprints[hits].map(stored).astype('float64')
+                output = pd.concat([output, reused]).loc[tile_gdf.index]
             output = output.to_crs(self.output_projection) # The output should be in WGS84 (epsg:4326)
-            output.to_file(self.output_file_path, driver='GeoJSON')
+            if self.output_archive is None:
+                write_output(output, self.output_file_path, self.output_format)
+            else:
+                self.output_archive.write(self.output_file_path, output, self.output_format)
             return QualityMetricResult(success=True, message='QMXNLibCalculator', output_file=self.output_file_path)
 
         except Exception as e:
             print(f"Error {e} occurred when calculating quality metric for data {self.edges_file_path}")
             return QualityMetricResult(success=False, message=f'Error: {e}', output_file="")
+        finally:
+            if stream_dir is not None:
+                stream_dir.cleanup()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,194 @@
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import geopandas as gpd
+import numpy as np
+import osmnx as ox
+import pandas as pd
+import shapely
+from src.calculators.tile_graph import snap_nodes
+
+logger = logging.getLogger("RoadNetworkSource")
+logger.setLevel(logging.INFO)
+
+# Same tag filter as osmnx uses for network_type='drive'
+DRIVE_EXCLUDE = {
+    'area': 'yes',
+    'access': 'private',
+    'highway': 'abandoned|bridleway|bus_guideway|construction|corridor|cycleway|elevator|escalator|footway|no|path|'
+               'pedestrian|planned|platform|proposed|raceway|razed|service|steps|track',
+    'motor_vehicle': 'no',
+    'motorcar': 'no',
+    'service': 'alley|driveway|emergency_access|parking|parking_aisle|private',
+}
+OSM_XML_EXTENSIONS = ('.osm', '.osm.bz2', '.xml')
+GEOJSON_EXTENSIONS = ('.geojson', '.json')
+
+
+def is_drive_way(tags):
+    """
+    Checks the tags of an OSM way against the osmnx 'drive' network filter.
+
+    Args:
+        tags (dict): Tags of the way. Missing and NaN values are ignored.
+
+    Returns:
+        bool: True if the way belongs to the drive network.
+    """
+    if not isinstance(tags.get('highway'), str):
+        return False
+    for key, pattern in DRIVE_EXCLUDE.items():
+        values = tags.get(key)
+        for value in values if isinstance(values, list) else [values]:
+            if isinstance(value, str) and re.search(pattern, value):
+                return False
+    return True
+
+
+def quantized_hull(polygon, grid):
+    """
+    Snaps a polygon outwards to a grid, so nearby hulls of the same region share one network.
+
+    The result is the convex hull of the grid cells the polygon vertices fall in, so it
+    always contains `polygon` and only changes when a vertex moves to another cell.
+
+    Args:
+        polygon (Polygon): The convex hull of the edges, in EPSG:4326.
+        grid (float): Grid size in degrees.
+
+    Returns:
+        Polygon: The quantized hull.
+    """
+    cells = np.unique(np.floor(shapely.get_coordinates(polygon) / grid), axis=0)
+    corners = (cells[:, None, :] + np.array([[0, 0], [0, 1], [1, 0], [1, 1]])).reshape(-1, 2)
+    # round away the float noise of the multiplication, the hull is used as cache key
+    return shapely.multipoints(np.round(corners * grid, 9)).convex_hull
+
+
+def graph_from_geojson(file_path, polygon):
+    """
+    Builds the drive network inside `polygon` from a GeoJSON extract of OSM ways.
+
+    Args:
+        file_path (str): GeoJSON file of LineStrings with OSM tags (at least `highway`) as properties.
+        polygon (Polygon): Area to read, in EPSG:4326.
+
+    Returns:
+        nx.MultiDiGraph: The osmnx graph, one edge per way part.
+    """
+    ways = gpd.read_file(file_path, bbox=polygon.bounds).to_crs('epsg:4326')
+    columns = [column for column in ['highway', *DRIVE_EXCLUDE] if column in ways.columns]
+    drive = [is_drive_way(dict(zip(columns, values))) for values in ways[columns].itertuples(index=False)]
+    ways = ways[drive].explode(index_parts=False)
+    ways = ways[ways.geom_type == 'LineString']
+
+    geoms = np.asarray(ways.geometry.values, dtype=object)
+    ends = np.concatenate([
+        shapely.get_coordinates(shapely.get_point(geoms, 0)),
+        shapely.get_coordinates(shapely.get_point(geoms, -1)),
+    ])
+    node_ids, node_coords, _ = snap_nodes(ends)
+    nodes = gpd.GeoDataFrame(
+        {'x': node_coords[:, 0], 'y': node_coords[:, 1]},
+        geometry=shapely.points(node_coords), crs='epsg:4326',
+    )
+    u, v = node_ids[:len(geoms)], node_ids[len(geoms):]
+    key = pd.DataFrame({'u': u, 'v': v}).groupby(['u', 'v']).cumcount().to_numpy()
+    edges = gpd.GeoDataFrame(
+        ways[columns].to_numpy(), columns=columns, geometry=geoms, crs='epsg:4326',
+        index=pd.MultiIndex.from_arrays([u, v, key], names=['u', 'v', 'key']),
+    )
+    G = ox.graph_from_gdfs(nodes, edges, graph_attrs={'crs': 'epsg:4326'})
+    return ox.truncate.truncate_graph_polygon(G, polygon, retain_all=True)
+
+
+def graph_from_osm_xml(file_path, polygon):
+    """
+    Builds the drive network inside `polygon` from an OSM XML extract.
+
+    Args:
+        file_path (str): .osm or .osm.bz2 file, e.g. converted from a PBF extract with osmium.
+        polygon (Polygon): Area to keep, in EPSG:4326.
+
+    Returns:
+        nx.MultiDiGraph: The simplified osmnx graph.
+    """
+    G = ox.graph_from_xml(file_path, simplify=False, retain_all=True)
+    G.remove_edges_from([(u, v, k) for u, v, k, tags in G.edges(keys=True, data=True) if not is_drive_way(tags)])
+    G.remove_nodes_from([node for node, degree in dict(G.degree()).items() if degree == 0])
+    G = ox.truncate.truncate_graph_polygon(G, polygon, retain_all=True)
+    return ox.simplify_graph(G)
+
+
+class RoadNetworkSource:
+    """
+    Provides the drive network the tiles are built from when no sub regions file is given.
+
+    Networks come from a local OSM extract when one is configured, and from the Overpass
+    API otherwise. With a cache folder, every network is stored as GraphML keyed by the
+    source and the hull quantized to `grid`, so later jobs for the same region skip the
+    fetch and only truncate the cached network to their own hull.
+    """
+
+    def __init__(self, extract_path:str=None, cache_dir:str=None, grid:float=0.01):
+        """
+        Initializes the RoadNetworkSource class.
+
+        Args:
+            extract_path (str, optional): OSM XML (.osm, .osm.bz2) or GeoJSON extract to read the network from. Defaults to None (Overpass API).
+            cache_dir (str, optional): Folder of the persistent network cache. Defaults to None (no cache).
+            grid (float, optional): Grid size in degrees the hull is quantized to for the cache key. Defaults to 0.01.
+        """
+        if extract_path and not extract_path.lower().endswith(OSM_XML_EXTENSIONS + GEOJSON_EXTENSIONS):
+            raise ValueError(f'Unsupported road network extract {extract_path}, expected OSM XML or GeoJSON')
+        self.extract_path = extract_path or None
+        self.cache_dir = cache_dir or None
+        self.grid = grid
+
+    def source_id(self):
+        if self.extract_path is None:
+            return 'overpass:drive'
+        stat = os.stat(self.extract_path)
+        return f'{os.path.abspath(self.extract_path)}:{stat.st_size}:{stat.st_mtime_ns}'
+
+    def cache_path(self, polygon):
+        key = hashlib.sha1(f'{self.source_id()}|{polygon.wkt}'.encode()).hexdigest()
+        return os.path.join(self.cache_dir, f'{key}.graphml')
+
+    def fetch(self, polygon):
+        if self.extract_path is None:
+            return ox.graph.graph_from_polygon(polygon, network_type='drive', simplify=True, retain_all=True)
+        if self.extract_path.lower().endswith(GEOJSON_EXTENSIONS):
+            return graph_from_geojson(self.extract_path, polygon)
+        return graph_from_osm_xml(self.extract_path, polygon)
+
+    def graph_from_polygon(self, polygon):
+        """
+        Returns the drive network inside `polygon`.
+
+        Args:
+            polygon (Polygon): The convex hull of the edges, in EPSG:4326.
+
+        Returns:
+            nx.MultiDiGraph: The osmnx graph.
+        """
+        if self.cache_dir is None:
+            return self.fetch(polygon)
+
+        area = quantized_hull(polygon, self.grid)
+        cache_path = self.cache_path(area)
+        if os.path.exists(cache_path):
+            logger.info(f'Using cached road network {cache_path}')
+            G = ox.load_graphml(cache_path)
+        else:
+            G = self.fetch(area)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # write next to the target and rename, so concurrent jobs never read a partial file
+            with tempfile.NamedTemporaryFile(dir=self.cache_dir, suffix='.graphml', delete=False) as cache_file:
+                temp_path = cache_file.name
+            ox.save_graphml(G, temp_path)
+            os.replace(temp_path, cache_path)
+            logger.info(f'Cached road network {cache_path}')
+        return ox.truncate.truncate_graph_polygon(G, polygon, retain_all=True)
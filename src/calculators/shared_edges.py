@@ -0,0 +1,181 @@
+import os
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+# shapely type ids of LineString and MultiLineString
+LINESTRING, MULTILINESTRING = 1, 5
+ARRAY_NAMES = ['type_ids', 'geom_offsets', 'part_offsets', 'coords', 'columns']
+# edges rebuilt at a time when going through all of them
+DEFAULT_CHUNK_SIZE = 10000
+
+
+def _ranges(starts, ends):
+    """
+    Concatenates `np.arange(start, end)` for every start/end pair without a Python loop.
+    """
+    lengths = ends - starts
+    steps = np.ones(lengths.sum(), dtype=np.int64)
+    if len(steps) == 0:
+        return steps
+    non_empty = lengths > 0
+    # jump to the start of the next non-empty range
+    jumps = np.cumsum(lengths[non_empty])[:-1]
+    steps[0] = starts[non_empty][0]
+    steps[jumps] = starts[non_empty][1:] - ends[non_empty][:-1] + 1
+    return np.cumsum(steps)
+
+
+class SharedEdges:
+    """
+    Read-only copy of the projected OSW edges, stored as memory-mapped numpy arrays.
+
+    The edges are written to disk once per job and every worker maps the same files, so
+    passing a `SharedEdges` to a task only pickles the directory it lives in. `take`
+    rebuilds the GeoDataFrame of the requested rows, which is all a tile needs.
+
+    Geometries are kept as 2D coordinate arrays with part and geometry offsets. Columns are
+    stored as float64; non-numeric columns (e.g. `_u_id`/`_v_id`) are replaced by integer codes
+    shared by all of them, so equal ids stay equal and missing ids stay NaN.
+    """
+
+    def __init__(self, directory, crs, columns):
+        self.directory = directory
+        self.crs = crs
+        self.column_names = columns
+        self._arrays = None
+
+    @classmethod
+    def supports(cls, gdf):
+        """
+        Checks whether the geometries of `gdf` can be shared.
+
+        Args:
+            gdf (gpd.GeoDataFrame): The edges.
+
+        Returns:
+            bool: True if every non-empty geometry is a LineString or MultiLineString.
+        """
+        geoms = np.asarray(gdf.geometry.values, dtype=object)
+        present = ~(shapely.is_missing(geoms) | shapely.is_empty(geoms))
+        return bool(np.isin(shapely.get_type_id(geoms[present]), [LINESTRING, MULTILINESTRING]).all())
+
+    @classmethod
+    def from_gdf(cls, gdf, directory, columns=None):
+        """
+        Writes the geometries and `columns` of `gdf` to `directory`.
+
+        Args:
+            gdf (gpd.GeoDataFrame): The edges, see `supports`.
+            directory (str): Existing directory the arrays are written to. It must outlive every reader.
+            columns (list, optional): Columns of `gdf` to keep besides the geometry. Defaults to None.
+
+        Returns:
+            SharedEdges: Handle to the stored edges.
+        """
+        columns = list(columns or [])
+        geoms = np.asarray(gdf.geometry.values, dtype=object)
+        parts, geom_idx = shapely.get_parts(geoms, return_index=True)
+        non_empty = ~shapely.is_empty(parts)
+        parts, geom_idx = parts[non_empty], geom_idx[non_empty]
+        coords, part_idx = shapely.get_coordinates(parts, return_index=True)
+
+        values = np.empty((len(gdf), len(columns)))
+        categorical = [column for column in columns if not pd.api.types.is_numeric_dtype(gdf[column])]
+        codes, _ = pd.factorize(pd.concat([gdf[column] for column in categorical], ignore_index=True)) if categorical else (None, None)
+        for position, column in enumerate(columns):
+            if column in categorical:
+                offset = categorical.index(column) * len(gdf)
+                column_codes = codes[offset:offset + len(gdf)].astype(float)
+                column_codes[column_codes < 0] = np.nan
+                values[:, position] = column_codes
+            else:
+                values[:, position] = gdf[column].to_numpy(dtype=float)
+
+        arrays = {
+            'type_ids': shapely.get_type_id(geoms).astype(np.int8),
+            'geom_offsets': np.concatenate([[0], np.cumsum(np.bincount(geom_idx, minlength=len(geoms)))]),
+            'part_offsets': np.concatenate([[0], np.cumsum(np.bincount(part_idx, minlength=len(parts)))]),
+            'coords': coords,
+            'columns': values,
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(directory, f'{name}.npy'), array)
+        return cls(directory, gdf.crs, columns)
+
+    @property
+    def arrays(self):
+        if self._arrays is None:
+            self._arrays = {
+                name: np.load(os.path.join(self.directory, f'{name}.npy'), mmap_mode='r') for name in ARRAY_NAMES
+            }
+        return self._arrays
+
+    def __len__(self):
+        return len(self.arrays['type_ids'])
+
+    @property
+    def columns(self):
+        # the columns of the frames `take` returns
+        return [*self.column_names, 'geometry']
+
+    def chunks(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Rebuilds the edges `chunk_size` at a time, in order.
+
+        Args:
+            chunk_size (int, optional): Number of edges per chunk. Defaults to DEFAULT_CHUNK_SIZE.
+
+        Yields:
+            gpd.GeoDataFrame: The edges of the chunk, indexed by their position.
+        """
+        for start in range(0, len(self), chunk_size):
+            yield self.take(np.arange(start, min(start + chunk_size, len(self))))
+
+    def __getstate__(self):
+        # workers map the files themselves
+        state = self.__dict__.copy()
+        state['_arrays'] = None
+        return state
+
+    def take(self, positions):
+        """
+        Rebuilds the edges at `positions`.
+
+        Args:
+            positions (array-like): Integer positions of the edges, e.g. from `edge_incidence`.
+
+        Returns:
+            gpd.GeoDataFrame: The edges, indexed by their position.
+        """
+        arrays = self.arrays
+        rows = np.asarray(positions, dtype=np.int64)
+        values = np.asarray(arrays['columns'][rows])
+        data = {column: values[:, position] for position, column in enumerate(self.column_names)}
+        geoms = np.full(len(rows), None, dtype=object)
+        type_ids = np.asarray(arrays['type_ids'][rows])
+        part_start, part_end = arrays['geom_offsets'][rows], arrays['geom_offsets'][rows + 1]
+        # empty geometries never intersect a tile, they come back as None
+        has_parts = part_end > part_start
+        if not has_parts.any():
+            return gpd.GeoDataFrame(data, geometry=gpd.GeoSeries(geoms, index=rows), index=rows, crs=self.crs)
+        part_ids = _ranges(part_start, part_end)
+        coord_start, coord_end = arrays['part_offsets'][part_ids], arrays['part_offsets'][part_ids + 1]
+        coord_ids = _ranges(coord_start, coord_end)
+        lines = shapely.linestrings(
+            arrays['coords'][coord_ids], indices=np.repeat(np.arange(len(part_ids)), coord_end - coord_start)
+        )
+
+        n_parts = (part_end - part_start)[has_parts]
+        first_part = np.concatenate([[0], np.cumsum(n_parts)[:-1]]).astype(np.int64)
+        is_multi = type_ids[has_parts] == MULTILINESTRING
+        single = np.flatnonzero(has_parts)[~is_multi]
+        geoms[single] = np.asarray(lines)[first_part[~is_multi]]
+        if is_multi.any():
+            multi_parts = _ranges(first_part[is_multi], first_part[is_multi] + n_parts[is_multi])
+            geoms[np.flatnonzero(has_parts)[is_multi]] = shapely.multilinestrings(
+                np.asarray(lines)[multi_parts], indices=np.repeat(np.arange(is_multi.sum()), n_parts[is_multi])
+            )
+
+        return gpd.GeoDataFrame(data, geometry=gpd.GeoSeries(geoms, index=rows), index=rows, crs=self.crs)
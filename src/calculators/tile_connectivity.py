@@ -0,0 +1,125 @@
+import networkx as nx
+import numpy as np
+import shapely
+from scipy.sparse.csgraph import connected_components
+from src.calculators.tile_graph import CSRGraph
+
+
+def boundary_segments(polygon):
+    """
+    Splits the boundary of a polygon into its line segments.
+
+    Segments of the exterior ring come first, followed by the interior rings (holes),
+    and then the rings of any further parts of a multipolygon.
+
+    Args:
+        polygon (Polygon | MultiPolygon): The tile polygon.
+
+    Returns:
+        np.ndarray: Array of two point LineStrings.
+    """
+    rings = shapely.get_rings(shapely.get_parts(polygon))
+    coords, ring_idx = shapely.get_coordinates(rings, return_index=True)
+    same_ring = ring_idx[:-1] == ring_idx[1:]
+    return shapely.linestrings(np.stack([coords[:-1][same_ring], coords[1:][same_ring]], axis=1))
+
+
+def group_boundary_nodes(nodes, polygon, precision, coords=None):
+    """
+    Assigns graph nodes to the polygon boundary segment they fall on.
+
+    All nodes are matched in one pass against an STRtree of the boundary segments.
+    A node within `precision` of several segments is assigned to the first one.
+
+    Args:
+        nodes (list): Graph nodes.
+        polygon (Polygon | MultiPolygon): The tile polygon.
+        precision (float): Maximum distance of a node from the segment it is assigned to.
+        coords (np.ndarray, optional): (n, 2) coordinates of `nodes`. Defaults to None, in which
+            case the nodes themselves are taken to be coordinate tuples.
+
+    Returns:
+        dict: Mapping of segment index to the nodes on that segment, in node order.
+    """
+    segments = boundary_segments(polygon)
+    segment_point_map = {index: [] for index in range(len(segments))}
+    if len(nodes) == 0 or len(segments) == 0:
+        return segment_point_map
+
+    points = shapely.points(np.asarray(nodes, dtype=float) if coords is None else coords)
+    pt_idx, seg_idx = shapely.STRtree(segments).query(points, predicate='dwithin', distance=precision)
+    # dwithin is inclusive, keep the strict threshold
+    within = shapely.distance(points[pt_idx], segments[seg_idx]) < precision
+    pt_idx, seg_idx = pt_idx[within], seg_idx[within]
+
+    # first matching segment wins
+    order = np.lexsort((seg_idx, pt_idx))
+    pt_idx, seg_idx = pt_idx[order], seg_idx[order]
+    first_pt, first_idx = np.unique(pt_idx, return_index=True)
+    for pt, seg in zip(first_pt, seg_idx[first_idx]):
+        segment_point_map[seg].append(nodes[pt])
+    return segment_point_map
+
+
+def label_components(G):
+    """
+    Labels the connected components of a tile graph in a single traversal.
+
+    Args:
+        G (nx.Graph | CSRGraph): The tile graph.
+
+    Returns:
+        dict | np.ndarray: Mapping of node to the integer label of its connected component.
+    """
+    if isinstance(G, CSRGraph):
+        return connected_components(G.adjacency, directed=False)[1]
+    component_of = {}
+    for label, component in enumerate(nx.connected_components(G)):
+        for node in component:
+            component_of[node] = label
+    return component_of
+
+
+def connected_segment_pairs(pts_line_map, component_of, distinct_nodes=False):
+    """
+    Counts the polygon segment pairs that are connected through the tile graph.
+
+    Two segments are connected when any of their boundary nodes share a connected
+    component. This gives the same result as checking `nx.has_path` for every
+    boundary node pair, but only needs one component lookup per boundary node.
+
+    Args:
+        pts_line_map (dict): Mapping of polygon segment index to the boundary nodes on it.
+        component_of (dict | np.ndarray): Mapping of node to connected component label.
+        distinct_nodes (bool, optional): If True, a segment is only connected to itself when two
+            different nodes on it share a component. Defaults to False.
+
+    Returns:
+        tuple: (n_total, n_connected, connected_pairs) in `itertools.combinations_with_replacement` order.
+    """
+    segments = list(pts_line_map.keys())
+    n_segments = len(segments)
+    n_total = n_segments * (n_segments + 1) // 2
+
+    segment_idx = []
+    component_labels = []
+    for idx, segment in enumerate(segments):
+        for pt in pts_line_map[segment]:
+            segment_idx.append(idx)
+            component_labels.append(component_of[pt])
+    if not segment_idx:
+        return n_total, 0, []
+
+    labels, label_idx = np.unique(np.asarray(component_labels), return_inverse=True)
+    # Number of boundary nodes of each segment that fall in each component
+    counts = np.zeros((n_segments, len(labels)), dtype=np.int32)
+    np.add.at(counts, (np.asarray(segment_idx), label_idx), 1)
+    membership = (counts > 0).astype(np.int32)
+
+    connected = (membership @ membership.T) > 0
+    if distinct_nodes:
+        np.fill_diagonal(connected, (counts > 1).any(axis=1))
+
+    rows, cols = np.nonzero(np.triu(connected))
+    connected_pairs = [(segments[row], segments[col]) for row, col in zip(rows, cols)]
+    return n_total, len(connected_pairs), connected_pairs
@@ -0,0 +1,243 @@
+import networkx as nx
+import numpy as np
+import pandas as pd
+import shapely
+from scipy.sparse import csr_matrix
+
+# shapely type ids of LineString and MultiLineString
+LINE_TYPE_IDS = [1, 5]
+OSW_ENDPOINT_COLUMNS = ['_u_x', '_u_y', '_v_x', '_v_y']
+
+
+def segment_arrays(geoms):
+    """
+    Splits line geometries into their straight segments using shapely array operations.
+
+    Geometries that are not LineStrings or MultiLineStrings (e.g. points left over from
+    clipping) are skipped. Parts of a MultiLineString are not joined to each other.
+
+    Args:
+        geoms (array-like): Line geometries.
+
+    Returns:
+        tuple: (starts, ends, rows) where starts and ends are (n, 2) coordinate arrays and
+            rows holds the position of the source geometry of every segment.
+    """
+    geoms = np.asarray(geoms, dtype=object)
+    rows = np.flatnonzero(np.isin(shapely.get_type_id(geoms), LINE_TYPE_IDS))
+    parts, part_row = shapely.get_parts(geoms[rows], return_index=True)
+    coords, part_idx = shapely.get_coordinates(parts, return_index=True)
+    same_part = part_idx[:-1] == part_idx[1:]
+    return coords[:-1][same_part], coords[1:][same_part], rows[part_row[part_idx[:-1][same_part]]]
+
+
+def snap_nodes(coords, tolerance=0):
+    """
+    Snaps coordinates to a grid and gives every distinct grid point an integer node id.
+
+    Args:
+        coords (np.ndarray): (n, 2) array of projected coordinates.
+        tolerance (float, optional): Grid size. Coordinates that round to the same grid point become
+            one node. 0 only joins exactly equal coordinates. Defaults to 0.
+
+    Returns:
+        tuple: (node_ids, node_coords, n_merged) where node_ids is the int64 id of every input
+            coordinate, node_coords the coordinate of every node (its first occurrence in `coords`)
+            and n_merged the number of distinct coordinates that were merged into another node.
+    """
+    keys = np.round(coords / tolerance).astype(np.int64) if tolerance else coords
+    _, first, node_ids = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+    n_merged = len(np.unique(coords, axis=0)) - len(first) if tolerance else 0
+    return node_ids.astype(np.int64).reshape(-1), coords[first], n_merged
+
+
+def count_merged_nodes(gdf, tolerance):
+    """
+    Counts the segment endpoints of a GeoDataFrame that snapping at `tolerance` merges.
+
+    Args:
+        gdf (gpd.GeoDataFrame): The edges.
+        tolerance (float): Grid size passed to `snap_nodes`.
+
+    Returns:
+        int: Number of distinct coordinates merged into another node.
+    """
+    starts, ends, _ = segment_arrays(gdf.geometry.values)
+    return snap_nodes(np.concatenate([starts, ends]), tolerance)[2]
+
+
+def node_coordinates(G):
+    """
+    Returns the coordinates of the nodes of a segment graph, in `G.nodes()` order.
+
+    Args:
+        G (nx.Graph): Graph keyed by integer node ids (with `node_coords` in `G.graph`) or by coordinate tuples.
+
+    Returns:
+        np.ndarray: (n, 2) array of node coordinates.
+    """
+    nodes = list(G.nodes())
+    if 'node_coords' in G.graph:
+        return G.graph['node_coords'][np.asarray(nodes, dtype=np.int64)].reshape(-1, 2)
+    return np.asarray(nodes, dtype=float).reshape(len(nodes), -1)
+
+
+def snapped_segments(gdf, snap_tolerance=0):
+    """
+    Returns the segments of a GeoDataFrame of edges as pairs of snapped integer node ids.
+
+    Segments that collapse to a single node are dropped, their node is kept.
+
+    Args:
+        gdf (gpd.GeoDataFrame): The edges.
+        snap_tolerance (float, optional): Grid size passed to `snap_nodes`. Defaults to 0.
+
+    Returns:
+        tuple: (u, v, rows, node_coords, n_merged)
+    """
+    starts, ends, rows = segment_arrays(gdf.geometry.values)
+    node_ids, node_coords, n_merged = snap_nodes(np.concatenate([starts, ends]), snap_tolerance)
+    u, v = node_ids[:len(starts)], node_ids[len(starts):]
+    keep = u != v
+    return u[keep], v[keep], rows[keep], node_coords, n_merged
+
+
+def add_osw_endpoints(gdf):
+    """
+    Stores the start and end coordinates of every OSW edge in `OSW_ENDPOINT_COLUMNS`.
+
+    The columns survive clipping, so `osw_segments` can tell the OSW nodes of a clipped
+    edge apart from the points where it was cut at the tile boundary.
+
+    Args:
+        gdf (gpd.GeoDataFrame): The OSW edges, in the projection the tiles are scored in.
+
+    Returns:
+        gpd.GeoDataFrame: `gdf` with the endpoint columns added.
+    """
+    geoms = np.asarray(gdf.geometry.values, dtype=object)
+    is_line = shapely.get_type_id(geoms) == 1
+    endpoints = np.full((len(gdf), 4), np.nan)
+    endpoints[is_line, :2] = shapely.get_coordinates(shapely.get_point(geoms[is_line], 0))
+    endpoints[is_line, 2:] = shapely.get_coordinates(shapely.get_point(geoms[is_line], -1))
+    return gdf.assign(**dict(zip(OSW_ENDPOINT_COLUMNS, endpoints.T)))
+
+
+def osw_segments(gdf, precision):
+    """
+    Returns the segments of clipped OSW edges with the topology taken from `_u_id`/`_v_id`.
+
+    Every clipped part of an edge becomes a single segment. Its ends are the OSW nodes of the
+    edge where the part reaches them, and the boundary points where the edge was cut otherwise.
+    Intermediate vertices are not nodes, so edges only join at shared OSW node ids.
+
+    Args:
+        gdf (gpd.GeoDataFrame): Clipped OSW edges with `_u_id`, `_v_id` and `OSW_ENDPOINT_COLUMNS`.
+        precision (float): Distance below which a part end is taken to be the OSW node.
+
+    Returns:
+        tuple: (u, v, rows, node_coords, n_merged), see `snapped_segments`.
+    """
+    geoms = np.asarray(gdf.geometry.values, dtype=object)
+    rows = np.flatnonzero(np.isin(shapely.get_type_id(geoms), LINE_TYPE_IDS))
+    parts, part_row = shapely.get_parts(geoms[rows], return_index=True)
+    non_empty = ~shapely.is_empty(parts)
+    parts, rows = parts[non_empty], rows[part_row[non_empty]]
+    ends = np.stack([
+        shapely.get_coordinates(shapely.get_point(parts, 0)),
+        shapely.get_coordinates(shapely.get_point(parts, -1)),
+    ]).reshape(-1, 2)
+
+    endpoints = gdf[OSW_ENDPOINT_COLUMNS].to_numpy(dtype=float)[np.tile(rows, 2)]
+    at_u = np.hypot(*(ends - endpoints[:, :2]).T) < precision
+    at_v = ~at_u & (np.hypot(*(ends - endpoints[:, 2:]).T) < precision)
+    osw_node = np.where(at_u, gdf['_u_id'].to_numpy()[np.tile(rows, 2)], gdf['_v_id'].to_numpy()[np.tile(rows, 2)])
+    is_osw_node = (at_u | at_v) & pd.notna(osw_node)
+
+    # OSW nodes are keyed by id, boundary points by their exact coordinates
+    osw_codes, osw_keys = pd.factorize(osw_node[is_osw_node])
+    boundary_codes, boundary_coords, _ = snap_nodes(ends[~is_osw_node])
+    codes = np.empty(len(ends), dtype=np.int64)
+    codes[is_osw_node] = osw_codes
+    codes[~is_osw_node] = boundary_codes + len(osw_keys)
+
+    node_coords = np.empty((len(osw_keys) + len(boundary_coords), 2))
+    node_coords[osw_codes] = np.where(at_u[:, None], endpoints[:, :2], endpoints[:, 2:])[is_osw_node]
+    node_coords[len(osw_keys):] = boundary_coords
+    u, v = codes[:len(parts)], codes[len(parts):]
+    keep = u != v
+    return u[keep], v[keep], rows[keep], node_coords, 0
+
+
+def graph_from_gdf(gdf, attributes=None, snap_tolerance=0, segments=None):
+    """
+    Builds the undirected segment graph of a GeoDataFrame of edges.
+
+    Segment endpoints are snapped with `snap_nodes` and the graph is keyed by the integer
+    node ids. The node coordinates are kept in `G.graph['node_coords']` and the number of
+    merged nodes in `G.graph['merged_nodes']`. Edge attributes are only copied from the
+    GeoDataFrame when asked for.
+
+    Args:
+        gdf (gpd.GeoDataFrame): The edges.
+        attributes (list, optional): Columns of `gdf` to attach to every segment edge. Defaults to None.
+        snap_tolerance (float, optional): Grid size used to snap the endpoints. Defaults to 0.
+        segments (tuple, optional): Precomputed (u, v, rows, node_coords, n_merged), e.g. from
+            `osw_segments`. Defaults to None, in which case `snapped_segments` is used.
+
+    Returns:
+        nx.Graph: The segment graph.
+    """
+    u, v, rows, node_coords, n_merged = segments or snapped_segments(gdf, snap_tolerance)
+    G = nx.Graph(node_coords=node_coords, merged_nodes=n_merged)
+    G.add_nodes_from(range(len(node_coords)))
+    edges = zip(u.tolist(), v.tolist())
+    if attributes:
+        values = zip(*[gdf[column].to_numpy()[rows] for column in attributes])
+        G.add_edges_from((u, v, dict(zip(attributes, row_values))) for (u, v), row_values in zip(edges, values))
+    else:
+        G.add_edges_from(edges)
+    return G
+
+
+class CSRGraph:
+    """
+    Segment graph stored as a scipy.sparse CSR adjacency matrix.
+
+    Exposes the parts of the networkx graph API the tile metrics use (`nodes`, `graph`),
+    so the same metric code runs on either backend.
+    """
+
+    def __init__(self, adjacency, node_coords, merged_nodes=0):
+        self.adjacency = adjacency
+        self.graph = {'node_coords': node_coords, 'merged_nodes': merged_nodes}
+
+    def nodes(self):
+        return range(self.adjacency.shape[0])
+
+    def number_of_nodes(self):
+        return self.adjacency.shape[0]
+
+    def number_of_edges(self):
+        return self.adjacency.nnz
+
+
+def csr_graph_from_gdf(gdf, snap_tolerance=0, segments=None):
+    """
+    Builds the segment graph of a GeoDataFrame of edges as a `CSRGraph`.
+
+    Args:
+        gdf (gpd.GeoDataFrame): The edges.
+        snap_tolerance (float, optional): Grid size used to snap the endpoints. Defaults to 0.
+        segments (tuple, optional): Precomputed segments, see `graph_from_gdf`. Defaults to None.
+
+    Returns:
+        CSRGraph: The segment graph, with one stored entry per distinct segment.
+    """
+    u, v, _, node_coords, n_merged = segments or snapped_segments(gdf, snap_tolerance)
+    # store every undirected segment once, in the upper triangle
+    u, v = np.minimum(u, v), np.maximum(u, v)
+    n_nodes = len(node_coords)
+    adjacency = csr_matrix((np.ones(len(u), dtype=bool), (u, v)), shape=(n_nodes, n_nodes))
+    adjacency.sum_duplicates()
+    return CSRGraph(adjacency, node_coords, n_merged)
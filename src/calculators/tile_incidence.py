@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import shapely
+from src.calculators.shared_edges import SharedEdges
+
+# Column of the tiles holding their `edge_incidence`, so every task only ships the rows of its own tiles
+EDGE_ROWS_COLUMN = '_edge_rows'
+
+
+def edge_incidence(tile_gdf, gdf):
+    """
+    Finds the edges that touch each tile with a single bulk spatial index query.
+
+    Streamed edges are not indexed, the tiles are instead, and the edges are queried
+    against them chunk by chunk.
+
+    Args:
+        tile_gdf (gpd.GeoDataFrame): The tiles, in the same projection as `gdf`.
+        gdf (gpd.GeoDataFrame | SharedEdges): The OSW edges.
+
+    Returns:
+        pd.Series: Sorted integer positions into `gdf` of the edges intersecting each tile, indexed like `tile_gdf`.
+    """
+    if isinstance(gdf, SharedEdges):
+        tree = shapely.STRtree(np.asarray(tile_gdf.geometry.values, dtype=object))
+        tile_idx, edge_idx = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)]
+        for chunk in gdf.chunks():
+            edges, tiles = tree.query(np.asarray(chunk.geometry.values, dtype=object), predicate='intersects')
+            edge_idx.append(chunk.index.to_numpy()[edges])
+            tile_idx.append(tiles)
+        tile_idx, edge_idx = np.concatenate(tile_idx), np.concatenate(edge_idx)
+    else:
+        tile_idx, edge_idx = gdf.sindex.query_bulk(tile_gdf.geometry, predicate='intersects')
+    order = np.lexsort((edge_idx, tile_idx))
+    tile_idx, edge_idx = tile_idx[order], edge_idx[order]
+    splits = np.searchsorted(tile_idx, np.arange(1, len(tile_gdf)))
+    candidates = np.empty(len(tile_gdf), dtype=object)
+    for position, tile_edges in enumerate(np.split(edge_idx, splits)):
+        candidates[position] = tile_edges
+    return pd.Series(candidates, index=tile_gdf.index)
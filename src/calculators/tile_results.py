@@ -0,0 +1,189 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+import pandas as pd
+import shapely
+from src.calculators.shared_edges import SharedEdges
+
+# Bump when a change to the scoring changes the tra_score of a tile, so stored results are not reused
+TILE_RESULT_VERSION = 1
+# Column of the tiles holding their fingerprint while they are scored
+FINGERPRINT_COLUMN = '_fingerprint'
+
+
+def edge_digests(gdf, columns=()):
+    """
+    Hashes every edge to a 64 bit digest of its geometry and `columns`.
+
+    Args:
+        gdf (gpd.GeoDataFrame | SharedEdges): The projected OSW edges.
+        columns (list, optional): Columns the score depends on besides the geometry. Defaults to ().
+
+    Returns:
+        np.ndarray: uint64 digest of every edge, in `gdf` order.
+    """
+    if isinstance(gdf, SharedEdges):
+        chunks = [edge_digests(chunk, columns) for chunk in gdf.chunks()]
+        return np.concatenate(chunks) if chunks else np.empty(0, dtype=np.uint64)
+    wkbs = shapely.to_wkb(np.asarray(gdf.geometry.values, dtype=object))
+    values = gdf[list(columns)].astype(str).to_numpy() if columns else np.empty((len(gdf), 0))
+    digests = np.empty(len(gdf), dtype=np.uint64)
+    for position, (wkb, row) in enumerate(zip(wkbs, values)):
+        digest = hashlib.blake2b(wkb or b'', digest_size=8)
+        digest.update('\x1f'.join(row).encode())
+        digests[position] = int.from_bytes(digest.digest(), 'little')
+    return digests
+
+
+def tile_fingerprints(tile_gdf, gdf, edge_index, settings, columns=()):
+    """
+    Fingerprints every tile by its geometry and the edges it clips.
+
+    The clipped edge set of a tile only depends on the tile and the edges intersecting it,
+    so the fingerprint hashes the tile geometry with the sorted digests of its candidate
+    edges. It does not change when unrelated edges are edited or the edges are reordered.
+
+    Args:
+        tile_gdf (gpd.GeoDataFrame): The tiles, in the same projection as `gdf`.
+        gdf (gpd.GeoDataFrame | SharedEdges): The OSW edges.
+        edge_index (pd.Series): Candidate edge positions of every tile, see `edge_incidence`.
+        settings (str): Calculator settings the score depends on.
+        columns (list, optional): Edge columns the score depends on besides the geometry. Defaults to ().
+
+    Returns:
+        pd.Series: Hex fingerprint of every tile, indexed like `tile_gdf`.
+    """
+    digests = edge_digests(gdf, columns)
+    tile_wkbs = shapely.to_wkb(np.asarray(tile_gdf.geometry.values, dtype=object))
+    prefix = f'{settings}|'.encode()
+    fingerprints = []
+    for wkb, positions in zip(tile_wkbs, edge_index.loc[tile_gdf.index]):
+        fingerprint = hashlib.sha1(prefix)
+        fingerprint.update(wkb or b'')
+        fingerprint.update(np.sort(digests[positions]).tobytes())
+        fingerprints.append(fingerprint.hexdigest())
+    return pd.Series(fingerprints, index=tile_gdf.index, dtype=object)
+
+
+class TileResultStore:
+    """
+    Persistent SQLite cache of tile scores keyed by scoring version and tile fingerprint.
+
+    The database runs in WAL mode, so the workers can write scores while other jobs read
+    them. Connections are kept per process and thread and are not pickled, so the store
+    can be shipped to the workers. Once it holds more than `max_entries` scores, the least
+    recently used ones are evicted.
+    """
+
+    def __init__(self, path:str, max_entries:int=1000000, timeout:float=30, version:int=TILE_RESULT_VERSION):
+        """
+        Initializes the TileResultStore class.
+
+        Args:
+            path (str): Path of the SQLite database file, created when missing.
+            max_entries (int, optional): Number of scores kept, about 100 bytes each. Defaults to 1000000.
+            timeout (float, optional): Seconds to wait for a lock held by another process. Defaults to 30.
+            version (int, optional): Scoring version the scores belong to. Defaults to TILE_RESULT_VERSION.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.version = version
+        self._local = threading.local()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_local']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def connect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=self.timeout)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        with connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS tile_results ('
+                'version INTEGER, fingerprint TEXT, tra_score REAL NOT NULL, used_at REAL, PRIMARY KEY (version, fingerprint))'
+            )
+            connection.execute('CREATE INDEX IF NOT EXISTS tile_results_used_at ON tile_results (used_at)')
+        self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def get_many(self, fingerprints):
+        """
+        Looks up stored scores and marks them as used.
+
+        Args:
+            fingerprints (iterable): Tile fingerprints.
+
+        Returns:
+            dict: Score of every stored fingerprint. Missing fingerprints are left out.
+        """
+        fingerprints = list(dict.fromkeys(fingerprints))
+        scores = {}
+        connection = self.connect()
+        with connection:
+            # stay below the SQLite limit on bound parameters
+            for start in range(0, len(fingerprints), 500):
+                chunk = fingerprints[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                connection.execute(
+                    f'UPDATE tile_results SET used_at = ? WHERE version = ? AND fingerprint IN ({placeholders})',
+                    [time.time(), self.version, *chunk],
+                )
+                rows = connection.execute(
+                    f'SELECT fingerprint, tra_score FROM tile_results WHERE version = ? AND fingerprint IN ({placeholders})',
+                    [self.version, *chunk],
+                )
+                scores.update(rows)
+        return scores
+
+    def put_many(self, items):
+        """
+        Stores scores, replacing the ones of the same fingerprint.
+
+        Only finite scores of 0 or more are stored. The -1 of a tile that failed to score
+        and the NaN of a tile that was not scored are left out, so they are computed again.
+
+        Args:
+            items (iterable): (fingerprint, tra_score) pairs.
+        """
+        now = time.time()
+        rows = [(self.version, fingerprint, float(score), now) for fingerprint, score in items if np.isfinite(score) and score >= 0]
+        connection = self.connect()
+        with connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO tile_results (version, fingerprint, tra_score, used_at) VALUES (?, ?, ?, ?)',
+                rows,
+            )
+
+    def evict(self):
+        """
+        Drops the scores of other versions and the least recently used ones above `max_entries`.
+
+        Returns:
+            int: Number of evicted scores.
+        """
+        connection = self.connect()
+        with connection:
+            evicted = connection.execute('DELETE FROM tile_results WHERE version != ?', [self.version]).rowcount
+            excess = connection.execute('SELECT COUNT(*) FROM tile_results').fetchone()[0] - self.max_entries
+            if excess > 0:
+                evicted += connection.execute(
+                    'DELETE FROM tile_results WHERE rowid IN (SELECT rowid FROM tile_results ORDER BY used_at LIMIT ?)',
+                    [excess],
+                ).rowcount
+        return evicted
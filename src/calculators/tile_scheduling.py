@@ -0,0 +1,98 @@
+import heapq
+import dask.dataframe as dd
+import dask_geopandas
+from dask.local import MultiprocessingPoolExecutor
+import numpy as np
+import shapely
+
+# Columns qm_func records the worker and scoring time of every tile in
+WORKER_COLUMNS = ['_worker', '_busy_seconds']
+
+
+def tile_costs(tile_gdf, edge_index):
+    """
+    Estimates the relative cost of scoring each tile.
+
+    The work per tile grows with the edges that are clipped and turned into a graph,
+    and with the boundary vertices their nodes are matched against.
+
+    Args:
+        tile_gdf (gpd.GeoDataFrame): The tiles.
+        edge_index (pd.Series): Candidate edge positions of every tile, see `edge_incidence`.
+
+    Returns:
+        np.ndarray: Estimated cost of every tile, in `tile_gdf` order.
+    """
+    n_edges = np.fromiter((len(edges) for edges in edge_index), dtype=np.int64, count=len(edge_index))
+    n_vertices = shapely.get_num_coordinates(np.asarray(tile_gdf.geometry.values, dtype=object))
+    return (n_edges + 1) * np.maximum(n_vertices, 1)
+
+
+def pack_partitions(costs, n_partitions):
+    """
+    Packs tiles into partitions of similar total cost with the longest processing time first rule.
+
+    Args:
+        costs (np.ndarray): Estimated cost of every tile.
+        n_partitions (int): Number of partitions.
+
+    Returns:
+        np.ndarray: Partition of every tile. Partitions are numbered by decreasing total cost.
+    """
+    n_partitions = max(1, min(int(n_partitions), len(costs)))
+    loads = [(0, partition) for partition in range(n_partitions)]
+    labels = np.empty(len(costs), dtype=np.int64)
+    for tile in np.argsort(-np.asarray(costs), kind='stable'):
+        load, partition = heapq.heappop(loads)
+        labels[tile] = partition
+        heapq.heappush(loads, (load + costs[tile], partition))
+    # heaviest partitions first, so they are picked up by the workers first
+    totals = np.bincount(labels, weights=costs, minlength=n_partitions)
+    rank = np.empty(n_partitions, dtype=np.int64)
+    rank[np.argsort(-totals, kind='stable')] = np.arange(n_partitions)
+    return rank[labels]
+
+
+def partition_tiles(tile_gdf, labels):
+    """
+    Builds a dask GeoDataFrame with one partition per label.
+
+    Args:
+        tile_gdf (gpd.GeoDataFrame): The tiles.
+        labels (np.ndarray): Partition of every tile, see `pack_partitions`.
+
+    Returns:
+        dask_geopandas.GeoDataFrame: The tiles, partitioned by label.
+    """
+    partitions = [
+        dask_geopandas.from_geopandas(tile_gdf.iloc[np.flatnonzero(labels == label)], npartitions=1)
+        for label in np.unique(labels)
+    ]
+    return dd.concat(partitions)
+
+
+class BoundedPoolExecutor(MultiprocessingPoolExecutor):
+    """
+    Submits dask tasks to a shared multiprocessing pool while using at most `max_workers` of its processes.
+
+    The dask multiprocessing scheduler keeps as many task batches in flight as the executor
+    has workers, so a calculator only gets its share of a pool that other jobs run on too.
+    """
+
+    def __init__(self, pool, max_workers:int):
+        super().__init__(pool)
+        self._max_workers = max(1, min(self._max_workers, int(max_workers)))
+
+
+def worker_load(output):
+    """
+    Sums up the tiles and scoring time of every worker.
+
+    Args:
+        output (pd.DataFrame): Scored tiles with `WORKER_COLUMNS`.
+
+    Returns:
+        pd.DataFrame: Number of tiles and busy seconds per worker, busiest first.
+    """
+    load = output.groupby('_worker')['_busy_seconds'].agg(tiles='count', busy_seconds='sum')
+    return load.sort_values('busy_seconds', ascending=False)
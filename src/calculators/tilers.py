@@ -0,0 +1,254 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+from src.calculators.tile_graph import snap_nodes
+from src.calculators.tile_incidence import edge_incidence
+from src.calculators.tile_scheduling import tile_costs
+
+# Smallest cell size in meters, and largest number of cells, of the grid tilers
+MIN_TILE_SIZE = 10
+MAX_GRID_CELLS = 1000000
+
+
+def check_tile_size(size):
+    """
+    Checks the cell size of the grid tilers.
+
+    Args:
+        size (float): Cell size in meters.
+
+    Raises:
+        ValueError: If the size is not a number of at least `MIN_TILE_SIZE`.
+    """
+    if not np.isfinite(size) or size < MIN_TILE_SIZE:
+        raise ValueError(f'Invalid tile_size {size}, expected at least {MIN_TILE_SIZE} meters')
+
+
+def check_grid_cells(n_cols, n_rows, size):
+    """
+    Checks the number of cells of a grid before they are built.
+
+    Args:
+        n_cols (int): Number of columns.
+        n_rows (int): Number of rows.
+        size (float): Cell size, for the message.
+
+    Raises:
+        ValueError: If the grid has more than `MAX_GRID_CELLS` cells.
+    """
+    if n_cols * n_rows > MAX_GRID_CELLS:
+        raise ValueError(f'A tile_size of {size} makes {n_cols * n_rows} tiles, expected at most {MAX_GRID_CELLS}')
+
+
+def clip_cells(cells, area, crs):
+    """
+    Clips tile cells to the area and drops the ones outside of it.
+
+    Args:
+        cells (np.ndarray): Cell polygons.
+        area (Polygon): Area to cover.
+        crs: CRS of the cells.
+
+    Returns:
+        gpd.GeoDataFrame: The non-empty clipped cells.
+    """
+    cells = cells[shapely.intersects(cells, area)]
+    clipped = shapely.intersection(cells, area)
+    clipped = clipped[~shapely.is_empty(clipped) & (shapely.area(clipped) > 0)]
+    return gpd.GeoDataFrame({'geometry': clipped}, crs=crs)
+
+
+def square_grid(area, size, crs=None):
+    """
+    Covers an area with square tiles.
+
+    Args:
+        area (Polygon): Area to cover, in a projected CRS.
+        size (float): Side length of the squares, in units of the CRS.
+        crs (optional): CRS of `area`. Defaults to None.
+
+    Returns:
+        gpd.GeoDataFrame: The tiles, clipped to the area.
+
+    Raises:
+        ValueError: If the size is too small, see `check_tile_size` and `check_grid_cells`.
+    """
+    check_tile_size(size)
+    minx, miny, maxx, maxy = area.bounds
+    n_cols = max(1, int(np.ceil((maxx - minx) / size)))
+    n_rows = max(1, int(np.ceil((maxy - miny) / size)))
+    check_grid_cells(n_cols, n_rows, size)
+    xs = minx + size * np.arange(n_cols)
+    ys = miny + size * np.arange(n_rows)
+    x, y = [corner.ravel() for corner in np.meshgrid(xs, ys)]
+    return clip_cells(shapely.box(x, y, x + size, y + size), area, crs)
+
+
+def hex_grid(area, size, crs=None):
+    """
+    Covers an area with pointy-top hexagonal tiles.
+
+    Args:
+        area (Polygon): Area to cover, in a projected CRS.
+        size (float): Distance between the centres of neighbouring hexagons (their width), in units of the CRS.
+        crs (optional): CRS of `area`. Defaults to None.
+
+    Returns:
+        gpd.GeoDataFrame: The tiles, clipped to the area.
+
+    Raises:
+        ValueError: If the size is too small, see `check_tile_size` and `check_grid_cells`.
+    """
+    check_tile_size(size)
+    radius = size / np.sqrt(3)
+    minx, miny, maxx, maxy = area.bounds
+    n_cols = int(np.ceil((maxx - minx) / size)) + 2
+    n_rows = int(np.ceil((maxy - miny) / (1.5 * radius))) + 2
+    check_grid_cells(n_cols, n_rows, size)
+    col, row = [index.ravel() for index in np.meshgrid(np.arange(n_cols), np.arange(n_rows))]
+    # every other row is shifted by half a hexagon
+    cx = minx + size * (col + 0.5 * (row % 2)) - size
+    cy = miny + 1.5 * radius * row - radius
+    angles = np.deg2rad(30 + 60 * np.arange(7))
+    rings = np.stack([
+        cx[:, None] + radius * np.cos(angles),
+        cy[:, None] + radius * np.sin(angles),
+    ], axis=-1)
+    return clip_cells(shapely.polygons(rings), area, crs)
+
+
+def junction_nodes(gdf, min_degree=3):
+    """
+    Finds the nodes of the OSW edges where at least `min_degree` edges meet.
+
+    Nodes are the `_u_id`/`_v_id` ids when the edges carry them, and the edge end
+    coordinates otherwise.
+
+    Args:
+        gdf (gpd.GeoDataFrame): The OSW edges.
+        min_degree (int, optional): Minimum number of edges at a node. Defaults to 3.
+
+    Returns:
+        np.ndarray: (n, 2) coordinates of the junctions.
+    """
+    geoms = np.asarray(gdf.geometry.values, dtype=object)
+    is_line = shapely.get_type_id(geoms) == 1
+    geoms = geoms[is_line]
+    ends = np.concatenate([
+        shapely.get_coordinates(shapely.get_point(geoms, 0)),
+        shapely.get_coordinates(shapely.get_point(geoms, -1)),
+    ])
+    if {'_u_id', '_v_id'}.issubset(gdf.columns):
+        ids = pd.concat([gdf['_u_id'][is_line], gdf['_v_id'][is_line]], ignore_index=True)
+        node_ids, _ = pd.factorize(ids)
+        present = node_ids >= 0
+        node_ids, ends = node_ids[present], ends[present]
+    else:
+        node_ids = snap_nodes(ends)[0]
+    if len(node_ids) == 0:
+        return np.empty((0, 2))
+    degree = np.bincount(node_ids)
+    _, first = np.unique(node_ids, return_index=True)
+    junctions = first[degree[node_ids[first]] >= min_degree]
+    return ends[junctions]
+
+
+def junction_voronoi(gdf, area, min_degree=3, crs=None):
+    """
+    Splits an area into the Voronoi cells of the OSW junctions.
+
+    Args:
+        gdf (gpd.GeoDataFrame): The OSW edges, in the same projected CRS as `area`.
+        area (Polygon): Area to cover.
+        min_degree (int, optional): Minimum number of edges at a seed node. Defaults to 3.
+        crs (optional): CRS of `area`. Defaults to None.
+
+    Returns:
+        gpd.GeoDataFrame: The tiles, clipped to the area. A single tile when there are fewer than two junctions.
+    """
+    seeds = np.unique(junction_nodes(gdf, min_degree), axis=0)
+    if len(seeds) < 2:
+        return clip_cells(np.array([area]), area, crs)
+    cells = shapely.get_parts(shapely.voronoi_polygons(shapely.multipoints(seeds), extend_to=area))
+    return clip_cells(cells, area, crs)
+
+
+def polygonal(geoms):
+    """
+    Keeps the polygonal part of every geometry, e.g. of a collection left by an intersection.
+
+    Args:
+        geoms (np.ndarray): Geometries.
+
+    Returns:
+        np.ndarray: Polygons, MultiPolygons or empty geometries.
+    """
+    geoms = geoms.copy()
+    collections = np.flatnonzero(shapely.get_type_id(geoms) == 7)
+    for position in collections:
+        parts = shapely.get_parts(geoms[position])
+        geoms[position] = shapely.union_all(parts[np.isin(shapely.get_type_id(parts), [3, 6])])
+    return geoms
+
+
+def bisect(tiles):
+    """
+    Cuts every tile in two across the longer side of its bounding box.
+
+    Args:
+        tiles (np.ndarray): Tile polygons.
+
+    Returns:
+        tuple: (pieces, source) where source is the position in `tiles` every non-empty piece comes from.
+    """
+    minx, miny, maxx, maxy = shapely.bounds(tiles).T
+    wide = (maxx - minx) >= (maxy - miny)
+    midx, midy = (minx + maxx) / 2, (miny + maxy) / 2
+    first = shapely.box(minx, miny, np.where(wide, midx, maxx), np.where(wide, maxy, midy))
+    second = shapely.box(np.where(wide, midx, minx), np.where(wide, miny, midy), maxx, maxy)
+    pieces = polygonal(shapely.intersection(np.concatenate([tiles, tiles]), np.concatenate([first, second])))
+    source = np.tile(np.arange(len(tiles)), 2)
+    keep = ~shapely.is_empty(pieces) & (shapely.area(pieces) > 0)
+    # keep the two pieces of a tile next to each other
+    order = np.argsort(source[keep], kind='stable')
+    return pieces[keep][order], source[keep][order]
+
+
+def split_tiles(tile_gdf, gdf, max_cost, max_depth=8):
+    """
+    Splits tiles until their estimated cost (see `tile_costs`) is within a budget.
+
+    Tiles over the budget are cut in half, and the halves are checked again, at most
+    `max_depth` times.
+
+    Args:
+        tile_gdf (gpd.GeoDataFrame): The tiles, in the same projected CRS as `gdf`.
+        gdf (gpd.GeoDataFrame): The OSW edges.
+        max_cost (float): Cost budget of a tile.
+        max_depth (int, optional): Maximum number of times a tile is cut. Defaults to 8.
+
+    Returns:
+        gpd.GeoDataFrame: The tiles with a `parent_tile` column holding the index of the tile they were cut from.
+    """
+    tiles = np.asarray(tile_gdf.geometry.values, dtype=object)
+    origin = np.arange(len(tiles))
+    done_tiles, done_origin = [], []
+    for depth in range(max_depth + 1):
+        candidates = gpd.GeoDataFrame({'geometry': tiles}, crs=tile_gdf.crs)
+        over = tile_costs(candidates, edge_incidence(candidates, gdf)) > max_cost
+        if depth == max_depth:
+            over[:] = False
+        done_tiles.append(tiles[~over])
+        done_origin.append(origin[~over])
+        if not over.any():
+            break
+        tiles, source = bisect(tiles[over])
+        origin = origin[over][source]
+
+    origin = np.concatenate(done_origin)
+    order = np.argsort(origin, kind='stable')
+    return gpd.GeoDataFrame({
+        'geometry': np.concatenate(done_tiles)[order],
+        'parent_tile': tile_gdf.index.to_numpy()[origin[order]],
+    }, crs=tile_gdf.crs)
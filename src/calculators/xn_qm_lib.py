@@ -12,12 +12,19 @@ from shapely.ops import voronoi_diagram
 import itertools
 import numpy as np
 import pandas as pd
+import tempfile
+from src.calculators.shared_edges import SharedEdges
+from src.calculators.tile_incidence import edge_incidence, EDGE_ROWS_COLUMN
+from src.calculators.tile_graph import graph_from_gdf as build_segment_graph, node_coordinates
+from src.calculators.tile_connectivity import group_boundary_nodes, label_components, connected_segment_pairs
 
 import warnings
 warnings.filterwarnings("ignore")
 
 PROJ = 'epsg:26910'
 PRES = 1e-5
+TRA_ENGINE = 'components' # or 'pairwise' for the nx.has_path reference implementation
+SNAP = 0 # grid size edge endpoints are snapped to, 0 only joins exactly equal endpoints
 
 
 def add_edges_from_linestring(graph, linestring, edge_attrs):
@@ -27,39 +34,14 @@ def add_edges_from_linestring(graph, linestring, edge_attrs):
         graph.add_edge(start, end, **edge_attrs)
 
 
-def graph_from_gdf(gdf):
-    # Initialize an empty graph
-    G = nx.Graph()
-
-    # Iterate through each row in the GeoDataFrame
-    for index, row in gdf.iterrows():
-        geom = row.geometry
-        if isinstance(geom, LineString):
-            add_edges_from_linestring(G, geom, row.to_dict())
-        elif isinstance(geom, MultiLineString):
-            for linestring in geom.geoms:
-                add_edges_from_linestring(G, linestring, row.to_dict())
-    return G
+def graph_from_gdf(gdf, attributes=None):
+    # Segment graph built from coordinate arrays, OSW attributes are only copied when asked for
+    return build_segment_graph(gdf, attributes, SNAP)
 
 
 def group_G_pts(G, poly):
-    P = poly
-    
-    node_pts = [Point(x) for x in G.nodes()]
-    # Get polygon boundary as a list of line segments
-    boundary = list(P.boundary.coords)
-    segments = [LineString([boundary[i], boundary[i + 1]]) for i in range(len(boundary) - 1)]
-
-    # Dictionary to hold points grouped by line segments
-    segment_point_map = {index: [] for index in range(len(segments))}
-
-    # Group points by which line segment they fall on
-    for point in node_pts:
-        for idx, segment in enumerate(segments):
-            if segment.distance(point) < PRES:  # Small threshold for precision issues
-                segment_point_map[idx].append((point.x, point.y))
-                break
-    return segment_point_map
+    # Group points by which polygon boundary segment (exterior or hole) they fall on
+    return group_boundary_nodes(list(G.nodes()), poly, PRES, node_coordinates(G))
 
 
 def edges_are_connected(G, e1_pts, e2_pts):
@@ -72,11 +54,16 @@ def edges_are_connected(G, e1_pts, e2_pts):
     return False 
 
 
-def tile_tra_score(G, polygon):
+def tile_tra_score(G, polygon, engine=None):
     # assign each point to an polygon line
     pts_line_map = group_G_pts(G, polygon) 
-    boundary_nodes = [item for sublist in pts_line_map.values() for item in sublist]
+    if (engine or TRA_ENGINE) == 'pairwise':
+        return pairwise_tra_score(G, pts_line_map)
+    # node self to self is not counted as connected, same as edges_are_connected
+    return connected_segment_pairs(pts_line_map, label_components(G), distinct_nodes=True)
+
 
+def pairwise_tra_score(G, pts_line_map):
     # find all pair of edges
     edge_pairs = list(itertools.combinations_with_replacement(pts_line_map.keys(), 2))
 
@@ -125,6 +112,10 @@ def get_measures_from_polygon(polygon, gdf):
 def qm_func(feature, gdf):
     poly = feature.geometry
     if (poly.geom_type == "Polygon" or poly.geom_type == "MultiPolygon"):
+        if EDGE_ROWS_COLUMN in feature.index:
+            # only clip the edges known to touch this tile
+            gdf = gdf.take(feature[EDGE_ROWS_COLUMN])
+            feature = feature.drop(EDGE_ROWS_COLUMN)
         measures = get_measures_from_polygon(poly, gdf)
         feature.loc['tra_score'] = measures["tra_score"]
         return feature
@@ -169,15 +160,21 @@ def calculate_xn_qm(osw_edge_file_path: str, qm_file_path: str, xn_polygon_path:
         tile_gdf = tile_gdf.to_crs(PROJ)
         tile_gdf = tile_gdf[['geometry']]
 
+        # Find the candidate edges of every tile in one pass, each partition carries those of its tiles
+        tile_gdf[EDGE_ROWS_COLUMN] = edge_incidence(tile_gdf, gdf)
+
         # Compute local stats using dask-geopandas
         no_of_cores = os.cpu_count()
         df_dask = dask_geopandas.from_geopandas(tile_gdf, npartitions=no_of_cores)
 
         # print('computing stats...')
-        output = df_dask.apply(qm_func, axis=1, meta=[
-            ('geometry', 'geometry'),
-            ('tra_score', 'object'),
-        ], gdf=gdf).compute(scheduler='multiprocessing')
+        with tempfile.TemporaryDirectory() as shared_dir:
+            # map the edges into the workers instead of pickling them into every task
+            edges = SharedEdges.from_gdf(gdf, shared_dir) if SharedEdges.supports(gdf) else gdf
+            output = df_dask.apply(qm_func, axis=1, meta=[
+                ('geometry', 'geometry'),
+                ('tra_score', 'object'),
+            ], gdf=edges).compute(scheduler='multiprocessing')
 
         output.to_file(qm_file_path, driver='GeoJSON')
 
@@ -12,14 +12,52 @@ class Config(BaseSettings):
     incoming_topic_subscription: str = os.environ.get('QUALITY_REQ_SUB', '')
     outgoing_topic_name: str = os.environ.get('QUALITY_RES_TOPIC', '')
     storage_container_name: str = os.environ.get('CONTAINER_NAME', 'osw')
+    storage_chunk_size: int = os.environ.get('STORAGE_CHUNK_SIZE', 8 * 1024 * 1024)
+    storage_max_concurrency: int = os.environ.get('STORAGE_MAX_CONCURRENCY', 4)
+    dataset_cache_dir: str = os.environ.get('DATASET_CACHE_DIR', '')
+    dataset_cache_max_bytes: int = os.environ.get('DATASET_CACHE_MAX_BYTES', 10 * 1024 * 1024 * 1024)
     algorithm_dictionary: dict = {"fixed": QMFixedCalculator, "ixn": QMXNLibCalculator}
     max_concurrent_messages: int = os.environ.get('MAX_CONCURRENT_MESSAGES', 1)
     partition_count: int = os.environ.get('PARTITION_COUNT', 2)
+    worker_pool_size: int = os.environ.get('WORKER_POOL_SIZE', 2)
+    worker_max_tasks: int = os.environ.get('WORKER_MAX_TASKS', 100)
+    ixn_topology: str = os.environ.get('IXN_TOPOLOGY', 'geometry')
+    ixn_tiler: str = os.environ.get('IXN_TILER', 'osmnx')
+    ixn_tile_size: float = os.environ.get('IXN_TILE_SIZE', 200)
+    ixn_max_tile_cost: float = os.environ.get('IXN_MAX_TILE_COST', 0)
+    ixn_ingest: str = os.environ.get('IXN_INGEST', 'memory')
+    ixn_chunk_size: int = os.environ.get('IXN_CHUNK_SIZE', 10000)
+    output_format: str = os.environ.get('OUTPUT_FORMAT', 'geojson')
+    output_compression: str = os.environ.get('OUTPUT_COMPRESSION', 'deflate')
+    output_compression_level: int = os.environ.get('OUTPUT_COMPRESSION_LEVEL', 6)
+    road_network_extract: str = os.environ.get('ROAD_NETWORK_EXTRACT', '')
+    road_network_cache_dir: str = os.environ.get('ROAD_NETWORK_CACHE_DIR', '')
+    tile_result_store: str = os.environ.get('TILE_RESULT_STORE', '')
+    tile_result_cache: bool = os.environ.get('TILE_RESULT_CACHE', True)
+    tile_result_max_entries: int = os.environ.get('TILE_RESULT_MAX_ENTRIES', 1000000)
 
     def get_download_folder(self) -> str:
         root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         return os.path.join(root_dir, 'downloads')
 
+    def get_dataset_cache_folder(self) -> str:
+        if self.dataset_cache_dir:
+            return self.dataset_cache_dir
+        root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        return os.path.join(root_dir, 'cache', 'datasets')
+
+    def get_road_network_cache_folder(self) -> str:
+        if self.road_network_cache_dir:
+            return self.road_network_cache_dir
+        root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        return os.path.join(root_dir, 'cache', 'road_networks')
+
+    def get_tile_result_store_path(self) -> str:
+        if self.tile_result_store:
+            return self.tile_result_store
+        root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        return os.path.join(root_dir, 'cache', 'tile_results.sqlite')
+
     def get_assets_folder(self) -> str:
         root_dir = os.path.dirname(os.path.abspath(__file__))
         return os.path.join(root_dir, 'assets')
@@ -8,6 +8,9 @@ class RequestData:
     data_file: str
     algorithm: str
     sub_regions_file: Optional[str] = None
+    tiler: Optional[str] = None
+    tile_size: Optional[float] = None
+    output_format: Optional[str] = None
 
 
 @dataclass
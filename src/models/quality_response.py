@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import Optional
 
 
 @dataclass
@@ -8,6 +9,7 @@ class ResponseData:
     success: bool
     dataset_url:str
     qm_dataset_url:str
+    output_format: Optional[str] = None
 
 @dataclass
 class QualityMetricResponse:
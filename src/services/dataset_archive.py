@@ -0,0 +1,74 @@
+import logging
+import os
+import zipfile
+
+logger = logging.getLogger("DatasetArchive")
+logger.setLevel(logging.INFO)
+
+# Compressions GDAL reads from inside a zip, members compressed otherwise are extracted
+VSIZIP_COMPRESSIONS = (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED)
+
+
+class DatasetArchive:
+    """
+    The dataset zip of a job, of which only the layers the algorithms need are read.
+
+    Only the central directory is read up front. A layer is read in place through GDAL's
+    `/vsizip/` file system, so the other layers of the dataset are never decompressed.
+    Members GDAL cannot read from the zip are extracted alone.
+    """
+
+    def __init__(self, file_path:str):
+        """
+        Initializes the DatasetArchive class and reads the central directory of the zip.
+
+        Args:
+            file_path (str): Path to the dataset zip file.
+        """
+        self.file_path = os.path.abspath(file_path)
+        with zipfile.ZipFile(self.file_path, 'r') as input_zip:
+            self.members = [member for member in input_zip.infolist() if not member.is_dir()]
+
+    def names(self):
+        """
+        Returns the names of the files in the zip.
+
+        Returns:
+            list: The member names.
+        """
+        return [member.filename for member in self.members]
+
+    def find(self, layer:str):
+        """
+        Finds the member of a layer, the first one with the layer name in its path.
+
+        Args:
+            layer (str): Name of the layer, e.g. 'edges'.
+
+        Returns:
+            zipfile.ZipInfo: The member, None if the zip has no such layer.
+        """
+        for member in self.members:
+            if layer in member.filename:
+                return member
+        return None
+
+    def layer_path(self, layer:str, extract_folder:str):
+        """
+        Returns a path GDAL reads a layer from, without extracting the rest of the zip.
+
+        Args:
+            layer (str): Name of the layer, e.g. 'edges'.
+            extract_folder (str): Folder the member is extracted to when GDAL cannot read it from the zip.
+
+        Returns:
+            str: The `/vsizip/` path of the member or the path of the extracted file, None if the zip has no such layer.
+        """
+        member = self.find(layer)
+        if member is None:
+            return None
+        if member.compress_type in VSIZIP_COMPRESSIONS:
+            return f'/vsizip/{self.file_path}/{member.filename}'
+        logger.info(f'Extracting {member.filename}, its compression cannot be read in place')
+        with zipfile.ZipFile(self.file_path, 'r') as input_zip:
+            return input_zip.extract(member, extract_folder)
@@ -0,0 +1,197 @@
+import collections
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import Future
+from urllib.parse import urlparse
+
+logger = logging.getLogger("DatasetCache")
+logger.setLevel(logging.INFO)
+
+PART_SUFFIX = '.part'
+
+
+class DatasetCache:
+    """
+    Local cache of the input files of the jobs, so a dataset submitted again with other
+    algorithms is not downloaded again.
+
+    Files are content addressed: the key is the URL of the file, without its query as that
+    holds a SAS token that differs between messages, plus the ETag and size of the blob, so
+    a blob that is overwritten gets a new entry. The blob resolved by `open` is the one
+    downloaded, on the condition that it still has that ETag, so an entry always holds the
+    version of its key. Concurrent messages referencing the same file share one in-flight
+    download. Files are pinned while a message uses them and the least recently used
+    unpinned files are evicted once the folder is over its quota.
+    """
+
+    def __init__(self, directory:str, max_bytes:int):
+        """
+        Initializes the DatasetCache class and removes the partial downloads of earlier runs.
+
+        Args:
+            directory (str): Folder the cached files are kept in.
+            max_bytes (int): Disk quota of the folder in bytes, 0 disables the cache.
+        """
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.downloads = {}
+        self.pins = collections.Counter()
+        # (blob_client, properties) of the paths returned by open, until they are released
+        self.remote_blobs = {}
+        if self.enabled:
+            os.makedirs(self.directory, exist_ok=True)
+            for name in os.listdir(self.directory):
+                if name.endswith(PART_SUFFIX):
+                    os.remove(os.path.join(self.directory, name))
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def cache_path(self, url:str, etag:str, size:int) -> str:
+        """
+        Returns the path a version of a remote file is cached at.
+
+        Args:
+            url (str): URL of the file.
+            etag (str): ETag of the blob.
+            size (int): Size of the blob in bytes.
+
+        Returns:
+            str: The path, which keeps the extension of the file.
+        """
+        parsed_url = urlparse(url)
+        address = parsed_url._replace(query='', fragment='').geturl()
+        key = hashlib.sha256(f'{address}\n{etag}\n{size}'.encode()).hexdigest()
+        return os.path.join(self.directory, key + os.path.splitext(parsed_url.path)[1])
+
+    def is_cached(self, path:str) -> bool:
+        return os.path.dirname(path) == self.directory
+
+    def open(self, url:str, fallback_path:str, storage_service) -> str:
+        """
+        Resolves the local path of a remote file and pins it until `release`.
+
+        Args:
+            url (str): URL of the file.
+            fallback_path (str): Path the file is downloaded to when it cannot be cached.
+            storage_service (StorageService): Service the blob of the file is resolved with.
+
+        Returns:
+            str: The path in the cache, `fallback_path` if the cache is disabled, the storage
+            cannot tell the version of the file or the file is larger than the quota.
+        """
+        if not self.enabled:
+            return fallback_path
+        try:
+            remote_blob = storage_service.get_remote_blob(url)
+        except Exception as e:
+            # the download reports the error if the file is really missing
+            logger.warning(f'Not caching {url}, its properties could not be read: {e}')
+            return fallback_path
+        if remote_blob is None:
+            return fallback_path
+        properties = remote_blob[1]
+        path = fallback_path
+        if properties.size <= self.max_bytes:
+            path = self.cache_path(url, properties.etag, properties.size)
+        with self.lock:
+            if self.is_cached(path):
+                self.pins[path] += 1
+            self.remote_blobs[path] = remote_blob
+        return path
+
+    def fetch(self, url:str, path:str, storage_service) -> str:
+        """
+        Makes sure the file at a path returned by `open` is downloaded.
+
+        A cached file is used as is, a file another message is downloading is waited for.
+
+        Args:
+            url (str): URL of the file.
+            path (str): The path returned by `open`.
+            storage_service (StorageService): Service the file is downloaded with.
+
+        Returns:
+            str: The path.
+
+        Raises:
+            azure.core.exceptions.ResourceModifiedError: If the blob was overwritten since `open`.
+        """
+        with self.lock:
+            remote_blob = self.remote_blobs.get(path)
+        if not self.is_cached(path):
+            storage_service.download_remote_file(url, path, remote_blob=remote_blob)
+            return path
+        with self.lock:
+            if os.path.exists(path):
+                # the modification time orders the files for eviction
+                os.utime(path)
+                logger.info(f'Using cached file {path} for {url}')
+                return path
+            download = self.downloads.get(path)
+            if download is None:
+                download = self.downloads[path] = Future()
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            logger.info(f'Waiting for the download of {url} by another message')
+            return download.result()
+        part_path = path + PART_SUFFIX
+        try:
+            storage_service.download_remote_file(url, part_path, remote_blob=remote_blob)
+            os.replace(part_path, path)
+        except BaseException as e:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            with self.lock:
+                del self.downloads[path]
+            download.set_exception(e)
+            raise
+        with self.lock:
+            del self.downloads[path]
+        download.set_result(path)
+        logger.info(f'Cached {url} at {path}')
+        self.evict()
+        return path
+
+    def release(self, path:str):
+        """
+        Unpins a path returned by `open`, once the message is done with the file.
+
+        Args:
+            path (str): The path.
+        """
+        with self.lock:
+            if not self.is_cached(path):
+                self.remote_blobs.pop(path, None)
+                return
+            self.pins[path] -= 1
+            if self.pins[path] <= 0:
+                del self.pins[path]
+                self.remote_blobs.pop(path, None)
+        self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used files that are not pinned until the folder fits its quota.
+        """
+        with self.lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and not entry.name.endswith(PART_SUFFIX):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if path in self.pins:
+                    continue
+                os.remove(path)
+                total -= size
+                logger.info(f'Evicted {path} from the dataset cache')
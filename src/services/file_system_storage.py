@@ -0,0 +1,122 @@
+import os
+import shutil
+import urllib.parse
+from pathlib import Path
+from types import SimpleNamespace
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceModifiedError
+
+
+class FileSystemBlobClient:
+    """
+    Filesystem-backed stand-in for the part of the azure `BlobClient` that the chunked transfers of
+    `StorageService` use, so they can run offline.
+
+    Staged blocks are kept in a folder next to the blob until the block list is committed.
+    """
+
+    def __init__(self, root:str, blob_name:str):
+        """
+        Initializes the FileSystemBlobClient class.
+
+        Args:
+            root (str): Folder the blobs of the container are stored in.
+            blob_name (str): Name of the blob, a path relative to `root`.
+        """
+        self.blob_name = blob_name
+        self.path = os.path.join(root, blob_name)
+        self.blocks_path = os.path.join(root, '.blocks', blob_name)
+        self.url = Path(os.path.abspath(self.path)).as_uri()
+
+    @staticmethod
+    def _etag(stat):
+        return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+    def get_blob_properties(self):
+        stat = os.stat(self.path)
+        return SimpleNamespace(name=self.blob_name, size=stat.st_size, etag=self._etag(stat))
+
+    def download_blob(self, offset:int=None, length:int=None, etag:str=None, match_condition:MatchConditions=None):
+        with open(self.path, 'rb') as blob_file:
+            # commits replace the file, so the open file is a single version
+            if match_condition == MatchConditions.IfNotModified and self._etag(os.fstat(blob_file.fileno())) != etag:
+                raise ResourceModifiedError('The condition specified using HTTP conditional header(s) is not met.')
+            blob_file.seek(offset or 0)
+            data = blob_file.read(-1 if length is None else length)
+        return SimpleNamespace(readall=lambda: data)
+
+    def stage_block(self, block_id:str, data, length:int=None, **kwargs):
+        os.makedirs(self.blocks_path, exist_ok=True)
+        with open(os.path.join(self.blocks_path, block_id), 'wb') as block_file:
+            block_file.write(data)
+
+    def commit_block_list(self, block_list, **kwargs):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        part_path = f'{self.path}.part'
+        with open(part_path, 'wb') as blob_file:
+            for block in block_list:
+                block_id = getattr(block, 'id', block)
+                with open(os.path.join(self.blocks_path, block_id), 'rb') as block_file:
+                    shutil.copyfileobj(block_file, blob_file)
+        os.replace(part_path, self.path)
+        shutil.rmtree(self.blocks_path, ignore_errors=True)
+
+
+class FileSystemFileEntity:
+    """
+    Stand-in for the file entities of `python_ms_core`, backed by a `FileSystemBlobClient`.
+    """
+
+    def __init__(self, name:str, blob_client:FileSystemBlobClient):
+        self.name = name
+        self.file_path = name
+        self.blob_client = blob_client
+
+    def get_stream(self):
+        return self.blob_client.download_blob().readall()
+
+    def upload(self, upload_stream):
+        data = upload_stream if isinstance(upload_stream, bytes) else upload_stream.read()
+        self.blob_client.stage_block('0', data)
+        self.blob_client.commit_block_list(['0'])
+
+    def get_remote_url(self):
+        return self.blob_client.url
+
+
+class FileSystemStorageContainer:
+    """
+    Stand-in for the storage containers of `python_ms_core`, a folder under the storage root.
+    """
+
+    def __init__(self, root:str, name:str):
+        self.root = os.path.join(root, name)
+        self.name = name
+
+    def create_file(self, name:str):
+        return FileSystemFileEntity(name, FileSystemBlobClient(self.root, name))
+
+
+class FileSystemStorageClient:
+    """
+    Stand-in for the storage client of `python_ms_core` that keeps the containers in a local folder.
+
+    The remote URL of a file is its `file://` URL, `get_file_from_url` resolves those URLs back.
+    """
+
+    def __init__(self, root:str):
+        """
+        Initializes the FileSystemStorageClient class.
+
+        Args:
+            root (str): Folder the containers are stored in.
+        """
+        self.root = os.path.abspath(root)
+
+    def get_container(self, container_name:str):
+        return FileSystemStorageContainer(self.root, container_name)
+
+    def get_file_from_url(self, container_name:str, full_url:str):
+        container_root = os.path.join(self.root, container_name)
+        path = urllib.parse.unquote(urllib.parse.urlparse(full_url).path)
+        return self.get_container(container_name).create_file(os.path.relpath(path, container_root))
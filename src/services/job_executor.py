@@ -0,0 +1,79 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+logger = logging.getLogger("JobExecutor")
+logger.setLevel(logging.INFO)
+
+# Algorithms that keep the CPU busy, the others mostly wait on file I/O
+CPU_BOUND_ALGORITHMS = ('ixn',)
+
+
+class JobExecutor:
+    """
+    Runs the independent calculators of a job concurrently under a shared CPU budget.
+
+    Every algorithm runs on its own thread of the job process. The I/O bound ones keep
+    one core of the budget for that thread, and the CPU bound ones split the rest into
+    the number of worker processes they run on at the same time.
+    """
+
+    def __init__(self, cpu_budget:int):
+        """
+        Initializes the JobExecutor class.
+
+        Args:
+            cpu_budget (int): Cores the algorithms of a job share, usually the partition count.
+        """
+        self.cpu_budget = max(1, int(cpu_budget))
+
+    def cpu_shares(self, algorithm_names):
+        """
+        Splits the CPU budget between the algorithms of a job.
+
+        Args:
+            algorithm_names (list): Names of the algorithms of the job.
+
+        Returns:
+            dict: Cores of every algorithm, at least one each.
+        """
+        cpu_bound = [name for name in algorithm_names if name in CPU_BOUND_ALGORITHMS]
+        shares = {name: 1 for name in algorithm_names if name not in CPU_BOUND_ALGORITHMS}
+        if cpu_bound:
+            cores = max(1, (self.cpu_budget - len(shares)) // len(cpu_bound))
+            shares.update((name, cores) for name in cpu_bound)
+        return shares
+
+    def run(self, tasks):
+        """
+        Runs the tasks concurrently and logs the time each one took as it finishes.
+
+        Args:
+            tasks (dict): Task of every algorithm name, a callable without arguments.
+
+        Returns:
+            dict: Result of every algorithm name.
+
+        Raises:
+            Exception: The first error of a task, once all of the tasks are done.
+        """
+        def timed(name, task):
+            start_time = time.time()
+            result = task()
+            return result, time.time() - start_time
+
+        results, errors = {}, []
+        with ThreadPoolExecutor(max_workers=max(1, len(tasks)), thread_name_prefix='qm-job') as executor:
+            futures = {executor.submit(timed, name, task): name for name, task in tasks.items()}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    results[name], seconds = future.result()
+                except Exception as e:
+                    logger.error(f'Failed to calculate quality metrics for {name}: {e}')
+                    errors.append(e)
+                    continue
+                logger.info(f"Time taken to calculate quality metrics for {name}: {seconds} seconds")
+        if errors:
+            raise errors[0]
+        return results
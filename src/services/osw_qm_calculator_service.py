@@ -1,6 +1,12 @@
-import zipfile
+from concurrent.futures import Future
 from src.config import Config
 from src.calculators import QMXNLibCalculator, QMFixedCalculator, QMCalculator
+from src.calculators.edges_dataset import EdgesDataset
+from src.calculators.shared_edges import DEFAULT_CHUNK_SIZE
+from src.calculators.output_formats import output_extension, DEFAULT_OUTPUT_FORMAT
+from src.calculators.output_archive import OutputArchive, DEFAULT_COMPRESSION, DEFAULT_COMPRESSION_LEVEL
+from src.services.job_executor import JobExecutor
+from src.services.dataset_archive import DatasetArchive
 import json
 import os
 import tempfile
@@ -22,22 +28,45 @@ class OswQmCalculator:
     Methods:
         calculate_quality_metric: Calculates quality metrics for input files using specified algorithms.
         zip_folder: Zips a folder and its contents.
-        extract_zip: Extracts a zip file to a specified folder.
         parse_and_calculate_quality_metric: Parses and calculates quality metrics for a specific input file.
 
     """
 
-    def __init__(self, cores_to_use:int):
+    def __init__(self, cores_to_use:int, topology:str='geometry', pool=None, road_network=None, tiler:str='osmnx', tile_size:float=200, max_tile_cost:float=0, result_store=None, ingest:str='memory', chunk_size:int=DEFAULT_CHUNK_SIZE, output_format:str=DEFAULT_OUTPUT_FORMAT, compression:str=DEFAULT_COMPRESSION, compression_level:int=DEFAULT_COMPRESSION_LEVEL):
         """
         Initializes the OswQmCalculator class.
 
         Args:
             cores_to_use (int): The number of cores to use for calculating quality metrics.
+            topology (str, optional): Network topology used by the ixn calculator ('geometry' or 'osw'). Defaults to 'geometry'.
+            pool (multiprocessing.pool.Pool, optional): Warm worker pool reused by the ixn calculator. Defaults to None.
+            road_network (RoadNetworkSource, optional): Drive network source used by the ixn calculator when no sub regions file is given. Defaults to None.
+            tiler (str, optional): Tiler used by the ixn calculator when no sub regions file is given. Defaults to 'osmnx'.
+            tile_size (float, optional): Cell size in meters of the grid tilers. Defaults to 200.
+            max_tile_cost (float, optional): Cost budget above which the ixn calculator splits tiles. Defaults to 0 (no splitting).
+            result_store (TileResultStore, optional): Store of earlier tile scores the ixn calculator reuses. Defaults to None.
+            ingest (str, optional): How the ixn calculator loads the edges ('memory' or 'stream'). Defaults to 'memory'.
+            chunk_size (int, optional): Number of edges the 'stream' ingest holds in memory at a time. Defaults to DEFAULT_CHUNK_SIZE.
+            output_format (str, optional): Format of the output files ('geojson', 'flatgeobuf' or 'geoparquet'). Defaults to 'geojson'.
+            compression (str, optional): Compression of the output zip entries ('stored', 'deflate' or 'zstd'). Defaults to 'deflate'.
+            compression_level (int, optional): Level of the compression. Defaults to 6.
 
         """
         self.cores_to_use = cores_to_use
-
-    def calculate_quality_metric(self, input_file, algorithm_names, output_path, ixn_file=None):
+        self.topology = topology
+        self.pool = pool
+        self.road_network = road_network
+        self.tiler = tiler
+        self.tile_size = tile_size
+        self.max_tile_cost = max_tile_cost
+        self.result_store = result_store
+        self.ingest = ingest
+        self.chunk_size = chunk_size
+        self.output_format = output_format
+        self.compression = compression
+        self.compression_level = compression_level
+
+    def calculate_quality_metric(self, input_file, algorithm_names, output_path, ixn_file=None, ixn_download=None):
         """
         Calculates quality metrics for input files using specified algorithms.
 
@@ -45,33 +74,36 @@ class OswQmCalculator:
             input_file (str): The path to the input file. (dataset.zip file)
             algorithm_names (list): A list of algorithm names to be used for calculating quality metrics.
             output_path (str): The path to the output zip file.
+            ixn_file (str, optional): The path to the sub regions file. Defaults to None.
+            ixn_download (Future, optional): Download of `ixn_file` that may still be running, the ixn calculator waits for it after reading the edges. Defaults to None.
 
         Returns:
             None
 
         """
         try:
-            with zipfile.ZipFile(input_file, 'r') as input_zip:
-                input_unzip_folder = tempfile.TemporaryDirectory()
-                input_files_path = self.extract_zip(input_zip, input_unzip_folder.name)
-            # logging.info(f"Extracted input files: {file_list}")
-            # input_files_path = [os.path.join(input_unzip_folder.name, file) for file in file_list]
-            output_unzip_folder = tempfile.TemporaryDirectory()
+            dataset = DatasetArchive(input_file)
+            input_files_path = dataset.names()
             logger.info(f"Started calculating quality metrics for input files: {input_files_path}")
-            # Get only the edges file out of the input files
-            edges_file_path = [file_path for file_path in input_files_path if 'edges' in file_path]
-            if len(edges_file_path) == 0:
+            # Get only the edges file out of the input files, the algorithms read nothing else
+            input_unzip_folder = tempfile.TemporaryDirectory()
+            edges_file_path = dataset.layer_path('edges', input_unzip_folder.name)
+            if edges_file_path is None:
                 raise Exception('Edges file not found in input files.')
-            edges_file_path = edges_file_path[0]
-            edges_file_basename = os.path.basename(edges_file_path)
-            edges_file_without_extension = os.path.splitext(edges_file_basename)[0]
-            for algorithm_name in algorithm_names:
-                qm_edges_output_path = os.path.join(output_unzip_folder.name, f'{algorithm_name}_qm.geojson')
-                qm_calculator = self.get_osw_qm_calculator(algorithm_name, ixn_file, edges_file_path, qm_edges_output_path)
-                start_time = time.time()
-                qm_calculator.calculate_quality_metric()
-                end_time = time.time()
-                logger.info(f"Time taken to calculate quality metrics for {algorithm_name}: {end_time - start_time} seconds")
+            # read the edges once for all the algorithms
+            edges = EdgesDataset(edges_file_path)
+            executor = JobExecutor(self.cores_to_use)
+            cpu_shares = executor.cpu_shares(list(dict.fromkeys(algorithm_names)))
+            logger.info(f'Writing output files to {output_path}')
+            with OutputArchive(output_path, self.compression, self.compression_level) as output_archive:
+                tasks = {}
+                for algorithm_name, cores in cpu_shares.items():
+                    qm_edges_output_name = f'{algorithm_name}_qm{output_extension(self.output_format)}'
+                    qm_calculator = self.get_osw_qm_calculator(algorithm_name, ixn_file, edges_file_path, qm_edges_output_name, edges, cores, output_archive, ixn_download)
+                    tasks[algorithm_name] = qm_calculator.calculate_quality_metric
+                # every calculator writes its output into the zip as soon as it is done
+                executor.run(tasks)
+            edges.release()
             # Copy the rest of the files from input to output
             # Dont copy the other files here.
             # for file_path in input_files_path:
@@ -82,30 +114,36 @@ class OswQmCalculator:
             #     os.rename(file_path, output_file_path)
 
             logger.info(f"Finished calculating quality metrics for input files: {input_files_path}")
-            logger.info(f'Zipping output files to {output_path}')
-            self.zip_folder(output_unzip_folder.name, output_path)
             logger.info(f'Cleaning up temporary folders.')
             input_unzip_folder.cleanup()
-            output_unzip_folder.cleanup()
         except Exception as e:
             logging.error(f'Error calculating quality metrics: {e}')
             raise e
 
-    def get_osw_qm_calculator(self, algorithm_name:str, ixn_file:str=None, edges_file:str=None, output_file:str=None) -> QMCalculator:
+    def get_osw_qm_calculator(self, algorithm_name:str, ixn_file:str=None, edges_file:str=None, output_file:str=None, edges:EdgesDataset=None, cores_to_use:int=None, output_archive:OutputArchive=None, ixn_download:Future=None) -> QMCalculator:
         """
         Returns an instance of the specified quality metric calculator.
 
         Args:
             algorithm_name (str): The name of the quality metric calculator.
+            edges (EdgesDataset, optional): The edges shared by the calculators of the job. Defaults to None.
+            cores_to_use (int, optional): Cores of the job budget the calculator scores on at the same time, the ixn tiles are still partitioned for the whole budget. Defaults to `self.cores_to_use`.
+            output_archive (OutputArchive, optional): Zip the output is written into, `output_file` is then the name of its entry. Defaults to None.
+            ixn_download (Future, optional): Download of `ixn_file` that may still be running. Defaults to None.
 
         Returns:
             QMCalculator: An instance of the specified quality metric calculator.
 
         """
         if algorithm_name == 'ixn':
-            return QMXNLibCalculator(edges_file, output_file, ixn_file, self.cores_to_use)
+            return QMXNLibCalculator(edges_file, output_file, ixn_file, self.cores_to_use, topology=self.topology, pool=self.pool,
+                                     road_network=self.road_network, tiler=self.tiler, tile_size=self.tile_size,
+                                     max_tile_cost=self.max_tile_cost, result_store=self.result_store, edges=edges,
+                                     ingest=self.ingest, chunk_size=self.chunk_size, output_format=self.output_format,
+                                     output_archive=output_archive, polygon_download=ixn_download,
+                                     max_workers=cores_to_use or self.cores_to_use)
         else:
-            return QMFixedCalculator(edges_file, output_file)
+            return QMFixedCalculator(edges_file, output_file, edges=edges, output_format=self.output_format, output_archive=output_archive)
 
     def zip_folder(self, input_folder, output_zip):
         """
@@ -119,30 +157,10 @@ class OswQmCalculator:
             None
 
         """
-        with zipfile.ZipFile(output_zip, 'w') as output_zip:
+        with OutputArchive(output_zip, self.compression, self.compression_level) as output_archive:
             for root, dirs, files in os.walk(input_folder):
                 for file in files:
-                    output_zip.write(os.path.join(root, file), os.path.relpath(os.path.join(root, file), input_folder))
-
-    def extract_zip(self, input_zip, unzip_folder) -> [str]:
-        """
-        Extracts a zip file to a specified folder.
-
-        Args:
-            input_zip (zipfile.ZipFile): The zip file to be extracted.
-            unzip_folder (str): The path to the folder where the zip file will be extracted.
-
-        Returns:
-            list: A list of extracted file names.
-
-        """
-        input_zip.extractall(unzip_folder)
-        input_file_paths = []
-        # Get the file paths for all the files using os.walk
-        for root, dirs, files in os.walk(unzip_folder):
-            for file in files:
-                input_file_paths.append(os.path.join(root, file))
-        return input_file_paths
+                    output_archive.write_file(os.path.join(root, file), os.path.relpath(os.path.join(root, file), input_folder))
 
     def parse_and_calculate_quality_metric(self, input_file, algorithm_names, ixn_file=None):
         """
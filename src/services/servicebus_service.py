@@ -7,11 +7,19 @@ from python_ms_core.core.queue.models.queue_message import QueueMessage
 from dataclasses import asdict
 from src.config import Config
 from src.services.storage_service import StorageService
+from src.services.dataset_cache import DatasetCache
 import logging
 from src.models.quality_request import QualityRequest
 from src.models.quality_response import QualityMetricResponse, ResponseData
 from src.services.osw_qm_calculator_service import OswQmCalculator
+from src.services.worker_pool import WorkerPool
+from src.calculators.road_network import RoadNetworkSource
+from src.calculators.tile_results import TileResultStore
+from src.calculators.output_formats import check_output_format
+from src.calculators.tilers import check_tile_size
+from src.calculators.qm_xn_lib_calculator import QMXNLibCalculator
 import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("QualityMetricService")
@@ -32,6 +40,16 @@ class ServiceBusService:
         self.incoming_topic = self.core.get_topic(self.config.incoming_topic_name, self.config.max_concurrent_messages)
         self.outgoing_topic = self.core.get_topic(self.config.outgoing_topic_name)
         self.storage_service = StorageService(self.core)
+        # Inputs are kept across messages, so a dataset submitted again is not downloaded again
+        self.dataset_cache = DatasetCache(self.config.get_dataset_cache_folder(), int(self.config.dataset_cache_max_bytes))
+        # Workers are started once and reused by every message
+        self.worker_pool = WorkerPool(self.config.worker_pool_size, self.config.worker_max_tasks)
+        self.worker_pool.start()
+        self.road_network = RoadNetworkSource(self.config.road_network_extract, self.config.get_road_network_cache_folder())
+        # Tile scores of earlier jobs, so re-uploaded datasets only score the tiles that changed
+        self.tile_results = None
+        if self.config.tile_result_cache:
+            self.tile_results = TileResultStore(self.config.get_tile_result_store_path(), int(self.config.tile_result_max_entries))
         self.listening_thread = threading.Thread(target=self.incoming_topic.subscribe, args=[self.config.incoming_topic_subscription, self.process_message])
         # Start listening to the things
         # self.incoming_topic.subscribe(self.config.incoming_topic_subscription, self.handle_message)
@@ -46,10 +64,22 @@ class ServiceBusService:
     def process_message(self, msg: QueueMessage):
         logger.info(f"Processing message {msg}")
         input_file_url = None
+        download_folder = None
+        ixn_download = None
+        cached_paths = []
         try:
             logger.info(f"Processing message {msg.messageId}")
             # Parse the message
             quality_request = QualityRequest(messageType=msg.messageType,messageId=msg.messageId,data=msg.data)
+            # an unknown format, tile size or tiler fails the request before anything is downloaded
+            output_format = (quality_request.data.output_format or self.config.output_format).lower()
+            check_output_format(output_format)
+            tile_size = quality_request.data.tile_size
+            tile_size = float(self.config.ixn_tile_size if tile_size is None else tile_size)
+            check_tile_size(tile_size)
+            tiler = quality_request.data.tiler or self.config.ixn_tiler
+            if tiler not in QMXNLibCalculator.TILERS:
+                raise ValueError(f'Unknown tiler {tiler}, expected one of {QMXNLibCalculator.TILERS}')
             # Download the file
             input_file_url = quality_request.data.data_file
             parsed_url = urlparse(input_file_url)
@@ -57,27 +87,51 @@ class ServiceBusService:
             input_dir_path = parsed_url.path
             download_folder = os.path.join(self.config.get_download_folder(),msg.messageId)
             os.makedirs(download_folder,exist_ok=True)
-            download_path = os.path.join(download_folder,file_name)
-            self.storage_service.download_remote_file(input_file_url, download_path)
-            logger.info(f'Downloaded file to {download_path}')
+            download_path = self.dataset_cache.open(input_file_url, os.path.join(download_folder,file_name), self.storage_service)
+            cached_paths.append(download_path)
+            # the dataset and the intersection file are downloaded at the same time
+            downloads = ThreadPoolExecutor(max_workers=2, thread_name_prefix='download')
+            dataset_download = downloads.submit(self.dataset_cache.fetch, input_file_url, download_path, self.storage_service)
             # intersection file
             ixn_file_url = quality_request.data.sub_regions_file
             ixn_file_path = None
             if ixn_file_url is not None:
                 logger.info(f'Downloading intersection file {ixn_file_url}')
                 ixn_file_name = os.path.basename(ixn_file_url)
-                ixn_file_path = os.path.join(download_folder,ixn_file_name)
-                self.storage_service.download_remote_file(ixn_file_url, ixn_file_path)
+                ixn_file_path = self.dataset_cache.open(ixn_file_url, os.path.join(download_folder,ixn_file_name), self.storage_service)
+                cached_paths.append(ixn_file_path)
+                ixn_download = downloads.submit(self.dataset_cache.fetch, ixn_file_url, ixn_file_path, self.storage_service)
                 # quality_request.data.intersectionFile = ixn_file_path
+            downloads.shutdown(wait=False)
+            dataset_download.result()
+            logger.info(f'Downloaded file to {download_path}')
 
             # Process the file
             output_folder = os.path.join(download_folder,'qm')
             os.makedirs(output_folder,exist_ok=True)
             output_file_local_path = os.path.join(output_folder,'qm-output.zip')
             cores_to_use = self.config.partition_count
-            qm_calculator = OswQmCalculator(cores_to_use=cores_to_use)
+            qm_calculator = OswQmCalculator(
+                cores_to_use=cores_to_use,
+                topology=self.config.ixn_topology,
+                pool=self.worker_pool.get(),
+                road_network=self.road_network,
+                tiler=tiler,
+                tile_size=tile_size,
+                max_tile_cost=float(self.config.ixn_max_tile_cost),
+                result_store=self.tile_results,
+                ingest=self.config.ixn_ingest,
+                chunk_size=int(self.config.ixn_chunk_size),
+                output_format=output_format,
+                compression=self.config.output_compression,
+                compression_level=int(self.config.output_compression_level),
+            )
             algorithm_names = quality_request.data.algorithm.split(',')
-            qm_calculator.calculate_quality_metric(download_path, algorithm_names,output_file_local_path,ixn_file_path)
+            # the ixn calculator reads the edges while the intersection file is still downloading
+            qm_calculator.calculate_quality_metric(download_path, algorithm_names,output_file_local_path,ixn_file_path,ixn_download)
+            if ixn_download is not None:
+                # a failed intersection file download fails the request, whichever algorithms ran
+                ixn_download.result()
             # Upload the file
             output_file_remote_path = f'{self.get_directory_path(input_file_url)}/qm-{quality_request.data.jobId}-output.zip'
             output_file_url = self.storage_service.upload_local_file(output_file_local_path,output_file_remote_path)
@@ -88,7 +142,8 @@ class ServiceBusService:
                 'message':'Quality metrics calculated successfully',
                 'success':True,
                 'dataset_url':input_file_url,
-                'qm_dataset_url':output_file_url
+                'qm_dataset_url':output_file_url,
+                'output_format':output_format
             }
             response = QualityMetricResponse(
                 messageType=msg.messageType,
@@ -115,6 +170,15 @@ class ServiceBusService:
                 data=  response_data
             )
             self.send_response(response)
+            if ixn_download is not None:
+                # the sub regions download may still be running, it has to stop writing before its folder and pin go
+                ixn_download.cancel()
+                wait([ixn_download])
+            if download_folder is not None:
+                shutil.rmtree(download_folder, ignore_errors=True)
+        finally:
+            for cached_path in cached_paths:
+                self.dataset_cache.release(cached_path)
         pass
 
     def send_response(self, msg: QueueMessage):
@@ -141,6 +205,7 @@ class ServiceBusService:
 
     def stop(self):
         self.listening_thread.join(timeout=0)
+        self.worker_pool.close()
         pass
     # def get_directory_path(self,remote_url:str)-> str:
     #     # https://tdeisamplestorage.blob.core.windows.net/osw/test_upload/500mb_file.zip
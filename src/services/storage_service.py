@@ -1,8 +1,101 @@
 # Class for Storage service.
 
+import collections
+import logging
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from azure.core import MatchConditions
 from python_ms_core import Core
 from src.config import Config
 
+logger = logging.getLogger("StorageService")
+logger.setLevel(logging.INFO)
+
+
+def bounded_map(func, items, max_in_flight):
+    """
+    Maps `func` over `items` on a thread pool, keeping at most `max_in_flight` calls and their results in memory.
+
+    Args:
+        func (callable): Function of one item.
+        items (iterable): The items, consumed lazily.
+        max_in_flight (int): Number of calls running or waiting to be consumed at a time.
+
+    Returns:
+        generator: The results, in the order of the items.
+    """
+    with ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='storage') as executor:
+        pending = collections.deque()
+        for item in items:
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+            pending.append(executor.submit(func, item))
+        while pending:
+            yield pending.popleft().result()
+
+
+def download_to_file(blob_client, local_path:str, chunk_size:int, max_concurrency:int, properties=None):
+    """
+    Downloads a blob to a file in ranges of `chunk_size` bytes, `max_concurrency` of them at a time.
+
+    Every range is requested on the condition that the blob still has the ETag of `properties`,
+    so a blob overwritten during the download fails it instead of mixing two versions.
+
+    Args:
+        blob_client: The azure `BlobClient` of the blob, or a stand-in with the same methods.
+        local_path (str): Path of the file.
+        chunk_size (int): Size of the ranges in bytes.
+        max_concurrency (int): Number of ranges downloaded, and held in memory, at a time.
+        properties (optional): Properties of the version to download. Defaults to None, the current version.
+
+    Returns:
+        The properties of the downloaded version, with its `size` and `etag`.
+
+    Raises:
+        azure.core.exceptions.ResourceModifiedError: If the blob no longer has the ETag.
+    """
+    if properties is None:
+        properties = blob_client.get_blob_properties()
+    size = properties.size
+
+    def download_range(offset):
+        return blob_client.download_blob(offset=offset, length=min(chunk_size, size - offset), etag=properties.etag,
+                                         match_condition=MatchConditions.IfNotModified).readall()
+
+    with open(local_path, 'wb') as file_stream:
+        for chunk in bounded_map(download_range, range(0, size, chunk_size), max_concurrency):
+            file_stream.write(chunk)
+    return properties
+
+
+def upload_from_file(blob_client, local_path:str, chunk_size:int, max_concurrency:int) -> int:
+    """
+    Uploads a file as blocks of `chunk_size` bytes, staging `max_concurrency` of them at a time, and commits the blob.
+
+    Args:
+        blob_client: The azure `BlobClient` of the blob, or a stand-in with the same methods.
+        local_path (str): Path of the file.
+        chunk_size (int): Size of the blocks in bytes.
+        max_concurrency (int): Number of blocks staged, and held in memory, at a time.
+
+    Returns:
+        int: Number of blocks.
+    """
+    def stage(block):
+        index, data = block
+        # the ids of the blocks of a blob must all have the same length
+        block_id = f'{index:08d}'
+        blob_client.stage_block(block_id, data, length=len(data))
+        return block_id
+
+    with open(local_path, 'rb') as file_stream:
+        blocks = enumerate(iter(lambda: file_stream.read(chunk_size), b''))
+        block_ids = list(bounded_map(stage, blocks, max_concurrency))
+    blob_client.commit_block_list(block_ids)
+    return len(block_ids)
+
+
 class StorageService:
 
     def __init__(self, core: Core) -> None:
@@ -10,20 +103,84 @@ class StorageService:
         # TODO : Change storage location
         self.config = Config()
         self.storage_container = self.storage_client.get_container(self.config.storage_container_name)
+        self.chunk_size = int(self.config.storage_chunk_size)
+        self.max_concurrency = int(self.config.storage_max_concurrency)
+
+    def get_blob_client(self, file_entity):
+        """
+        Returns the blob client of a file entity when it supports ranged reads and staged blocks.
+
+        Args:
+            file_entity: The file entity of the storage client.
+
+        Returns:
+            The blob client, None for entities that can only be read and written whole.
+        """
+        blob_client = getattr(file_entity, 'blob_client', None)
+        if hasattr(blob_client, 'get_blob_client'):
+            # entities made by create_file hold the client of their container
+            blob_client = blob_client.get_blob_client(file_entity.file_path)
+        if not all(hasattr(blob_client, method) for method in ('download_blob', 'stage_block', 'commit_block_list')):
+            return None
+        return blob_client
+
+    def get_remote_blob(self, remote_path: str):
+        """
+        Resolves the blob of a remote file and reads its properties, without downloading it.
+
+        The blob client is made from the container client and the path of the URL, as
+        `get_file_from_url` of the azure storage client lists the whole container to find a file.
+
+        Args:
+            remote_path (str): URL of the file.
+
+        Returns:
+            tuple: (blob_client, properties) of the file, None for files that can only be downloaded whole.
+        """
+        blob_client, _ = self._resolve_remote_file(remote_path)
+        if blob_client is None:
+            return None
+        return blob_client, blob_client.get_blob_properties()
+
+    def _resolve_remote_file(self, remote_path):
+        # (blob_client, file_entity), the entity is only looked up when there is no container client
+        container_client = getattr(self.storage_container, 'container_client', None)
+        if hasattr(container_client, 'get_blob_client'):
+            # the path of the URL is /<container>/<blob name>
+            blob_name = '/'.join(urllib.parse.unquote(urllib.parse.urlparse(remote_path).path).split('/')[2:])
+            return container_client.get_blob_client(blob_name), None
+        file_entity = self.storage_client.get_file_from_url(self.config.storage_container_name, remote_path)
+        return self.get_blob_client(file_entity), file_entity
 
     def upload_local_file(self, local_path: str, remote_path: str) -> str:
         azure_file = self.storage_container.create_file(remote_path)
-        with open(local_path, 'rb') as file_stream:
-            azure_file.upload(file_stream.read())
-        remote_url = azure_file.get_remote_url()
-        return remote_url
+        blob_client = self.get_blob_client(azure_file)
+        if blob_client is None:
+            with open(local_path, 'rb') as file_stream:
+                azure_file.upload(file_stream)
+            return azure_file.get_remote_url()
+        blocks = upload_from_file(blob_client, local_path, self.chunk_size, self.max_concurrency)
+        logger.info(f'Uploaded {local_path} in {blocks} blocks')
+        return blob_client.url
 
-    def download_remote_file(self, remote_path: str, local_path: str) -> str:
+    def download_remote_file(self, remote_path: str, local_path: str, remote_blob=None) -> str:
         #  Change this to download from client
-        file_entity = self.storage_client.get_file_from_url(self.config.storage_container_name, remote_path)
-        
-        with open(local_path, 'wb') as file_stream:
-            file_stream.write(file_entity.get_stream())
+        # remote_blob is the (blob_client, properties) of get_remote_blob, the download then fails if the blob changed since
+        start_time = time.time()
+        if remote_blob is None:
+            blob_client, file_entity = self._resolve_remote_file(remote_path)
+            properties = None
+        else:
+            blob_client, properties = remote_blob
+        if blob_client is None:
+            data = file_entity.get_stream()
+            with open(local_path, 'wb') as file_stream:
+                file_stream.write(data)
+            size = len(data)
+        else:
+            size = download_to_file(blob_client, local_path, self.chunk_size, self.max_concurrency, properties).size
+        seconds = time.time() - start_time
+        logger.info(f'Downloaded {size} bytes to {local_path} in {seconds:.2f} seconds ({size / max(seconds, 1e-6) / 1e6:.1f} MB/s)')
 
         # just do wget
         # return wget.download(remote_path, local_path)
@@ -0,0 +1,76 @@
+import multiprocessing
+import logging
+import threading
+
+logger = logging.getLogger("WorkerPool")
+logger.setLevel(logging.INFO)
+
+# Imported once by the fork server, so new workers start with the geo stack loaded
+PRELOAD_MODULES = [
+    'numpy',
+    'pandas',
+    'shapely',
+    'scipy.sparse',
+    'networkx',
+    'geopandas',
+    'dask_geopandas',
+    'src.calculators.qm_xn_lib_calculator',
+]
+
+
+class WorkerPool:
+    """
+    Long-lived process pool shared by every quality metric job of the service.
+
+    Workers are forked from a fork server that has already imported `PRELOAD_MODULES`,
+    so they skip the geopandas/shapely/networkx import cost, and are replaced after
+    `max_tasks_per_child` tasks to bound memory growth. The pool can be passed to dask
+    as `pool=` with the multiprocessing scheduler.
+    """
+
+    def __init__(self, size:int, max_tasks_per_child:int=None, start_method:str='forkserver'):
+        """
+        Initializes the WorkerPool class. The processes are started by `start` or the first `get`.
+
+        Args:
+            size (int): Number of worker processes.
+            max_tasks_per_child (int, optional): Tasks a worker runs before it is replaced. Defaults to None (never).
+            start_method (str, optional): multiprocessing start method. Falls back to 'spawn' where the
+                fork server is not available. Defaults to 'forkserver'.
+        """
+        if start_method not in multiprocessing.get_all_start_methods():
+            start_method = 'spawn'
+        self.size = int(size)
+        self.max_tasks_per_child = int(max_tasks_per_child) if max_tasks_per_child else None
+        self.start_method = start_method
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """
+        Starts the worker processes if they are not running yet.
+
+        Returns:
+            multiprocessing.pool.Pool: The pool.
+        """
+        with self._lock:
+            if self._pool is None:
+                context = multiprocessing.get_context(self.start_method)
+                if self.start_method == 'forkserver':
+                    context.set_forkserver_preload(PRELOAD_MODULES)
+                self._pool = context.Pool(processes=self.size, maxtasksperchild=self.max_tasks_per_child)
+                logger.info(f'Started {self.size} {self.start_method} workers')
+            return self._pool
+
+    def get(self):
+        return self.start()
+
+    def close(self):
+        """
+        Stops the worker processes. Tasks still running are finished first.
+        """
+        with self._lock:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool.join()
+                self._pool = None
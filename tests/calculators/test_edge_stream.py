@@ -0,0 +1,91 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import numpy as np
+import geopandas as gpd
+from shapely.geometry import box
+from src.calculators.edge_stream import stream_edges, id_code
+from src.calculators.tile_graph import add_osw_endpoints, OSW_ENDPOINT_COLUMNS
+
+
+class TestEdgeStream(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.file_path = os.path.join(self.directory.name, 'edges.geojson')
+        self.features = [
+            ({'_u_id': 'a', '_v_id': 'b', 'width': 1.5}, {'type': 'LineString', 'coordinates': [[-122.33, 47.60], [-122.32, 47.60], [-122.32, 47.61]]}),
+            ({'_u_id': 'b', '_v_id': 'c', 'width': None}, {'type': 'MultiLineString', 'coordinates': [[[-122.32, 47.61], [-122.31, 47.61]], [[-122.30, 47.61], [-122.30, 47.62]]]}),
+            ({'_u_id': None, '_v_id': 'a', 'width': 2.0}, None),
+            ({'_u_id': 'c', '_v_id': 'd', 'width': 3.0}, {'type': 'Point', 'coordinates': [-122.31, 47.62]}),
+            ({'_u_id': 'c', '_v_id': 'a', 'width': 4.0}, {'type': 'LineString', 'coordinates': [[-122.30, 47.62, 5.0], [-122.33, 47.60, 6.0]]}),
+        ]
+        with open(self.file_path, 'w') as edges_file:
+            json.dump({'type': 'FeatureCollection', 'features': [
+                {'type': 'Feature', 'properties': properties, 'geometry': geometry} for properties, geometry in self.features
+            ]}, edges_file)
+        self.spill_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.spill_dir.cleanup)
+
+    def test_matches_projected_gdf(self):
+        expected = add_osw_endpoints(gpd.read_file(self.file_path).to_crs('epsg:26910'))
+        for chunk_size in [1, 2, 10]:
+            edges, hull = stream_edges(self.file_path, self.spill_dir.name, 'epsg:26910', ['_u_id', '_v_id', 'width', 'missing'],
+                                       osw_endpoints=True, chunk_size=chunk_size)
+            self.assertEqual(edges.column_names, ['_u_id', '_v_id', 'width', *OSW_ENDPOINT_COLUMNS])
+            result = edges.take(np.arange(len(edges)))
+            self.assertEqual(result.crs, 'epsg:26910')
+            for position in [0, 1]:
+                np.testing.assert_allclose(np.asarray(result.geometry[position].geoms[0].coords if position else result.geometry[position].coords),
+                                           np.asarray(expected.geometry[position].geoms[0].coords if position else expected.geometry[position].coords))
+            self.assertTrue(result.geometry[1].equals_exact(expected.geometry[1], 1e-6))
+            # missing geometries and points are not scored
+            self.assertIsNone(result.geometry[2])
+            self.assertIsNone(result.geometry[3])
+            self.assertFalse(result.geometry[4].has_z)
+            np.testing.assert_allclose(result['width'], [1.5, np.nan, 2.0, 3.0, 4.0])
+            self.assertEqual(result['_v_id'][0], result['_u_id'][1])
+            self.assertEqual(result['_u_id'][0], id_code('a'))
+            self.assertTrue(np.isnan(result['_u_id'][2]))
+            np.testing.assert_allclose(result.loc[[0, 4], OSW_ENDPOINT_COLUMNS], expected.loc[[0, 4], OSW_ENDPOINT_COLUMNS])
+            self.assertTrue(np.isnan(result.loc[1, OSW_ENDPOINT_COLUMNS].astype(float)).all())
+            self.assertEqual(hull.crs, 'epsg:4326')
+            lines = gpd.read_file(self.file_path).iloc[[0, 1, 4]]
+            self.assertTrue(hull.iloc[0].equals(lines.unary_union.convex_hull))
+
+    def test_id_code_collision(self):
+        # every id gets the same code, the check hashes tell them apart
+        with patch('src.calculators.edge_stream._id_hashes', side_effect=lambda value: (1, ord(value))):
+            with self.assertRaisesRegex(ValueError, '4 different ids share a code'):
+                stream_edges(self.file_path, self.spill_dir.name, 'epsg:26910', ['_u_id', '_v_id'], chunk_size=2)
+        self.assertNotIn('id_hashes.npy', os.listdir(self.spill_dir.name))
+
+    def test_equal_ids_in_different_chunks_do_not_collide(self):
+        edges, _ = stream_edges(self.file_path, self.spill_dir.name, 'epsg:26910', ['_u_id', '_v_id'], chunk_size=1)
+        self.assertEqual(len(edges), len(self.features))
+        self.assertNotIn('id_hashes.npy', os.listdir(self.spill_dir.name))
+
+    def test_endpoints_need_ids(self):
+        edges, _ = stream_edges(self.file_path, self.spill_dir.name, 'epsg:26910', ['width'], osw_endpoints=True)
+        self.assertEqual(edges.column_names, ['width'])
+
+    def test_bbox(self):
+        edges, _ = stream_edges(self.file_path, self.spill_dir.name, 'epsg:26910', bbox=(-122.335, 47.595, -122.325, 47.605))
+        self.assertEqual(len(edges), 2)
+        edges, _ = stream_edges(self.file_path, self.spill_dir.name, 'epsg:26910', mask=box(-122.305, 47.615, -122.295, 47.625))
+        self.assertEqual(len(edges), 2)
+
+    def test_empty(self):
+        with open(self.file_path, 'w') as edges_file:
+            json.dump({'type': 'FeatureCollection', 'features': []}, edges_file)
+        edges, hull = stream_edges(self.file_path, self.spill_dir.name, 'epsg:26910', ['_u_id'])
+        self.assertEqual(len(edges), 0)
+        self.assertTrue(hull.iloc[0].is_empty)
+        self.assertEqual(os.listdir(self.spill_dir.name).count('coords.part'), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
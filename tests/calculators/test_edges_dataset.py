@@ -0,0 +1,115 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+from shapely.geometry import box
+from src.calculators.edges_dataset import EdgesDataset
+from src.calculators.feature_reader import read_features
+
+
+class TestEdgesDataset(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.file_path = os.path.join(self.directory.name, 'edges.geojson')
+        with open(self.file_path, 'w') as edges_file:
+            json.dump({'type': 'FeatureCollection', 'features': [
+                {'type': 'Feature', 'properties': {'_id': 1, '_u_id': 'a', '_v_id': 'b'},
+                 'geometry': {'type': 'LineString', 'coordinates': [[-122.33, 47.6], [-122.32, 47.6]]}},
+                {'type': 'Feature', 'properties': {'_id': 2, '_u_id': 'b', '_v_id': 'c'},
+                 'geometry': {'type': 'LineString', 'coordinates': [[-122.2, 47.7], [-122.1, 47.7]]}},
+            ]}, edges_file)
+
+    def test_read_once(self):
+        edges = EdgesDataset(self.file_path)
+        with patch('src.calculators.edges_dataset.read_features', wraps=read_features) as mock_read_file:
+            first = edges.read()
+            self.assertIs(edges.read(), first)
+            mock_read_file.assert_called_once_with(self.file_path, None, None, None)
+        self.assertEqual(first.crs, 'epsg:4326')
+
+    def test_projected_once(self):
+        edges = EdgesDataset(self.file_path)
+        projected = edges.projected('epsg:26910')
+        self.assertEqual(projected.crs, 'epsg:26910')
+        self.assertIs(edges.projected('epsg:26910'), projected)
+        self.assertEqual(edges.read().crs, 'epsg:4326')
+
+    def test_projected_drops_the_file_crs(self):
+        edges = EdgesDataset(self.file_path)
+        edges.require([], 'epsg:26910')
+        self.assertEqual(edges.read().crs, 'epsg:4326')
+        edges.projected('epsg:26910')
+        # only the projected frame is kept
+        self.assertIsNone(edges._gdf)
+        self.assertEqual(list(edges._projected), ['epsg:26910'])
+
+    def test_projected_keeps_the_file_crs_while_it_is_required(self):
+        edges = EdgesDataset(self.file_path)
+        edges.require([])
+        edges.require([], 'epsg:26910')
+        first = edges.read()
+        edges.projected('epsg:26910')
+        self.assertIs(edges.read(), first)
+
+    def test_projected_keeps_the_file_crs_until_every_projection_is_made(self):
+        edges = EdgesDataset(self.file_path)
+        edges.require([], 'epsg:26910')
+        edges.require([], 'epsg:3857')
+        with patch('src.calculators.edges_dataset.read_features', wraps=read_features) as mock_read_file:
+            edges.projected('epsg:26910')
+            self.assertIsNotNone(edges._gdf)
+            edges.projected('epsg:3857')
+            mock_read_file.assert_called_once()
+        self.assertIsNone(edges._gdf)
+
+    def test_missing_crs_defaults_to_wgs84(self):
+        with patch('src.calculators.edges_dataset.read_features') as mock_read_file:
+            mock_read_file.return_value.crs = None
+            edges = EdgesDataset(self.file_path)
+            self.assertIs(edges.read(), mock_read_file.return_value.set_crs.return_value)
+            mock_read_file.return_value.set_crs.assert_called_once_with('epsg:4326')
+
+    def test_concurrent_reads_share_one_parse(self):
+        edges = EdgesDataset(self.file_path)
+        results = []
+        with patch('src.calculators.edges_dataset.read_features', wraps=read_features) as mock_read_file:
+            threads = [threading.Thread(target=lambda: results.append(edges.projected('epsg:26910'))) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            mock_read_file.assert_called_once_with(self.file_path, None, None, None)
+        self.assertTrue(all(result is results[0] for result in results))
+
+    def test_require_columns(self):
+        edges = EdgesDataset(self.file_path)
+        self.assertIsNone(edges.columns)
+        edges.require([])
+        self.assertEqual(list(edges.read().columns), ['geometry'])
+        edges.require(['_v_id', '_u_id'])
+        self.assertEqual(edges.columns, ['_u_id', '_v_id'])
+        self.assertEqual(list(edges.read().columns), ['_u_id', '_v_id', 'geometry'])
+        edges.require(None)
+        self.assertIsNone(edges.columns)
+        self.assertEqual(list(edges.read().columns), ['_id', '_u_id', '_v_id', 'geometry'])
+
+    def test_bbox(self):
+        edges = EdgesDataset(self.file_path, bbox=(-122.4, 47.5, -122.3, 47.65))
+        self.assertEqual(list(edges.read()._id), [1])
+        edges = EdgesDataset(self.file_path, mask=box(-122.25, 47.65, -122.0, 47.75))
+        self.assertEqual(list(edges.read()._id), [2])
+
+    def test_release(self):
+        edges = EdgesDataset(self.file_path)
+        first = edges.read()
+        edges.projected('epsg:26910')
+        edges.release()
+        self.assertIsNot(edges.read(), first)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import geopandas as gpd
+from shapely.geometry import LineString, Point, box
+from src.calculators import feature_reader
+from src.calculators.feature_reader import read_features
+
+
+class TestFeatureReader(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.file_path = os.path.join(self.directory.name, 'edges.geojson')
+        self.gdf = gpd.GeoDataFrame({
+            '_id': ['1', '2', '3', '4'],
+            '_u_id': ['a', 'b', 'c', None],
+            'width': [1.5, None, 2.0, 3.0],
+            'geometry': [
+                LineString([(-122.33, 47.60), (-122.32, 47.60), (-122.32, 47.61)]),
+                LineString([(-122.20, 47.70), (-122.10, 47.70)]),
+                Point(-122.31, 47.62),
+                None,
+            ],
+        }, crs='epsg:4326')
+        self.gdf.to_file(self.file_path, driver='GeoJSON')
+
+    def test_all_columns(self):
+        with patch('src.calculators.feature_reader.gpd.read_file') as mock_read_file:
+            self.assertIs(read_features(self.file_path), mock_read_file.return_value)
+            mock_read_file.assert_called_once_with(self.file_path)
+
+    def test_selected_columns(self):
+        expected = gpd.read_file(self.file_path)
+        result = read_features(self.file_path, ['width', '_id', 'missing'])
+        self.assertEqual(list(result.columns), ['width', '_id', 'geometry'])
+        self.assertEqual(result.crs, 'epsg:4326')
+        self.assertEqual(list(result._id), list(expected._id))
+        self.assertEqual(result.width.dtype, expected.width.dtype)
+        self.assertTrue(result.geometry.iloc[:3].geom_equals(expected.geometry.iloc[:3]).all())
+        self.assertIsNone(result.geometry.iloc[3])
+
+    def test_geometry_only(self):
+        result = read_features(self.file_path, [])
+        self.assertEqual(list(result.columns), ['geometry'])
+        self.assertEqual(len(result), 4)
+
+    def test_three_dimensional_lines(self):
+        with open(self.file_path, 'w') as edges_file:
+            json.dump({'type': 'FeatureCollection', 'features': [
+                {'type': 'Feature', 'properties': {'_id': '1'},
+                 'geometry': {'type': 'LineString', 'coordinates': [[0, 0, 5], [1, 1, 6]]}},
+            ]}, edges_file)
+        result = read_features(self.file_path, [])
+        self.assertTrue(result.geometry[0].has_z)
+
+    def test_bbox_and_mask(self):
+        self.assertEqual(list(read_features(self.file_path, ['_id'], bbox=(-122.4, 47.5, -122.3, 47.65))._id), ['1', '3'])
+        self.assertEqual(list(read_features(self.file_path, ['_id'], mask=box(-122.25, 47.65, -122.0, 47.75))._id), ['2'])
+        self.assertEqual(list(read_features(self.file_path, bbox=(-122.25, 47.65, -122.0, 47.75))._id), ['2'])
+
+    def test_pyogrio(self):
+        with patch.object(feature_reader, 'pyogrio', object()), patch.object(feature_reader, 'pyarrow', object()), \
+                patch('src.calculators.feature_reader.gpd.read_file') as mock_read_file:
+            read_features(self.file_path, ['_id'], bbox=(0, 0, 1, 1))
+            mock_read_file.assert_called_once_with(self.file_path, engine='pyogrio', bbox=(0, 0, 1, 1), use_arrow=True, columns=['_id'])
+
+
+if __name__ == '__main__':
+    unittest.main()
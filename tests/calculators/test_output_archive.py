@@ -0,0 +1,128 @@
+import importlib.util
+import io
+import json
+import os
+import tempfile
+import threading
+import unittest
+import zipfile
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from unittest.mock import patch
+from shapely.geometry import LineString
+from src.calculators.output_archive import OutputArchive
+
+
+class TestOutputArchive(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.zip_path = os.path.join(self.directory.name, 'qm-output.zip')
+        self.gdf = gpd.GeoDataFrame({
+            '_id': [str(i) for i in range(200)],
+            'tra_score': [i / 200 for i in range(200)],
+            'geometry': [LineString([(i, 0), (i + 1, 1)]) for i in range(200)],
+        }, crs='epsg:4326')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_write_geojson(self):
+        with OutputArchive(self.zip_path) as archive:
+            archive.write('ixn_qm.geojson', self.gdf, 'geojson')
+            self.assertEqual(archive.names(), ['ixn_qm.geojson'])
+
+        with zipfile.ZipFile(self.zip_path) as output_zip:
+            info = output_zip.getinfo('ixn_qm.geojson')
+            self.assertEqual(info.compress_type, zipfile.ZIP_DEFLATED)
+            self.assertLess(info.compress_size, info.file_size)
+            collection = json.loads(output_zip.read('ixn_qm.geojson'))
+        self.assertEqual(len(collection['features']), 200)
+        self.assertEqual(collection['crs']['properties']['name'], 'urn:ogc:def:crs:OGC:1.3:CRS84')
+        result = gpd.GeoDataFrame.from_features(collection['features'])
+        self.assertEqual(list(result['_id']), list(self.gdf['_id']))
+        self.assertEqual(list(result['tra_score']), list(self.gdf['tra_score']))
+        self.assertTrue(result.geometry.geom_equals(self.gdf.geometry).all())
+
+    def test_write_geojson_projected(self):
+        with OutputArchive(self.zip_path) as archive:
+            archive.write('ixn_qm.geojson', self.gdf.to_crs('epsg:26910'), 'geojson')
+        with zipfile.ZipFile(self.zip_path) as output_zip:
+            result = gpd.read_file(io.BytesIO(output_zip.read('ixn_qm.geojson')))
+        self.assertEqual(result.crs.to_epsg(), 26910)
+
+    def test_write_geojson_matches_gdal(self):
+        # OSW edges carry ISO dates, which GDAL reads as datetimes
+        gdf = self.gdf.head(3).assign(
+            check_date=pd.to_datetime(['2023-01-02', '2023-05-06T07:08:09', None]),
+            width=np.array([1, 2, 3], dtype='int64'),
+        )
+        file_path = os.path.join(self.directory.name, 'fixed_qm.geojson')
+        gdf.to_file(file_path, driver='GeoJSON')
+        with OutputArchive(self.zip_path) as archive:
+            archive.write('fixed_qm.geojson', gdf, 'geojson')
+
+        with open(file_path) as gdal_file:
+            expected = json.load(gdal_file)
+        with zipfile.ZipFile(self.zip_path) as output_zip:
+            collection = json.loads(output_zip.read('fixed_qm.geojson'))
+            result = gpd.read_file(io.BytesIO(output_zip.read('fixed_qm.geojson')))
+        self.assertEqual(collection['crs'], expected['crs'])
+        self.assertEqual([feature['properties'] for feature in collection['features']],
+                         [feature['properties'] for feature in expected['features']])
+        self.assertEqual(result['check_date'].dtype, 'datetime64[ns]')
+        self.assertTrue(result['check_date'].equals(gpd.read_file(file_path)['check_date']))
+
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), 'pyarrow is not installed')
+    def test_write_geoparquet_and_flatgeobuf(self):
+        with OutputArchive(self.zip_path, 'deflate', 9) as archive:
+            archive.write('ixn_qm.parquet', self.gdf, 'geoparquet')
+            archive.write('fixed_qm.fgb', self.gdf, 'flatgeobuf')
+
+        with zipfile.ZipFile(self.zip_path) as output_zip:
+            parquet = gpd.read_parquet(io.BytesIO(output_zip.read('ixn_qm.parquet')))
+            flatgeobuf = gpd.read_file(io.BytesIO(output_zip.read('fixed_qm.fgb')))
+        self.assertEqual(list(parquet['tra_score']), list(self.gdf['tra_score']))
+        self.assertEqual(sorted(flatgeobuf['_id']), sorted(self.gdf['_id']))
+
+    def test_stored(self):
+        with OutputArchive(self.zip_path, 'stored') as archive:
+            archive.write('ixn_qm.geojson', self.gdf)
+        with zipfile.ZipFile(self.zip_path) as output_zip:
+            self.assertEqual(output_zip.getinfo('ixn_qm.geojson').compress_type, zipfile.ZIP_STORED)
+
+    def test_concurrent_writes(self):
+        with OutputArchive(self.zip_path) as archive:
+            threads = [threading.Thread(target=archive.write, args=(f'{name}_qm.geojson', self.gdf)) for name in ('fixed', 'ixn')]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        with zipfile.ZipFile(self.zip_path) as output_zip:
+            self.assertEqual(sorted(output_zip.namelist()), ['fixed_qm.geojson', 'ixn_qm.geojson'])
+            self.assertIsNone(output_zip.testzip())
+
+    def test_write_file(self):
+        file_path = os.path.join(self.directory.name, 'notes.txt')
+        with open(file_path, 'w') as notes:
+            notes.write('quality metrics')
+        with OutputArchive(self.zip_path) as archive:
+            archive.write_file(file_path, 'notes.txt')
+        with zipfile.ZipFile(self.zip_path) as output_zip:
+            self.assertEqual(output_zip.read('notes.txt'), b'quality metrics')
+
+    def test_unsupported_zstd_falls_back_to_deflate(self):
+        with patch.dict('src.calculators.output_archive.ZIP_METHODS', {'zstd': None}):
+            archive = OutputArchive(self.zip_path, 'zstd', 19)
+        archive.close()
+        self.assertEqual(archive.compression, 'deflate')
+        self.assertEqual(archive.compression_level, 9)
+
+    def test_invalid_compression(self):
+        with self.assertRaises(ValueError):
+            OutputArchive(self.zip_path, 'rar')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import fiona
+import geopandas as gpd
+from shapely.geometry import LineString
+from src.calculators.output_formats import OUTPUT_FORMATS, check_output_format, output_extension, write_output
+
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+class TestOutputFormats(unittest.TestCase):
+    def setUp(self):
+        self.gdf = gpd.GeoDataFrame({
+            '_id': ['a', 'b'],
+            'tra_score': [0.5, 1.0],
+            'geometry': [LineString([(0, 0), (1, 1)]), LineString([(1, 1), (2, 0)])],
+        }, crs='epsg:4326')
+
+    def test_check_output_format(self):
+        for output_format in ('geojson', 'flatgeobuf'):
+            check_output_format(output_format)
+        with self.assertRaises(ValueError):
+            check_output_format('shapefile')
+
+    @unittest.skipUnless(HAS_PYARROW, 'pyarrow is not installed')
+    def test_check_output_format_geoparquet(self):
+        check_output_format('geoparquet')
+
+    @patch('src.calculators.output_formats.importlib.util.find_spec', return_value=None)
+    def test_check_output_format_geoparquet_without_pyarrow(self, mock_find_spec):
+        with self.assertRaisesRegex(ValueError, 'needs pyarrow'):
+            check_output_format('geoparquet')
+        mock_find_spec.assert_called_once_with('pyarrow')
+        # the extension does not need pyarrow
+        self.assertEqual(output_extension('geoparquet'), '.parquet')
+
+    def test_output_extension(self):
+        self.assertEqual(output_extension('geojson'), '.geojson')
+        self.assertEqual(output_extension('flatgeobuf'), '.fgb')
+        self.assertEqual(output_extension('geoparquet'), '.parquet')
+        with self.assertRaises(ValueError):
+            output_extension('shapefile')
+
+    def test_write_output_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for output_format in OUTPUT_FORMATS:
+                with self.subTest(output_format=output_format):
+                    if output_format == 'geoparquet' and not HAS_PYARROW:
+                        self.skipTest('pyarrow is not installed')
+                    file_path = os.path.join(directory, f'ixn_qm{output_extension(output_format)}')
+                    write_output(self.gdf, file_path, output_format)
+                    if output_format == 'geoparquet':
+                        result = gpd.read_parquet(file_path)
+                    else:
+                        result = gpd.read_file(file_path)
+                    # FlatGeobuf stores the features in the order of its spatial index
+                    result = result.sort_values('_id', ignore_index=True)
+                    self.assertEqual(list(result['_id']), ['a', 'b'])
+                    self.assertEqual(list(result['tra_score']), [0.5, 1.0])
+                    self.assertEqual(result['tra_score'].dtype, 'float64')
+                    self.assertTrue(result.geometry.geom_equals(self.gdf.geometry).all())
+
+    def test_write_output_flatgeobuf_schema(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, 'ixn_qm.fgb')
+            write_output(self.gdf, file_path, 'flatgeobuf')
+            with fiona.open(file_path) as source:
+                self.assertEqual(source.driver, 'FlatGeobuf')
+                self.assertEqual(source.schema['properties']['tra_score'].split(':')[0], 'float')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,18 @@
+import importlib.util
 import json
+import os
 import tempfile
 import unittest
+import zipfile
 import geopandas as gpd
+import pandas as pd
 from subprocess import run, PIPE
 from unittest.mock import patch, MagicMock
 from src.calculators.qm_fixed_calculator import QMFixedCalculator
 from src.calculators.qm_calculator import QualityMetricResult
+from src.calculators.edges_dataset import EdgesDataset
+from src.calculators.output_archive import OutputArchive
+from shapely.geometry import LineString
 
 
 class TestQMFixedCalculator(unittest.TestCase):
@@ -39,13 +46,59 @@ class TestQMFixedCalculator(unittest.TestCase):
 
         # Assertions
         mock_read_file.assert_called_once_with(self.edges_file_path)
-        mock_gdf.__setitem__.assert_called_once_with('fixed_score', 42)
-        mock_gdf.to_file.assert_called_once_with(self.output_file_path)
+        mock_gdf.copy.assert_called_once_with(deep=False)
+        mock_gdf.copy.return_value.__setitem__.assert_called_once_with('fixed_score', 42)
+        mock_gdf.copy.return_value.to_file.assert_called_once_with(self.output_file_path, driver='GeoJSON')
         self.assertIsInstance(result, QualityMetricResult)
         self.assertTrue(result.success)
         self.assertEqual(result.message, 'QMFixedCalculator')
         self.assertEqual(result.output_file, self.output_file_path)
 
+    @patch('src.calculators.qm_fixed_calculator.gpd.GeoDataFrame.to_file', autospec=True)
+    def test_calculate_quality_metric_keeps_shared_edges(self, mock_to_file):
+        edges = EdgesDataset(self.edges_file_path)
+        edges._gdf = gpd.GeoDataFrame({'geometry': [LineString([(0, 0), (1, 1)])]}, crs='epsg:4326')
+        QMFixedCalculator(self.edges_file_path, self.output_file_path, edges=edges).calculate_quality_metric()
+        self.assertNotIn('fixed_score', edges.read().columns)
+        self.assertIn('fixed_score', mock_to_file.call_args.args[0].columns)
+
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), 'pyarrow is not installed')
+    @patch('src.calculators.qm_fixed_calculator.gpd.GeoDataFrame.to_parquet', autospec=True)
+    def test_calculate_quality_metric_geoparquet(self, mock_to_parquet):
+        edges = EdgesDataset(self.edges_file_path)
+        edges._gdf = gpd.GeoDataFrame({'geometry': [LineString([(0, 0), (1, 1)])]}, crs='epsg:4326')
+        QMFixedCalculator(self.edges_file_path, 'test_output.parquet', edges=edges, output_format='geoparquet').calculate_quality_metric()
+        self.assertEqual(mock_to_parquet.call_args.args[1], 'test_output.parquet')
+
+    def test_calculate_quality_metric_into_archive(self):
+        edges = EdgesDataset(self.edges_file_path)
+        edges._gdf = gpd.GeoDataFrame({'geometry': [LineString([(0, 0), (1, 1)])]}, crs='epsg:4326')
+        archive = MagicMock()
+        result = QMFixedCalculator(self.edges_file_path, 'fixed_qm.geojson', edges=edges, output_archive=archive).calculate_quality_metric()
+        name, gdf, output_format = archive.write.call_args.args
+        self.assertEqual((name, output_format), ('fixed_qm.geojson', 'geojson'))
+        self.assertIn('fixed_score', gdf.columns)
+        self.assertEqual(result.output_file, 'fixed_qm.geojson')
+
+    def test_calculate_quality_metric_into_archive_with_dates(self):
+        edges = EdgesDataset(self.edges_file_path)
+        edges._gdf = gpd.GeoDataFrame({
+            'check_date': pd.to_datetime(['2023-01-02']),
+            'geometry': [LineString([(0, 0), (1, 1)])],
+        }, crs='epsg:4326')
+        with tempfile.TemporaryDirectory() as directory:
+            zip_path = os.path.join(directory, 'qm-output.zip')
+            with OutputArchive(zip_path) as archive:
+                result = QMFixedCalculator(self.edges_file_path, 'fixed_qm.geojson', edges=edges, output_archive=archive).calculate_quality_metric()
+            self.assertTrue(result.success)
+            with zipfile.ZipFile(zip_path) as output_zip:
+                feature = json.loads(output_zip.read('fixed_qm.geojson'))['features'][0]
+        self.assertEqual(feature['properties']['check_date'], '2023-01-02T00:00:00')
+
+    def test_invalid_output_format(self):
+        with self.assertRaises(ValueError):
+            QMFixedCalculator(self.edges_file_path, self.output_file_path, output_format='shapefile')
+
     def test_algorithm_name(self):
         self.assertEqual(self.calculator.algorithm_name(), 'QMFixedCalculator')
 
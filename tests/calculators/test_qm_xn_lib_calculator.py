@@ -1,11 +1,24 @@
+import io
 import os
 import unittest
-from unittest.mock import patch, MagicMock, call
+import zipfile
+from concurrent.futures import Future
+from unittest.mock import patch, MagicMock, call, ANY
+from multiprocessing.pool import ThreadPool
 from src.calculators.qm_xn_lib_calculator import QMXNLibCalculator
 from src.calculators.qm_calculator import QualityMetricResult
+from src.calculators.tile_graph import CSRGraph, add_osw_endpoints
+from src.calculators.tile_incidence import edge_incidence
+from src.calculators.shared_edges import SharedEdges
+from src.calculators.tile_results import TileResultStore
+from src.calculators.tile_scheduling import BoundedPoolExecutor
+from src.calculators.output_archive import OutputArchive
 import geopandas as gpd
-from shapely.geometry import LineString, MultiLineString, Polygon, Point, MultiPolygon
+import numpy as np
+import pandas as pd
+from shapely.geometry import LineString, MultiLineString, Polygon, Point, MultiPolygon, box
 import tempfile
+import pickle
 import json
 from subprocess import run, PIPE
 import networkx as nx
@@ -31,53 +44,86 @@ class TestQMXNLibCalculator(unittest.TestCase):
         self.assertIsNotNone(self.calculator.default_projection)
         self.assertIsNotNone(self.calculator.output_projection)
 
-    @patch('src.calculators.qm_xn_lib_calculator.gpd.read_file')
-    @patch('src.calculators.qm_xn_lib_calculator.nx.Graph')
-    def test_graph_from_gdf(self, mock_graph, mock_read_file):
-        mock_gdf = MagicMock(spec=gpd.GeoDataFrame)
-        mock_read_file.return_value = mock_gdf
-        mock_graph_instance = MagicMock()
-        mock_graph.return_value = mock_graph_instance
-
-        # Create mock geometries
-        mock_gdf.iterrows.return_value = iter([
-            (0, MagicMock(geometry=LineString([(0, 0), (1, 1)]))),
-            (1, MagicMock(geometry=LineString([(1, 1), (2, 2)]))),
-        ])
-
-        G = self.calculator.graph_from_gdf(mock_gdf)
-        mock_graph.assert_called_once()
-        self.assertEqual(G, mock_graph_instance)
-
-    @patch('src.calculators.qm_xn_lib_calculator.gpd.read_file')
+    def test_graph_from_gdf(self):
+        gdf = gpd.GeoDataFrame({'id': [1, 2], 'geometry': [
+            LineString([(0, 0), (1, 1)]),
+            LineString([(1, 1), (2, 2)]),
+        ]})
+
+        self.assertIsInstance(self.calculator.graph_from_gdf(gdf), CSRGraph)
+        self.calculator.graph_backend = 'networkx'
+        G = self.calculator.graph_from_gdf(gdf)
+        self.assertIsInstance(G, nx.Graph)
+        self.assertEqual(list(G.edges()), [(0, 1), (1, 2)])
+        self.assertEqual(G.graph['node_coords'].tolist(), [[0, 0], [1, 1], [2, 2]])
+        self.assertEqual(G.edges[0, 1], {})
+
+    def test_graph_from_gdf_snap_tolerance(self):
+        gdf = gpd.GeoDataFrame({'geometry': [
+            LineString([(0, 0), (1, 1)]),
+            LineString([(1 + 1e-9, 1), (2, 2)]),
+        ]})
+
+        self.calculator.graph_backend = 'networkx'
+        self.assertEqual(self.calculator.graph_from_gdf(gdf).number_of_nodes(), 4)
+        self.calculator.snap_tolerance = 1e-6
+        G = self.calculator.graph_from_gdf(gdf)
+        self.assertEqual(G.number_of_nodes(), 3)
+        self.assertEqual(G.graph['merged_nodes'], 1)
+
+    def test_graph_from_gdf_with_attributes(self):
+        gdf = gpd.GeoDataFrame({'id': [1, 2], 'geometry': [
+            LineString([(0, 0), (1, 1)]),
+            LineString([(1, 1), (2, 2)]),
+        ]})
+
+        G = self.calculator.graph_from_gdf(gdf, attributes=['id'])
+        self.assertEqual(G.edges[1, 2], {'id': 2})
+
+    @patch('src.calculators.qm_xn_lib_calculator.QMXNLibCalculator.log_worker_load')
+    @patch('src.calculators.qm_xn_lib_calculator.edge_incidence')
+    @patch('src.calculators.edges_dataset.read_features')
+    @patch('src.calculators.qm_xn_lib_calculator.read_features')
     @patch('src.calculators.qm_xn_lib_calculator.dask_geopandas.from_geopandas')
-    def test_calculate_quality_metric_with_polygon(self, mock_from_geopandas, mock_read_file):
+    def test_calculate_quality_metric_with_polygon(self, mock_from_geopandas, mock_read_tiles, mock_read_edges, mock_edge_incidence, mock_log_worker_load):
+        self.calculator.tile_schedule = 'count'
         # Mock GeoDataFrames
         mock_edges_gdf = MagicMock(spec=gpd.GeoDataFrame)
         mock_polygon_gdf = MagicMock(spec=gpd.GeoDataFrame)
         mock_result_gdf = MagicMock(spec=gpd.GeoDataFrame)
 
         # Setup mock behaviors
-        mock_read_file.side_effect = [mock_edges_gdf, mock_polygon_gdf]
+        mock_read_edges.return_value = mock_edges_gdf
+        mock_read_tiles.return_value = mock_polygon_gdf
         mock_edges_gdf.to_crs.return_value = mock_edges_gdf
         mock_polygon_gdf.to_crs.return_value = mock_polygon_gdf
         mock_polygon_subset = MagicMock(spec=gpd.GeoDataFrame)  # Mock for tile_gdf[['geometry']]
+        mock_polygon_subset.__len__.return_value = 1
         mock_polygon_gdf.__getitem__.return_value = mock_polygon_subset  # Mock subset behavior
 
         mock_result_gdf.to_crs.return_value = mock_result_gdf
+        mock_result_gdf.loc.__getitem__.return_value = mock_result_gdf
+        mock_result_gdf.drop.return_value = mock_result_gdf
+        mock_result_gdf.astype.return_value = mock_result_gdf
         mock_result_gdf.to_file = MagicMock()
         mock_from_geopandas.return_value.apply.return_value.compute.return_value = mock_result_gdf
 
         # Execute the method
         result = self.calculator.calculate_quality_metric()
+        mock_result_gdf.loc.__getitem__.assert_called_once_with(mock_polygon_subset.index)
+        mock_log_worker_load.assert_called_once_with(mock_result_gdf)
+        mock_result_gdf.drop.assert_called_once_with(columns=['_worker', '_busy_seconds'])
 
         # Assertions
-        mock_read_file.assert_any_call(self.edges_file_path)
-        mock_read_file.assert_any_call(self.polygon_file_path)
+        # only the geometry is read for the geometry topology
+        mock_read_edges.assert_called_once_with(self.edges_file_path, [], None, None)
+        mock_read_tiles.assert_called_once_with(self.polygon_file_path, columns=[])
         mock_edges_gdf.to_crs.assert_called_once_with(self.default_projection)
         mock_polygon_gdf.to_crs.assert_called_once_with(self.default_projection)
         mock_polygon_gdf.__getitem__.assert_called_once_with(['geometry'])  # Ensure subset call
-        mock_from_geopandas.assert_called_once_with(mock_polygon_subset, npartitions=os.cpu_count())
+        # the tiles carry their candidate edges into the partitions
+        mock_polygon_subset.assign.assert_called_once_with(_edge_rows=mock_edge_incidence.return_value.loc.__getitem__.return_value)
+        mock_from_geopandas.assert_called_once_with(mock_polygon_subset.assign.return_value, npartitions=os.cpu_count())
         mock_result_gdf.to_file.assert_called_once_with(self.output_file_path, driver='GeoJSON')
 
         # Verify the result
@@ -86,15 +132,19 @@ class TestQMXNLibCalculator(unittest.TestCase):
         self.assertEqual(result.message, 'QMXNLibCalculator')
         self.assertEqual(result.output_file, self.output_file_path)
 
-    @patch('src.calculators.qm_xn_lib_calculator.gpd.read_file')
-    @patch('src.calculators.qm_xn_lib_calculator.ox.graph.graph_from_polygon')
+    @patch('src.calculators.qm_xn_lib_calculator.QMXNLibCalculator.log_worker_load')
+    @patch('src.calculators.qm_xn_lib_calculator.edge_incidence')
+    @patch('src.calculators.edges_dataset.read_features')
+    @patch('src.calculators.road_network.ox.graph.graph_from_polygon')
     @patch('src.calculators.qm_xn_lib_calculator.QMXNLibCalculator.create_voronoi_diagram')
     @patch('src.calculators.qm_xn_lib_calculator.dask_geopandas.from_geopandas')
     def test_calculate_quality_metric_without_polygon(
-            self, mock_from_geopandas, mock_create_voronoi_diagram, mock_graph_from_polygon, mock_read_file
+            self, mock_from_geopandas, mock_create_voronoi_diagram, mock_graph_from_polygon, mock_read_file,
+            mock_edge_incidence, mock_log_worker_load
     ):
         # Remove the polygon file path
         self.calculator.polygon_file_path = None
+        self.calculator.tile_schedule = 'count'
 
         # Mock input GeoDataFrame
         mock_gdf = MagicMock(spec=gpd.GeoDataFrame)
@@ -114,14 +164,18 @@ class TestQMXNLibCalculator(unittest.TestCase):
 
         # Mock subset for geometry column and from_geopandas behavior
         mock_polygon_subset = MagicMock(spec=gpd.GeoDataFrame)
+        mock_polygon_subset.__len__.return_value = 1
         mock_voronoi_gdf.__getitem__.return_value = mock_polygon_subset
+        mock_voronoi_gdf.loc.__getitem__.return_value = mock_voronoi_gdf
+        mock_voronoi_gdf.drop.return_value = mock_voronoi_gdf
+        mock_voronoi_gdf.astype.return_value = mock_voronoi_gdf
         mock_from_geopandas.return_value.apply.return_value.compute.return_value = mock_voronoi_gdf
 
         # Execute the method
         result = self.calculator.calculate_quality_metric()
 
         # Assertions
-        mock_read_file.assert_called_once_with(self.edges_file_path)
+        mock_read_file.assert_called_once_with(self.edges_file_path, [], None, None)
         mock_gdf.to_crs.assert_called_once_with(self.calculator.default_projection)
         mock_graph_from_polygon.assert_called_once_with(
             mock_convex_hull, network_type='drive', simplify=True, retain_all=True
@@ -136,7 +190,9 @@ class TestQMXNLibCalculator(unittest.TestCase):
         self.assertEqual(mock_voronoi_gdf.to_crs.call_count, 2)  # Ensure exactly 2 calls occurred
 
         mock_voronoi_gdf.__getitem__.assert_called_once_with(['geometry'])
-        mock_from_geopandas.assert_called_once_with(mock_polygon_subset, npartitions=os.cpu_count())
+        # the tiles carry their candidate edges into the partitions
+        mock_polygon_subset.assign.assert_called_once_with(_edge_rows=mock_edge_incidence.return_value.loc.__getitem__.return_value)
+        mock_from_geopandas.assert_called_once_with(mock_polygon_subset.assign.return_value, npartitions=os.cpu_count())
         mock_voronoi_gdf.to_file.assert_called_once_with(self.output_file_path, driver='GeoJSON')
 
         # Verify the result
@@ -242,19 +298,16 @@ class TestQMXNLibCalculator(unittest.TestCase):
 
             self.assertEqual(result.returncode, 0)
 
-    @patch('src.calculators.qm_xn_lib_calculator.nx.Graph')
-    def test_graph_from_gdf_multilinestring(self, mock_graph):
-        mock_gdf = MagicMock(spec=gpd.GeoDataFrame)
-        mock_graph_instance = mock_graph.return_value
-
-        # Mock a MultiLineString geometry
-        mock_gdf.iterrows.return_value = iter([
-            (0, MagicMock(geometry=MultiLineString([LineString([(0, 0), (1, 1)]), LineString([(1, 1), (2, 2)])]))),
-        ])
+    def test_graph_from_gdf_multilinestring(self):
+        gdf = gpd.GeoDataFrame({'geometry': [
+            MultiLineString([LineString([(0, 0), (1, 1)]), LineString([(1, 1), (2, 2)])]),
+            Point(5, 5),
+        ]})
 
-        G = self.calculator.graph_from_gdf(mock_gdf)
-        self.assertEqual(G, mock_graph_instance)
-        self.assertEqual(mock_graph_instance.add_edge.call_count, 2)
+        self.calculator.graph_backend = 'networkx'
+        G = self.calculator.graph_from_gdf(gdf)
+        self.assertEqual(G.number_of_edges(), 2)
+        self.assertNotIn([5, 5], G.graph['node_coords'].tolist())
 
     def test_group_G_pts(self):
         mock_graph = nx.Graph()
@@ -265,6 +318,14 @@ class TestQMXNLibCalculator(unittest.TestCase):
         self.assertTrue(isinstance(result, dict))
         self.assertTrue(all(isinstance(v, list) for v in result.values()))
 
+    def test_tile_tra_score_polygon_with_hole(self):
+        graph = nx.Graph()
+        graph.add_edge((2, 0), (2, 1))
+        polygon = Polygon([(0, 0), (4, 0), (4, 4), (0, 4)], [[(1, 1), (3, 1), (3, 3), (1, 1)]])
+
+        result = self.calculator.get_stats(polygon, graph, MagicMock())
+        self.assertEqual(result['tra_score'], 3 / 28)
+
     def test_edges_are_connected(self):
         mock_graph = nx.Graph()
         mock_graph.add_edge((0, 0), (1, 1))
@@ -283,6 +344,359 @@ class TestQMXNLibCalculator(unittest.TestCase):
         self.assertTrue(isinstance(result, tuple))
         self.assertEqual(len(result), 3)
 
+    def test_invalid_tra_engine(self):
+        with self.assertRaises(ValueError):
+            QMXNLibCalculator(self.edges_file_path, self.output_file_path, tra_engine='unknown')
+
+    def test_invalid_graph_backend(self):
+        with self.assertRaises(ValueError):
+            QMXNLibCalculator(self.edges_file_path, self.output_file_path, graph_backend='unknown')
+        with self.assertRaises(ValueError):
+            QMXNLibCalculator(self.edges_file_path, self.output_file_path, tra_engine='pairwise', graph_backend='csr')
+
+    @patch('src.calculators.qm_xn_lib_calculator.QMXNLibCalculator.create_voronoi_diagram')
+    @patch('src.calculators.edges_dataset.read_features')
+    def test_calculate_quality_metric_uses_road_network(self, mock_read_file, mock_create_voronoi_diagram):
+        road_network = MagicMock()
+        calculator = QMXNLibCalculator(self.edges_file_path, self.output_file_path, road_network=road_network)
+        mock_gdf = MagicMock(spec=gpd.GeoDataFrame)
+        mock_read_file.return_value = mock_gdf
+        mock_create_voronoi_diagram.side_effect = Exception('stop after tiling')
+
+        calculator.calculate_quality_metric()
+        road_network.graph_from_polygon.assert_called_once_with(mock_gdf.unary_union.convex_hull)
+        mock_create_voronoi_diagram.assert_called_once_with(road_network.graph_from_polygon.return_value, mock_gdf.unary_union.convex_hull)
+
+    @patch('src.calculators.qm_xn_lib_calculator.read_features')
+    @patch('src.calculators.edges_dataset.read_features')
+    def test_calculate_quality_metric_waits_for_polygon_download(self, mock_read_edges, mock_read_tiles):
+        polygon_download = Future()
+        events = []
+
+        def read_edges(*args):
+            events.append('edges')
+            polygon_download.set_result('')
+            return MagicMock(spec=gpd.GeoDataFrame)
+
+        def read_tiles(*args, **kwargs):
+            events.append(('tiles', polygon_download.done()))
+            raise Exception('stop after tiling')
+
+        mock_read_edges.side_effect = read_edges
+        mock_read_tiles.side_effect = read_tiles
+        calculator = QMXNLibCalculator(self.edges_file_path, self.output_file_path, self.polygon_file_path, polygon_download=polygon_download)
+        self.assertFalse(calculator.calculate_quality_metric().success)
+        # the edges are read while the polygon file downloads
+        self.assertEqual(events, ['edges', ('tiles', True)])
+
+    @patch('src.calculators.qm_xn_lib_calculator.read_features')
+    @patch('src.calculators.edges_dataset.read_features')
+    def test_calculate_quality_metric_polygon_download_failure(self, mock_read_edges, mock_read_tiles):
+        polygon_download = Future()
+        polygon_download.set_exception(Exception('download failed'))
+        calculator = QMXNLibCalculator(self.edges_file_path, self.output_file_path, self.polygon_file_path, polygon_download=polygon_download)
+        self.assertFalse(calculator.calculate_quality_metric().success)
+        mock_read_tiles.assert_not_called()
+        self.assertIsNone(pickle.loads(pickle.dumps(calculator)).polygon_download)
+
+    def test_invalid_tiler(self):
+        with self.assertRaises(ValueError):
+            QMXNLibCalculator(self.edges_file_path, self.output_file_path, tiler='unknown')
+
+    def test_invalid_output_format(self):
+        with self.assertRaises(ValueError):
+            QMXNLibCalculator(self.edges_file_path, self.output_file_path, output_format='shapefile')
+
+    def test_create_tiles_grid(self):
+        gdf = gpd.GeoDataFrame({'geometry': [LineString([(-122.33, 47.60), (-122.32, 47.61)])]}, crs='epsg:4326')
+        bounds = gdf.unary_union.envelope
+        for tiler in ['square', 'hex']:
+            calculator = QMXNLibCalculator(self.edges_file_path, self.output_file_path, tiler=tiler, tile_size=250)
+            tiles = calculator.create_tiles(gdf, bounds)
+            self.assertEqual(tiles.crs, self.default_projection)
+            self.assertGreater(len(tiles), 4)
+            self.assertAlmostEqual(tiles.area.sum(), gpd.GeoSeries([bounds], crs='epsg:4326').to_crs(self.default_projection).area[0], places=2)
+
+    def test_create_tiles_junction_voronoi(self):
+        gdf = gpd.GeoDataFrame({'geometry': [
+            LineString([(-122.33, 47.60), (-122.32, 47.60)]),
+            LineString([(-122.33, 47.60), (-122.33, 47.61)]),
+            LineString([(-122.33, 47.60), (-122.34, 47.59)]),
+        ]}, crs='epsg:4326')
+        calculator = QMXNLibCalculator(self.edges_file_path, self.output_file_path, tiler='junction_voronoi')
+        tiles = calculator.create_tiles(gdf, gdf.unary_union.convex_hull)
+        self.assertEqual(len(tiles), 1)
+        self.assertEqual(tiles.crs, self.default_projection)
+
+    @patch('src.calculators.qm_xn_lib_calculator.QMXNLibCalculator.create_voronoi_diagram')
+    def test_create_tiles_osmnx(self, mock_create_voronoi_diagram):
+        road_network = MagicMock()
+        calculator = QMXNLibCalculator(self.edges_file_path, self.output_file_path, road_network=road_network)
+        bounds = box(0, 0, 1, 1)
+        result = calculator.create_tiles(MagicMock(), bounds)
+        road_network.graph_from_polygon.assert_called_once_with(bounds)
+        mock_create_voronoi_diagram.assert_called_once_with(road_network.graph_from_polygon.return_value, bounds)
+        self.assertIs(result, mock_create_voronoi_diagram.return_value)
+
+    @patch('src.calculators.qm_xn_lib_calculator.dask_geopandas.from_geopandas')
+    @patch('src.calculators.qm_xn_lib_calculator.split_tiles')
+    @patch('src.calculators.qm_xn_lib_calculator.read_features')
+    @patch('src.calculators.edges_dataset.read_features')
+    def test_calculate_quality_metric_splits_tiles(self, mock_read_edges, mock_read_tiles, mock_split_tiles, mock_from_geopandas):
+        calculator = QMXNLibCalculator(self.edges_file_path, self.output_file_path, self.polygon_file_path, max_tile_cost=100, tile_schedule='count')
+        gdf = gpd.GeoDataFrame({'geometry': [LineString([(0, 0), (1, 1)])]}, crs=self.default_projection)
+        tile_gdf = gpd.GeoDataFrame({'geometry': [box(0, 0, 1, 1)]}, crs=self.default_projection)
+        mock_read_edges.return_value = gdf
+        mock_read_tiles.return_value = tile_gdf
+        mock_split_tiles.return_value = gpd.GeoDataFrame({'geometry': [box(0, 0, 1, 1)], 'parent_tile': [0]}, crs=self.default_projection)
+        mock_from_geopandas.return_value.apply.side_effect = Exception('stop before compute')
+
+        calculator.calculate_quality_metric()
+        self.assertEqual(mock_split_tiles.call_args.args[2], 100)
+        meta = mock_from_geopandas.return_value.apply.call_args.kwargs['meta']
+        self.assertEqual([column for column, _ in meta], ['geometry', 'parent_tile', 'tra_score', '_worker', '_busy_seconds'])
+
+    @patch('src.calculators.qm_xn_lib_calculator.QMXNLibCalculator.score_tiles')
+    @patch('src.calculators.qm_xn_lib_calculator.read_features')
+    @patch('src.calculators.edges_dataset.read_features')
+    def test_calculate_quality_metric_scores_only_projected_edges(self, mock_read_edges, mock_read_tiles, mock_score_tiles):
+        mock_read_edges.return_value = gpd.GeoDataFrame({'geometry': [LineString([(-122.33, 47.6), (-122.32, 47.6)])]}, crs='epsg:4326')
+        mock_read_tiles.return_value = gpd.GeoDataFrame({'geometry': [box(-122.34, 47.59, -122.31, 47.61)]}, crs='epsg:4326')
+        mock_score_tiles.side_effect = lambda tiles, edges, edge_index, fingerprints: tiles.assign(tra_score=0.5)
+        with tempfile.TemporaryDirectory() as directory:
+            calculator = QMXNLibCalculator(self.edges_file_path, os.path.join(directory, 'output.geojson'), self.polygon_file_path)
+            self.assertTrue(calculator.calculate_quality_metric().success)
+        # the edges in the CRS of the file are not kept next to the projected ones while the tiles are scored
+        self.assertIsNone(calculator.edges._gdf)
+        self.assertIs(mock_score_tiles.call_args.args[1], calculator.edges.projected(self.default_projection))
+
+    @patch('src.calculators.qm_xn_lib_calculator.QMXNLibCalculator.score_tiles')
+    @patch('src.calculators.qm_xn_lib_calculator.read_features')
+    @patch('src.calculators.edges_dataset.read_features')
+    def test_calculate_quality_metric_reuses_stored_results(self, mock_read_edges, mock_read_tiles, mock_score_tiles):
+        gdf = gpd.GeoDataFrame({'geometry': [LineString([(0, 0), (1, 1)]), LineString([(10, 0), (11, 1)])]}, crs=self.default_projection)
+        tile_gdf = gpd.GeoDataFrame({'geometry': [box(-1, -1, 2, 2), box(9, -1, 12, 2)]}, crs=self.default_projection)
+        mock_read_tiles.return_value = tile_gdf
+        with tempfile.TemporaryDirectory() as directory:
+            store = TileResultStore(os.path.join(directory, 'tile_results.sqlite'))
+
+            def score_tiles(tiles, edges, edge_index, fingerprints):
+                store.put_many((fingerprint, 0.5) for fingerprint in fingerprints)
+                return tiles.assign(tra_score=0.5)
+            mock_score_tiles.side_effect = score_tiles
+            output_file_path = os.path.join(directory, 'output.geojson')
+            calculator = QMXNLibCalculator(self.edges_file_path, output_file_path, self.polygon_file_path, result_store=store)
+            mock_read_edges.return_value = gdf
+            self.assertTrue(calculator.calculate_quality_metric().success)
+            self.assertEqual(len(mock_score_tiles.call_args.args[0]), 2)
+
+            # only the tile with the moved edge is scored again
+            moved = gdf.copy()
+            moved.geometry[1] = LineString([(10, 0), (11, 2)])
+            calculator = QMXNLibCalculator(self.edges_file_path, output_file_path, self.polygon_file_path, result_store=store)
+            mock_read_edges.return_value = moved
+            self.assertTrue(calculator.calculate_quality_metric().success)
+            self.assertEqual(list(mock_score_tiles.call_args.args[0].index), [1])
+            with open(output_file_path) as output_file:
+                features = json.load(output_file)['features']
+            self.assertEqual([feature['properties']['tra_score'] for feature in features], [0.5, 0.5])
+
+    def test_invalid_tile_schedule(self):
+        with self.assertRaises(ValueError):
+            QMXNLibCalculator(self.edges_file_path, self.output_file_path, tile_schedule='unknown')
+
+    @patch('src.calculators.qm_xn_lib_calculator.partition_tiles')
+    def test_partition_tiles_by_cost(self, mock_partition_tiles):
+        tile_gdf = gpd.GeoDataFrame({'geometry': [Polygon([(0, 0), (1, 0), (1, 1)])] * 10})
+        edge_index = edge_incidence(tile_gdf, gpd.GeoDataFrame({'geometry': [LineString([(0, 0), (1, 1)])]}))
+        result = self.calculator.partition_tiles(tile_gdf, edge_index, 2)
+        self.assertIs(result, mock_partition_tiles.return_value)
+        labels = mock_partition_tiles.call_args.args[1]
+        self.assertEqual(sorted(set(labels)), list(range(2 * QMXNLibCalculator.PARTITIONS_PER_CORE)))
+
+    @patch('src.calculators.qm_xn_lib_calculator.QMXNLibCalculator.qm_func')
+    def test_timed_qm_func_stores_score(self, mock_qm_func):
+        mock_qm_func.return_value = pd.Series({'_edge_rows': np.array([4]), '_fingerprint': 'abc', 'tra_score': 0.5}, name=3)
+        self.calculator.result_store = MagicMock()
+        result = self.calculator.timed_qm_func(MagicMock(), MagicMock())
+        self.calculator.result_store.put_many.assert_called_once_with([('abc', 0.5)])
+        self.assertEqual(list(result.index), ['tra_score', '_worker', '_busy_seconds'])
+
+    @patch('src.calculators.qm_xn_lib_calculator.QMXNLibCalculator.get_measures_from_polygon')
+    def test_timed_qm_func_on_geometry_only_row(self, mock_get_measures_from_polygon):
+        mock_get_measures_from_polygon.return_value = {'tra_score': 0.5}
+        tile_gdf = gpd.GeoDataFrame({'geometry': [box(0, 0, 1, 1), Point(0, 0)]})
+        scored = self.calculator.timed_qm_func(tile_gdf.iloc[0], MagicMock())
+        self.assertEqual(scored['tra_score'], 0.5)
+        self.assertEqual(scored['_worker'], os.getpid())
+        unscored = self.calculator.timed_qm_func(tile_gdf.iloc[1], MagicMock())
+        self.assertNotIn('tra_score', unscored)
+        self.assertEqual(unscored['_worker'], os.getpid())
+
+    @patch('src.calculators.qm_xn_lib_calculator.QMXNLibCalculator.qm_func')
+    def test_timed_qm_func(self, mock_qm_func):
+        mock_qm_func.return_value = pd.Series({'tra_score': 0.5})
+        result = self.calculator.timed_qm_func(MagicMock(), MagicMock())
+        self.assertEqual(result['_worker'], os.getpid())
+        self.assertGreaterEqual(result['_busy_seconds'], 0)
+
+    def test_score_tiles_ships_edge_rows_with_the_partitions(self):
+        gdf = gpd.GeoDataFrame({'geometry': [LineString([(0, 0.5), (1, 0.5)]), LineString([(10, 0.5), (11, 0.5)])]}, crs=self.default_projection)
+        tile_gdf = gpd.GeoDataFrame({'geometry': [box(0, 0, 1, 1), box(10, 0, 11, 1)]}, crs=self.default_projection)
+        edge_index = edge_incidence(tile_gdf, gdf)
+        with tempfile.TemporaryDirectory() as directory:
+            store = TileResultStore(os.path.join(directory, 'tile_results.sqlite'))
+            calculator = QMXNLibCalculator(self.edges_file_path, self.output_file_path, partition_count=1, result_store=store)
+            fingerprints = pd.Series(['first', 'second'], index=tile_gdf.index)
+            with patch('src.calculators.qm_xn_lib_calculator.QMXNLibCalculator.partition_tiles', autospec=True,
+                       side_effect=QMXNLibCalculator.partition_tiles) as mock_partition_tiles:
+                output = calculator.score_tiles(tile_gdf, gdf, edge_index, fingerprints)
+            tiles = mock_partition_tiles.call_args.args[1]
+            self.assertEqual([list(rows) for rows in tiles['_edge_rows']], [[0], [1]])
+            self.assertEqual(list(tiles['_fingerprint']), ['first', 'second'])
+            self.assertEqual(list(output.columns), ['geometry', 'tra_score'])
+            expected = [calculator.get_measures_from_polygon(tile, gdf)['tra_score'] for tile in tile_gdf.geometry]
+            self.assertEqual(list(output.tra_score), expected)
+            self.assertEqual(store.get_many(fingerprints), dict(zip(fingerprints, expected)))
+
+    @patch('src.calculators.qm_xn_lib_calculator.BoundedPoolExecutor', side_effect=BoundedPoolExecutor)
+    def test_score_tiles_runs_on_max_workers(self, mock_bounded_pool_executor):
+        gdf = gpd.GeoDataFrame({'geometry': [LineString([(0, 0.5), (1, 0.5)])]}, crs=self.default_projection)
+        tile_gdf = gpd.GeoDataFrame({'geometry': [box(0, 0, 1, 1)] * 8}, crs=self.default_projection)
+        with ThreadPool(4) as pool, patch('src.calculators.qm_xn_lib_calculator.os.cpu_count', return_value=4):
+            calculator = QMXNLibCalculator(self.edges_file_path, self.output_file_path, partition_count=4, pool=pool, max_workers=2)
+            output = calculator.score_tiles(tile_gdf, gdf, edge_incidence(tile_gdf, gdf))
+        mock_bounded_pool_executor.assert_called_once_with(pool, 2)
+        self.assertEqual(len(output), 8)
+
+    @patch('src.calculators.qm_xn_lib_calculator.dask_geopandas.from_geopandas')
+    def test_score_tiles_without_pool_starts_max_workers(self, mock_from_geopandas):
+        tile_gdf = gpd.GeoDataFrame({'geometry': [box(0, 0, 1, 1)]}, crs=self.default_projection)
+        with patch('src.calculators.qm_xn_lib_calculator.os.cpu_count', return_value=4):
+            calculator = QMXNLibCalculator(self.edges_file_path, self.output_file_path, partition_count=4, tile_schedule='count', max_workers=1)
+            calculator.score_tiles(tile_gdf, MagicMock(), pd.Series([np.array([0])]))
+        compute = mock_from_geopandas.return_value.apply.return_value.compute
+        self.assertEqual(compute.call_args.kwargs['num_workers'], 1)
+        self.assertIsNone(compute.call_args.kwargs['pool'])
+        mock_from_geopandas.assert_called_once_with(ANY, npartitions=4)
+
+    @patch('src.calculators.qm_xn_lib_calculator.logger')
+    def test_log_worker_load(self, mock_logger):
+        output = gpd.GeoDataFrame({'_worker': [1, 1, 2], '_busy_seconds': [1.0, 2.0, 1.0]})
+        self.calculator.log_worker_load(output)
+        mock_logger.info.assert_any_call('Worker 1 scored 2 tiles in 3.00s')
+        mock_logger.info.assert_any_call('Busiest worker was busy 1.50x the mean')
+
+    def test_pickle_leaves_edges_behind(self):
+        self.calculator.edges._gdf = gpd.GeoDataFrame({'geometry': [LineString([(0, 0), (1, 1)])]})
+        self.assertIsNone(pickle.loads(pickle.dumps(self.calculator)).edges)
+
+    def test_pickle_leaves_pool_behind(self):
+        calculator = QMXNLibCalculator(self.edges_file_path, self.output_file_path, pool=MagicMock())
+        restored = pickle.loads(pickle.dumps(calculator.__getstate__()))
+        self.assertIsNone(restored['pool'])
+        self.assertIsNotNone(calculator.pool)
+
+    def test_pickle_leaves_output_archive_behind(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with OutputArchive(os.path.join(directory, 'qm-output.zip')) as archive:
+                calculator = QMXNLibCalculator(self.edges_file_path, 'ixn_qm.geojson', output_archive=archive)
+                self.assertIsNone(pickle.loads(pickle.dumps(calculator)).output_archive)
+                self.assertIs(calculator.output_archive, archive)
+
+    def test_invalid_topology(self):
+        with self.assertRaises(ValueError):
+            QMXNLibCalculator(self.edges_file_path, self.output_file_path, topology='unknown')
+
+    def test_get_measures_from_polygon_osw_topology(self):
+        gdf = gpd.GeoDataFrame({
+            '_u_id': ['a', 'c'],
+            '_v_id': ['b', 'd'],
+            'geometry': [LineString([(-1, 0.5), (0.5, 0.5), (2, 0.5)]), LineString([(0.5, -1), (0.5, 0.5), (0.5, 2)])],
+        })
+        polygon = Polygon([(0, 0), (1, 0), (1, 1), (0, 1), (0, 0)])
+
+        self.assertEqual(self.calculator.get_measures_from_polygon(polygon, gdf)['tra_score'], 1.0)
+        calculator = QMXNLibCalculator(self.edges_file_path, self.output_file_path, topology='osw')
+        result = calculator.get_measures_from_polygon(polygon, add_osw_endpoints(gdf))
+        self.assertEqual(result['tra_score'], 0.6)
+
+    def test_tra_engines_and_graph_backends_match_on_fixture_tiles(self):
+        fixtures_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'xnqm', 'inputs')
+        for fixture in ['p13', 'p14']:
+            gdf = gpd.read_file(os.path.join(fixtures_dir, f'{fixture}_edges.geojson')).to_crs(self.default_projection)
+            tile_gdf = gpd.read_file(os.path.join(fixtures_dir, f'{fixture}_polygon.geojson')).to_crs(self.default_projection)
+            scores = {}
+            for engine, backend in [('components', 'csr'), ('components', 'networkx'), ('pairwise', 'networkx')]:
+                calculator = QMXNLibCalculator(self.edges_file_path, self.output_file_path, tra_engine=engine, graph_backend=backend)
+                scores[engine, backend] = [calculator.get_measures_from_polygon(polygon, gdf)['tra_score'] for polygon in tile_gdf.geometry[:60]]
+            self.assertEqual(scores['components', 'csr'], scores['pairwise', 'networkx'])
+            self.assertEqual(scores['components', 'networkx'], scores['pairwise', 'networkx'])
+
+    def test_shared_edges_match_gdf_on_fixture_tiles(self):
+        fixtures_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'xnqm', 'inputs')
+        gdf = gpd.read_file(os.path.join(fixtures_dir, 'p13_edges.geojson')).to_crs(self.default_projection)
+        tile_gdf = gpd.read_file(os.path.join(fixtures_dir, 'p13_polygon.geojson')).to_crs(self.default_projection)[['geometry']]
+        tile_gdf['tra_score'] = None
+        tile_gdf['_edge_rows'] = edge_incidence(tile_gdf, gdf)
+        with tempfile.TemporaryDirectory() as shared_dir:
+            edges = self.calculator.share_edges(gdf, shared_dir)
+            self.assertIsInstance(edges, SharedEdges)
+            for _, feature in tile_gdf.iloc[:40].iterrows():
+                expected = self.calculator.qm_func(feature.copy(), gdf)
+                result = self.calculator.qm_func(feature.copy(), edges)
+                self.assertEqual(result['tra_score'], expected['tra_score'])
+
+    def test_stream_ingest_matches_memory_on_fixture(self):
+        fixtures_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'xnqm', 'inputs')
+        gdf = gpd.read_file(os.path.join(fixtures_dir, 'p13_edges.geojson'))
+        with tempfile.TemporaryDirectory() as directory:
+            # a corner of the fixture with OSW node ids, tiled by a square grid
+            edges_file_path = os.path.join(directory, 'edges.geojson')
+            corner = gdf.cx[:gdf.total_bounds[0] + 0.004, :gdf.total_bounds[1] + 0.004].reset_index(drop=True)
+            corner['_u_id'] = corner.geometry.apply(lambda line: str(line.coords[0]) if line.geom_type == 'LineString' else None)
+            corner['_v_id'] = corner.geometry.apply(lambda line: str(line.coords[-1]) if line.geom_type == 'LineString' else None)
+            corner.to_file(edges_file_path, driver='GeoJSON')
+            scores = {}
+            for ingest in self.calculator.INGESTS:
+                output_file_path = os.path.join(directory, f'{ingest}.geojson')
+                calculator = QMXNLibCalculator(edges_file_path, output_file_path, partition_count=1, topology='osw', tiler='square',
+                                               tile_size=100, ingest=ingest, chunk_size=50)
+                self.assertTrue(calculator.calculate_quality_metric().success)
+                scores[ingest] = gpd.read_file(output_file_path)
+            self.assertGreater(len(scores['memory']), 1)
+            self.assertEqual(list(scores['stream'].tra_score), list(scores['memory'].tra_score))
+            self.assertTrue(scores['stream'].geom_equals(scores['memory']).all())
+
+    def test_output_archive_matches_file_on_fixture(self):
+        fixtures_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'xnqm', 'inputs')
+        gdf = gpd.read_file(os.path.join(fixtures_dir, 'p13_edges.geojson'))
+        with tempfile.TemporaryDirectory() as directory:
+            edges_file_path = os.path.join(directory, 'edges.geojson')
+            gdf.cx[:gdf.total_bounds[0] + 0.004, :gdf.total_bounds[1] + 0.004].to_file(edges_file_path, driver='GeoJSON')
+            output_file_path = os.path.join(directory, 'ixn_qm.geojson')
+            QMXNLibCalculator(edges_file_path, output_file_path, partition_count=1, tiler='square', tile_size=100).calculate_quality_metric()
+            with OutputArchive(os.path.join(directory, 'qm-output.zip')) as archive:
+                result = QMXNLibCalculator(edges_file_path, 'ixn_qm.geojson', partition_count=1, tiler='square', tile_size=100,
+                                           output_archive=archive).calculate_quality_metric()
+            self.assertTrue(result.success)
+            expected = gpd.read_file(output_file_path)
+            with zipfile.ZipFile(archive.file_path) as output_zip:
+                archived = gpd.read_file(io.BytesIO(output_zip.read('ixn_qm.geojson')))
+            self.assertEqual(list(archived.tra_score), list(expected.tra_score))
+            # GDAL rounds the coordinates to 15 significant digits, the zip entry keeps them as they are
+            self.assertTrue(archived.geom_equals_exact(expected, 1e-9).all())
+
+    def test_invalid_ingest(self):
+        with self.assertRaises(ValueError):
+            QMXNLibCalculator(self.edges_file_path, self.output_file_path, ingest='unknown')
+        calculator = QMXNLibCalculator(self.edges_file_path, self.output_file_path, tiler='junction_voronoi', ingest='stream')
+        self.assertEqual(calculator.ingest, 'memory')
+
+    def test_share_edges_falls_back_for_non_lines(self):
+        gdf = gpd.GeoDataFrame({'geometry': [Point(0, 0)]})
+        self.assertIs(self.calculator.share_edges(gdf, 'unused'), gdf)
+
     @patch('src.calculators.qm_xn_lib_calculator.gpd.clip')
     def test_get_measures_from_polygon(self, mock_clip):
         mock_gdf = MagicMock(spec=gpd.GeoDataFrame)
@@ -306,6 +720,18 @@ class TestQMXNLibCalculator(unittest.TestCase):
         result = self.calculator.qm_func(mock_feature, mock_gdf)
         self.assertEqual(result.loc['tra_score'], 0.8)
 
+    @patch('src.calculators.qm_xn_lib_calculator.QMXNLibCalculator.get_measures_from_polygon')
+    def test_qm_func_with_edge_rows(self, mock_get_measures_from_polygon):
+        polygon = Polygon([(0, 0), (1, 0), (1, 1), (0, 1), (0, 0)])
+        feature = pd.Series({'geometry': polygon, '_edge_rows': [4, 5]}, name=3)
+        mock_gdf = MagicMock(spec=gpd.GeoDataFrame)
+        mock_get_measures_from_polygon.return_value = {'tra_score': 0.5}
+
+        result = self.calculator.qm_func(feature, mock_gdf)
+        mock_gdf.take.assert_called_once_with([4, 5])
+        mock_get_measures_from_polygon.assert_called_once_with(polygon, mock_gdf.take.return_value)
+        self.assertEqual(result.loc['tra_score'], 0.5)
+
     @patch('src.calculators.qm_xn_lib_calculator.gpd.GeoDataFrame')
     @patch('src.calculators.qm_xn_lib_calculator.voronoi_diagram')
     @patch('src.calculators.qm_xn_lib_calculator.gnx.graph_edges_to_gdf')
@@ -337,7 +763,9 @@ class TestQMXNLibCalculator(unittest.TestCase):
 
         # Mock GeoDataFrame creation and clipping
         mock_geo_dataframe.return_value = mock_voronoi_gdf
-        gpd.clip = MagicMock(return_value=mock_voronoi_gdf_clipped)
+        clip_patcher = patch.object(gpd, 'clip', return_value=mock_voronoi_gdf_clipped)
+        clip_patcher.start()
+        self.addCleanup(clip_patcher.stop)
 
         # Call the function
         result = self.calculator.create_voronoi_diagram(mock_graph, mock_bounds)
@@ -350,7 +778,7 @@ class TestQMXNLibCalculator(unittest.TestCase):
         mock_voronoi_gdf_clipped.to_crs.assert_called_once_with(self.calculator.default_projection)
         self.assertEqual(result, mock_voronoi_gdf_clipped)
 
-    @patch('src.calculators.qm_xn_lib_calculator.gpd.read_file')
+    @patch('src.calculators.edges_dataset.read_features')
     def test_calculate_quality_metric_exception(self, mock_read_file):
         mock_read_file.side_effect = Exception('Mocked exception')
 
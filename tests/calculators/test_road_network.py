@@ -0,0 +1,102 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from shapely.geometry import box
+from src.calculators.road_network import (
+    RoadNetworkSource, is_drive_way, quantized_hull, graph_from_osm_xml, graph_from_geojson
+)
+
+OSM_XML = '''<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+ <node id="1" lat="47.600" lon="-122.330"/>
+ <node id="2" lat="47.600" lon="-122.320"/>
+ <node id="3" lat="47.610" lon="-122.320"/>
+ <node id="4" lat="47.610" lon="-122.330"/>
+ <node id="5" lat="47.605" lon="-122.325"/>
+ <node id="6" lat="47.700" lon="-122.330"/>
+ <way id="10"><nd ref="1"/><nd ref="2"/><tag k="highway" v="residential"/></way>
+ <way id="11"><nd ref="2"/><nd ref="3"/><nd ref="4"/><tag k="highway" v="primary"/></way>
+ <way id="12"><nd ref="4"/><nd ref="5"/><nd ref="2"/><tag k="highway" v="footway"/></way>
+ <way id="13"><nd ref="4"/><nd ref="6"/><tag k="highway" v="primary"/></way>
+</osm>'''
+
+GEOJSON = {'type': 'FeatureCollection', 'features': [
+    {'type': 'Feature', 'properties': {'highway': 'residential', 'service': None},
+     'geometry': {'type': 'LineString', 'coordinates': [[-122.33, 47.6], [-122.32, 47.6]]}},
+    {'type': 'Feature', 'properties': {'highway': 'primary', 'service': None},
+     'geometry': {'type': 'LineString', 'coordinates': [[-122.32, 47.6], [-122.32, 47.61], [-122.33, 47.61]]}},
+    {'type': 'Feature', 'properties': {'highway': 'service', 'service': 'driveway'},
+     'geometry': {'type': 'LineString', 'coordinates': [[-122.33, 47.61], [-122.325, 47.605]]}},
+]}
+
+
+class TestRoadNetwork(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.osm_path = os.path.join(self.directory.name, 'extract.osm')
+        with open(self.osm_path, 'w') as osm_file:
+            osm_file.write(OSM_XML)
+        self.geojson_path = os.path.join(self.directory.name, 'extract.geojson')
+        with open(self.geojson_path, 'w') as geojson_file:
+            json.dump(GEOJSON, geojson_file)
+        self.hull = box(-122.335, 47.595, -122.315, 47.615)
+        self.cache_dir = os.path.join(self.directory.name, 'cache')
+
+    def test_is_drive_way(self):
+        self.assertTrue(is_drive_way({'highway': 'residential'}))
+        self.assertTrue(is_drive_way({'highway': 'primary', 'service': float('nan')}))
+        self.assertFalse(is_drive_way({'highway': 'footway'}))
+        self.assertFalse(is_drive_way({'highway': 'residential', 'access': 'private'}))
+        self.assertFalse(is_drive_way({'highway': ['primary', 'steps']}))
+        self.assertFalse(is_drive_way({'name': 'no highway'}))
+
+    def test_quantized_hull_contains_hull(self):
+        area = quantized_hull(self.hull, 0.01)
+        self.assertTrue(area.contains(self.hull))
+        self.assertTrue(quantized_hull(box(-122.334, 47.596, -122.316, 47.614), 0.01).equals(area))
+
+    def test_graph_from_osm_xml(self):
+        G = graph_from_osm_xml(self.osm_path, self.hull)
+        # the footway is dropped, node 6 lies outside the hull and node 2 is simplified away
+        self.assertEqual(set(G.nodes), {1, 4})
+        self.assertEqual(G.number_of_edges(), 2)
+
+    def test_graph_from_geojson(self):
+        G = graph_from_geojson(self.geojson_path, self.hull)
+        self.assertEqual(G.number_of_nodes(), 3)
+        self.assertEqual(G.number_of_edges(), 2)
+        self.assertEqual(G.graph['crs'], 'epsg:4326')
+
+    def test_unsupported_extract(self):
+        with self.assertRaises(ValueError):
+            RoadNetworkSource('extract.osm.pbf')
+
+    @patch('src.calculators.road_network.ox.graph.graph_from_polygon')
+    def test_overpass_without_cache(self, mock_graph_from_polygon):
+        result = RoadNetworkSource().graph_from_polygon(self.hull)
+        mock_graph_from_polygon.assert_called_once_with(self.hull, network_type='drive', simplify=True, retain_all=True)
+        self.assertIs(result, mock_graph_from_polygon.return_value)
+
+    def test_cache_skips_fetch(self):
+        source = RoadNetworkSource(self.osm_path, self.cache_dir)
+        first = source.graph_from_polygon(self.hull)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+        with patch.object(RoadNetworkSource, 'fetch') as mock_fetch:
+            second = source.graph_from_polygon(box(-122.334, 47.596, -122.316, 47.614))
+            mock_fetch.assert_not_called()
+        self.assertEqual(set(first.nodes), set(second.nodes))
+
+    def test_cache_key_depends_on_source(self):
+        area = quantized_hull(self.hull, 0.01)
+        osm_source = RoadNetworkSource(self.osm_path, self.cache_dir)
+        geojson_source = RoadNetworkSource(self.geojson_path, self.cache_dir)
+        self.assertNotEqual(osm_source.cache_path(area), geojson_source.cache_path(area))
+        self.assertEqual(osm_source.cache_path(area), RoadNetworkSource(self.osm_path, self.cache_dir).cache_path(area))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import pickle
+import tempfile
+import unittest
+import numpy as np
+import geopandas as gpd
+from shapely.geometry import LineString, MultiLineString, Point
+from src.calculators.shared_edges import SharedEdges, _ranges
+
+
+class TestSharedEdges(unittest.TestCase):
+
+    def setUp(self):
+        self.gdf = gpd.GeoDataFrame({
+            '_u_id': ['a', 'b', None, 'c'],
+            '_v_id': ['b', 'c', 'a', 'd'],
+            'length': [1.0, 2.0, 3.0, 4.0],
+            'geometry': [
+                LineString([(0, 0), (1, 0), (2, 0)]),
+                MultiLineString([[(2, 0), (2, 1)], [(3, 0), (3, 1), (3, 2)]]),
+                LineString(),
+                LineString([(5, 5), (6, 6)]),
+            ],
+        }, crs='epsg:26910')
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.edges = SharedEdges.from_gdf(self.gdf, self.directory.name, ['_u_id', '_v_id', 'length'])
+
+    def test_ranges(self):
+        np.testing.assert_array_equal(_ranges(np.array([3, 7, 7, 0]), np.array([5, 7, 9, 2])), [3, 4, 7, 8, 0, 1])
+        self.assertEqual(len(_ranges(np.array([1]), np.array([1]))), 0)
+
+    def test_supports(self):
+        self.assertTrue(SharedEdges.supports(self.gdf))
+        self.assertFalse(SharedEdges.supports(gpd.GeoDataFrame({'geometry': [Point(0, 0)]})))
+
+    def test_take_rebuilds_geometries(self):
+        result = self.edges.take([3, 1, 0])
+        self.assertEqual(list(result.index), [3, 1, 0])
+        self.assertEqual(result.crs, self.gdf.crs)
+        for position, geometry in zip([3, 1, 0], result.geometry):
+            self.assertTrue(geometry.equals_exact(self.gdf.geometry[position], 0))
+        self.assertEqual(result.geometry[1].geom_type, 'MultiLineString')
+
+    def test_take_columns(self):
+        result = self.edges.take([0, 1, 2])
+        np.testing.assert_array_equal(result['length'], [1.0, 2.0, 3.0])
+        # ids are replaced by codes that compare like the ids
+        self.assertEqual(result['_v_id'][0], result['_u_id'][1])
+        self.assertEqual(result['_v_id'][2], result['_u_id'][0])
+        self.assertTrue(np.isnan(result['_u_id'][2]))
+
+    def test_take_empty(self):
+        result = self.edges.take(np.array([], dtype=np.int64))
+        self.assertEqual(len(result), 0)
+        self.assertIn('_u_id', result.columns)
+
+    def test_chunks(self):
+        self.assertEqual(self.edges.columns, ['_u_id', '_v_id', 'length', 'geometry'])
+        chunks = list(self.edges.chunks(3))
+        self.assertEqual([list(chunk.index) for chunk in chunks], [[0, 1, 2], [3]])
+        self.assertTrue(chunks[1].geometry[3].equals(self.gdf.geometry[3]))
+
+    def test_pickle_keeps_only_handle(self):
+        self.edges.take([0])
+        restored = pickle.loads(pickle.dumps(self.edges))
+        self.assertIsNone(restored._arrays)
+        self.assertEqual(len(restored), 4)
+        self.assertLess(len(pickle.dumps(self.edges)), sum(
+            os.path.getsize(os.path.join(self.directory.name, name)) for name in os.listdir(self.directory.name)
+        ))
+
+
+if __name__ == '__main__':
+    unittest.main()
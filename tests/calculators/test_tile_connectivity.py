@@ -0,0 +1,73 @@
+import unittest
+import networkx as nx
+import geopandas as gpd
+from shapely.geometry import LineString
+from src.calculators.tile_graph import csr_graph_from_gdf
+from shapely.geometry import Polygon
+from src.calculators.tile_connectivity import (
+    boundary_segments, group_boundary_nodes, label_components, connected_segment_pairs
+)
+
+
+class TestTileConnectivity(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = nx.Graph()
+        self.graph.add_edge((0, 0), (1, 1))
+        self.graph.add_edge((1, 1), (2, 2))
+        self.graph.add_edge((5, 5), (6, 6))
+
+    def test_boundary_segments_with_hole(self):
+        polygon = Polygon([(0, 0), (4, 0), (4, 4), (0, 4)], [[(1, 1), (2, 1), (2, 2), (1, 1)]])
+        segments = boundary_segments(polygon)
+        self.assertEqual(len(segments), 7)
+        self.assertEqual(list(segments[0].coords), [(0, 0), (4, 0)])
+        self.assertEqual(list(segments[4].coords), [(1, 1), (2, 1)])
+
+    def test_group_boundary_nodes_first_segment_wins(self):
+        polygon = Polygon([(0, 0), (1, 0), (1, 1), (0, 1)])
+        nodes = [(0.5, 0), (1, 0), (0.5, 0.5), (0, 0.5)]
+        result = group_boundary_nodes(nodes, polygon, 1e-5)
+        self.assertEqual(result, {0: [(0.5, 0), (1, 0)], 1: [], 2: [], 3: [(0, 0.5)]})
+
+    def test_group_boundary_nodes_hole(self):
+        polygon = Polygon([(0, 0), (4, 0), (4, 4), (0, 4)], [[(1, 1), (2, 1), (2, 2), (1, 1)]])
+        result = group_boundary_nodes([(1.5, 1), (2, 4)], polygon, 1e-5)
+        self.assertEqual(result[2], [(2, 4)])
+        self.assertEqual(result[4], [(1.5, 1)])
+
+    def test_group_boundary_nodes_empty(self):
+        polygon = Polygon([(0, 0), (1, 0), (1, 1), (0, 1)])
+        self.assertEqual(group_boundary_nodes([], polygon, 1e-5), {0: [], 1: [], 2: [], 3: []})
+
+    def test_label_components(self):
+        component_of = label_components(self.graph)
+        self.assertEqual(component_of[(0, 0)], component_of[(2, 2)])
+        self.assertNotEqual(component_of[(0, 0)], component_of[(5, 5)])
+
+    def test_label_components_csr(self):
+        gdf = gpd.GeoDataFrame({'geometry': [LineString([(0, 0), (1, 1), (2, 2)]), LineString([(5, 5), (6, 6)])]})
+        component_of = label_components(csr_graph_from_gdf(gdf))
+        self.assertEqual(list(component_of), [0, 0, 0, 1, 1])
+
+    def test_connected_segment_pairs(self):
+        pts_line_map = {0: [(0, 0)], 1: [(2, 2)], 2: [(5, 5)], 3: []}
+        n_total, n_connected, pairs = connected_segment_pairs(pts_line_map, label_components(self.graph))
+        self.assertEqual(n_total, 10)
+        self.assertEqual(pairs, [(0, 0), (0, 1), (1, 1), (2, 2)])
+        self.assertEqual(n_connected, 4)
+
+    def test_connected_segment_pairs_distinct_nodes(self):
+        pts_line_map = {0: [(0, 0), (2, 2)], 1: [(5, 5)]}
+        n_total, n_connected, pairs = connected_segment_pairs(pts_line_map, label_components(self.graph), distinct_nodes=True)
+        self.assertEqual(n_total, 3)
+        self.assertEqual(pairs, [(0, 0)])
+        self.assertEqual(n_connected, 1)
+
+    def test_connected_segment_pairs_no_boundary_nodes(self):
+        n_total, n_connected, pairs = connected_segment_pairs({0: [], 1: []}, {})
+        self.assertEqual((n_total, n_connected, pairs), (3, 0, []))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+import geopandas as gpd
+import numpy as np
+import networkx as nx
+from shapely.geometry import LineString, MultiLineString, Point, GeometryCollection
+from src.calculators.tile_graph import (
+    segment_arrays, snap_nodes, count_merged_nodes, node_coordinates, graph_from_gdf, csr_graph_from_gdf,
+    add_osw_endpoints, osw_segments, OSW_ENDPOINT_COLUMNS
+)
+from src.calculators.tile_connectivity import label_components
+
+
+class TestTileGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.gdf = gpd.GeoDataFrame({'highway': ['footway', 'crossing', 'footway', 'footway'], 'geometry': [
+            LineString([(0, 0), (1, 0), (2, 0)]),
+            MultiLineString([[(2, 0), (2, 1)], [(5, 5), (6, 6)]]),
+            Point(0, 0),
+            GeometryCollection([LineString([(0, 0), (9, 9)])]),
+        ]})
+
+    def test_segment_arrays(self):
+        starts, ends, rows = segment_arrays(self.gdf.geometry.values)
+        np.testing.assert_array_equal(starts, [[0, 0], [1, 0], [2, 0], [5, 5]])
+        np.testing.assert_array_equal(ends, [[1, 0], [2, 0], [2, 1], [6, 6]])
+        np.testing.assert_array_equal(rows, [0, 0, 1, 1])
+
+    def test_segment_arrays_empty(self):
+        starts, ends, rows = segment_arrays([])
+        self.assertEqual(starts.shape, (0, 2))
+        self.assertEqual(len(rows), 0)
+
+    def test_snap_nodes(self):
+        coords = np.array([[0, 0], [1, 1], [1 + 1e-9, 1], [0, 0]])
+        node_ids, node_coords, n_merged = snap_nodes(coords)
+        np.testing.assert_array_equal(node_ids, [0, 1, 2, 0])
+        self.assertEqual(n_merged, 0)
+
+        node_ids, node_coords, n_merged = snap_nodes(coords, 1e-6)
+        np.testing.assert_array_equal(node_ids, [0, 1, 1, 0])
+        np.testing.assert_array_equal(node_coords, [[0, 0], [1, 1]])
+        self.assertEqual(n_merged, 1)
+
+    def test_count_merged_nodes(self):
+        gdf = gpd.GeoDataFrame({'geometry': [LineString([(0, 0), (1, 1)]), LineString([(1, 1 + 1e-9), (2, 2)])]})
+        self.assertEqual(count_merged_nodes(gdf, 0), 0)
+        self.assertEqual(count_merged_nodes(gdf, 1e-6), 1)
+
+    def test_graph_from_gdf_integer_nodes(self):
+        G = graph_from_gdf(self.gdf)
+        self.assertEqual(list(G.nodes()), [0, 1, 2, 3, 4, 5])
+        np.testing.assert_array_equal(node_coordinates(G), [[0, 0], [1, 0], [2, 0], [2, 1], [5, 5], [6, 6]])
+        self.assertEqual(G.number_of_edges(), 4)
+        self.assertEqual(G.edges[0, 1], {})
+
+    def test_graph_from_gdf_drops_collapsed_segments(self):
+        gdf = gpd.GeoDataFrame({'geometry': [LineString([(0, 0), (1e-9, 0), (1, 0)])]})
+        G = graph_from_gdf(gdf, snap_tolerance=1e-6)
+        self.assertEqual(list(G.edges()), [(0, 1)])
+
+    def test_graph_from_gdf_attributes(self):
+        G = graph_from_gdf(self.gdf, attributes=['highway'])
+        self.assertEqual(G.edges[2, 3], {'highway': 'crossing'})
+        self.assertEqual(G.edges[1, 2], {'highway': 'footway'})
+
+    def test_csr_graph_from_gdf(self):
+        gdf = gpd.GeoDataFrame({'geometry': [LineString([(0, 0), (1, 0), (0, 0)]), LineString([(2, 0), (1, 0)])]})
+        G = csr_graph_from_gdf(gdf)
+        self.assertEqual(G.number_of_nodes(), 3)
+        self.assertEqual(G.number_of_edges(), 2)
+        self.assertEqual(list(G.nodes()), [0, 1, 2])
+        np.testing.assert_array_equal(node_coordinates(G), [[0, 0], [1, 0], [2, 0]])
+
+    def test_add_osw_endpoints(self):
+        gdf = add_osw_endpoints(self.gdf)
+        np.testing.assert_array_equal(gdf.loc[0, OSW_ENDPOINT_COLUMNS].to_numpy(dtype=float), [0, 0, 2, 0])
+        self.assertTrue(gdf.loc[1, OSW_ENDPOINT_COLUMNS].isna().all())
+
+    def test_osw_segments_join_only_at_node_ids(self):
+        # Two edges crossing at a shared vertex (e.g. a bridge over a footway) that is not an OSW node
+        gdf = add_osw_endpoints(gpd.GeoDataFrame({
+            '_u_id': ['a', 'c'],
+            '_v_id': ['b', 'd'],
+            'geometry': [LineString([(0, 0), (1, 1), (2, 2)]), LineString([(0, 2), (1, 1), (2, 0)])],
+        }))
+        G = csr_graph_from_gdf(gdf, segments=osw_segments(gdf, 1e-5))
+        self.assertEqual(G.number_of_nodes(), 4)
+        self.assertEqual(G.number_of_edges(), 2)
+        self.assertEqual(len(set(label_components(G))), 2)
+        self.assertEqual(len(set(label_components(graph_from_gdf(gdf)).values())), 1)
+
+    def test_osw_segments_clipped_edge(self):
+        gdf = add_osw_endpoints(gpd.GeoDataFrame({
+            '_u_id': [1, 2],
+            '_v_id': [2, 3],
+            'geometry': [LineString([(0, 0), (5, 0)]), LineString([(5, 0), (5, 5)])],
+        }))
+        # the second edge was cut at y=3 by the tile boundary
+        gdf.geometry = [LineString([(0, 0), (5, 0)]), LineString([(5, 0), (5, 3)])]
+        u, v, rows, node_coords, n_merged = osw_segments(gdf, 1e-5)
+        # OSW nodes 1 and 2 plus the cut point
+        self.assertEqual(len(node_coords), 3)
+        np.testing.assert_array_equal(node_coords[v[1]], [5, 3])
+        self.assertEqual(u[1], v[0])
+        np.testing.assert_array_equal(rows, [0, 1])
+
+    def test_node_coordinates_tuple_nodes(self):
+        G = nx.Graph()
+        G.add_edge((0, 0), (1, 1))
+        np.testing.assert_array_equal(node_coordinates(G), [[0, 0], [1, 1]])
+
+
+if __name__ == '__main__':
+    unittest.main()
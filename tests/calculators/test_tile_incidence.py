@@ -0,0 +1,47 @@
+import tempfile
+import unittest
+import geopandas as gpd
+from unittest.mock import patch
+from shapely.geometry import LineString, Polygon
+from src.calculators.shared_edges import SharedEdges
+from src.calculators.tile_incidence import edge_incidence
+
+
+class TestTileIncidence(unittest.TestCase):
+
+    def setUp(self):
+        self.gdf = gpd.GeoDataFrame({'geometry': [
+            LineString([(0, 0), (3, 0)]),
+            LineString([(0.5, 0.5), (0.5, 1.5)]),
+            LineString([(10, 10), (11, 11)]),
+        ]})
+        self.tile_gdf = gpd.GeoDataFrame({'geometry': [
+            Polygon([(0, -1), (1, -1), (1, 1), (0, 1)]),
+            Polygon([(20, 20), (21, 20), (21, 21)]),
+            Polygon([(2, -1), (4, -1), (4, 1), (2, 1)]),
+        ]}, index=[7, 8, 9])
+
+    def test_edge_incidence(self):
+        result = edge_incidence(self.tile_gdf, self.gdf)
+        self.assertEqual(list(result.index), [7, 8, 9])
+        self.assertEqual(list(result[7]), [0, 1])
+        self.assertEqual(list(result[8]), [])
+        self.assertEqual(list(result[9]), [0])
+
+    def test_edge_incidence_equal_length_candidates(self):
+        tile_gdf = self.tile_gdf.iloc[[0, 0]]
+        result = edge_incidence(tile_gdf, self.gdf)
+        self.assertEqual(len(result), 2)
+        self.assertEqual([list(edges) for edges in result], [[0, 1], [0, 1]])
+
+    def test_edge_incidence_shared_edges(self):
+        with tempfile.TemporaryDirectory() as directory:
+            edges = SharedEdges.from_gdf(self.gdf, directory)
+            # small chunks, so the positions of later chunks are offset
+            with patch.object(edges, 'chunks', side_effect=lambda: SharedEdges.chunks(edges, 2)):
+                result = edge_incidence(self.tile_gdf, edges)
+        self.assertEqual([list(edges) for edges in result], [[0, 1], [], [0]])
+
+
+if __name__ == '__main__':
+    unittest.main()
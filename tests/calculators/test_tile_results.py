@@ -0,0 +1,116 @@
+import multiprocessing
+import os
+import pickle
+import tempfile
+import unittest
+import numpy as np
+import geopandas as gpd
+from shapely.geometry import LineString, box
+from src.calculators.tile_incidence import edge_incidence
+from src.calculators.tile_results import TileResultStore, edge_digests, tile_fingerprints
+
+
+def put_scores(store, worker):
+    for key in range(50):
+        store.put_many([(f'{worker}-{key}', key / 50)])
+
+
+class TestTileResults(unittest.TestCase):
+
+    def setUp(self):
+        self.gdf = gpd.GeoDataFrame({
+            '_u_id': ['a', 'b', 'c'],
+            '_v_id': ['b', 'c', 'd'],
+            'geometry': [LineString([(0, 0), (1, 1)]), LineString([(1, 1), (2, 2)]), LineString([(10, 10), (11, 11)])],
+        })
+        self.tile_gdf = gpd.GeoDataFrame({'geometry': [box(-1, -1, 3, 3), box(9, 9, 12, 12)]}, index=[5, 6])
+
+    def fingerprints(self, gdf, settings='s', columns=()):
+        return tile_fingerprints(self.tile_gdf, gdf, edge_incidence(self.tile_gdf, gdf), settings, columns)
+
+    def test_edge_digests(self):
+        digests = edge_digests(self.gdf)
+        self.assertEqual(digests.dtype, np.uint64)
+        self.assertEqual(len(set(digests)), 3)
+        renamed = self.gdf.assign(_u_id=['x', 'b', 'c'])
+        np.testing.assert_array_equal(edge_digests(renamed), digests)
+        self.assertNotEqual(edge_digests(renamed, ['_u_id'])[0], edge_digests(self.gdf, ['_u_id'])[0])
+
+    def test_fingerprints_follow_the_clipped_edges(self):
+        fingerprints = self.fingerprints(self.gdf)
+        self.assertEqual(list(fingerprints.index), [5, 6])
+        # reordering the edges changes nothing, moving one only changes its tile
+        self.assertTrue(self.fingerprints(self.gdf.iloc[::-1].reset_index(drop=True)).equals(fingerprints))
+        moved = self.gdf.copy()
+        moved.geometry[2] = LineString([(10, 10), (11, 10)])
+        changed = self.fingerprints(moved)
+        self.assertEqual(changed[5], fingerprints[5])
+        self.assertNotEqual(changed[6], fingerprints[6])
+
+    def test_fingerprints_depend_on_settings_and_columns(self):
+        fingerprints = self.fingerprints(self.gdf)
+        self.assertFalse((self.fingerprints(self.gdf, settings='other') == fingerprints).any())
+        renamed = self.gdf.assign(_u_id=['x', 'b', 'c'])
+        self.assertTrue(self.fingerprints(renamed).equals(fingerprints))
+        self.assertNotEqual(self.fingerprints(renamed, columns=['_u_id'])[5], self.fingerprints(self.gdf, columns=['_u_id'])[5])
+
+    def test_store_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = TileResultStore(os.path.join(directory, 'nested', 'tile_results.sqlite'))
+            self.assertEqual(store.get_many(['a']), {})
+            store.put_many([('a', 0.25), ('b', 0)])
+            store.put_many([('a', 0.5)])
+            scores = pickle.loads(pickle.dumps(store)).get_many(['a', 'b', 'c'])
+            self.assertEqual(scores, {'a': 0.5, 'b': 0.0})
+
+    def test_store_skips_failed_and_missing_scores(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = TileResultStore(os.path.join(directory, 'tile_results.sqlite'))
+            # a tile that errored scores -1, it is scored again by the next job
+            store.put_many([('a', -1), ('b', np.nan), ('c', np.inf), ('d', 1.0)])
+            self.assertEqual(store.get_many(['a', 'b', 'c', 'd']), {'d': 1.0})
+
+    def test_store_many_fingerprints(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = TileResultStore(os.path.join(directory, 'tile_results.sqlite'))
+            store.put_many((str(key), key / 2000) for key in range(2000))
+            self.assertEqual(len(store.get_many(str(key) for key in range(2100))), 2000)
+
+    def test_evict_least_recently_used(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = TileResultStore(os.path.join(directory, 'tile_results.sqlite'), max_entries=2)
+            store.put_many([('a', 0.1)])
+            store.put_many([('b', 0.2)])
+            store.put_many([('c', 0.3)])
+            store.get_many(['a'])
+            self.assertEqual(store.evict(), 1)
+            self.assertEqual(set(store.get_many(['a', 'b', 'c'])), {'a', 'c'})
+            self.assertEqual(store.evict(), 0)
+
+    def test_versions_are_kept_apart(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'tile_results.sqlite')
+            TileResultStore(path, version=1).put_many([('a', 0.1)])
+            store = TileResultStore(path, version=2)
+            self.assertEqual(store.get_many(['a']), {})
+            store.put_many([('b', 0.2)])
+            self.assertEqual(store.evict(), 1)
+            self.assertEqual(TileResultStore(path, version=1).get_many(['a']), {})
+
+    def test_concurrent_writers(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = TileResultStore(os.path.join(directory, 'tile_results.sqlite'))
+            store.put_many([('parent', 0.5)])
+            context = multiprocessing.get_context('spawn')
+            workers = [context.Process(target=put_scores, args=(store, worker)) for worker in range(3)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            self.assertEqual([worker.exitcode for worker in workers], [0, 0, 0])
+            keys = ['parent'] + [f'{worker}-{key}' for worker in range(3) for key in range(50)]
+            self.assertEqual(len(store.get_many(keys)), 151)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import threading
+import time
+import unittest
+from multiprocessing.pool import ThreadPool
+import dask
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+from shapely.geometry import Polygon
+from src.calculators.tile_scheduling import tile_costs, pack_partitions, partition_tiles, worker_load, BoundedPoolExecutor
+
+# tasks running at the same time on the thread pool of test_bounded_pool_executor_uses_its_share_of_the_pool
+running = {'now': 0, 'peak': 0}
+running_lock = threading.Lock()
+
+
+def count_running(index):
+    with running_lock:
+        running['now'] += 1
+        running['peak'] = max(running['peak'], running['now'])
+    time.sleep(0.05)
+    with running_lock:
+        running['now'] -= 1
+    return index
+
+
+class TestTileScheduling(unittest.TestCase):
+
+    def test_tile_costs(self):
+        tile_gdf = gpd.GeoDataFrame({'geometry': [
+            Polygon([(0, 0), (1, 0), (1, 1)]),
+            Polygon([(0, 0), (1, 0), (1, 1), (0, 1)]),
+        ]})
+        edge_index = pd.Series([np.array([0, 1, 2]), np.array([], dtype=np.int64)])
+        np.testing.assert_array_equal(tile_costs(tile_gdf, edge_index), [16, 5])
+
+    def test_pack_partitions_balances_cost(self):
+        costs = np.array([10, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 7, 3])
+        labels = pack_partitions(costs, 3)
+        totals = np.bincount(labels, weights=costs)
+        self.assertEqual(list(totals), [10, 10, 10])
+        # the most expensive tile gets a partition of its own
+        self.assertEqual(list(np.flatnonzero(labels == labels[0])), [0])
+
+    def test_pack_partitions_more_partitions_than_tiles(self):
+        labels = pack_partitions(np.array([3, 1]), 8)
+        self.assertEqual(list(labels), [0, 1])
+
+    def test_partition_tiles(self):
+        tile_gdf = gpd.GeoDataFrame({'geometry': [Polygon([(i, 0), (i + 1, 0), (i + 1, 1)]) for i in range(5)]})
+        ddf = partition_tiles(tile_gdf, np.array([1, 0, 1, 0, 2]))
+        self.assertEqual(ddf.npartitions, 3)
+        self.assertEqual(list(ddf.partitions[0].compute().index), [1, 3])
+        self.assertEqual(list(ddf.partitions[1].compute().index), [0, 2])
+        self.assertEqual(sorted(ddf.compute().index), list(range(5)))
+
+    def test_worker_load(self):
+        output = pd.DataFrame({'_worker': [7, 8, 7], '_busy_seconds': [1.0, 5.0, 2.0]})
+        load = worker_load(output)
+        self.assertEqual(list(load.index), [8, 7])
+        self.assertEqual(list(load.tiles), [1, 2])
+        self.assertEqual(list(load.busy_seconds), [5.0, 3.0])
+
+
+    def test_bounded_pool_executor_uses_its_share_of_the_pool(self):
+        with ThreadPool(4) as pool:
+            self.assertEqual(BoundedPoolExecutor(pool, 8)._max_workers, 4)
+            running.update(now=0, peak=0)
+            dask.compute(*[dask.delayed(count_running)(index) for index in range(8)],
+                         scheduler='multiprocessing', pool=BoundedPoolExecutor(pool, 2), chunksize=1)
+        self.assertEqual(running['peak'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+import numpy as np
+import geopandas as gpd
+from shapely.geometry import LineString, Polygon, GeometryCollection, box
+from src.calculators.tilers import MAX_GRID_CELLS, check_tile_size, square_grid, hex_grid, junction_nodes, junction_voronoi, polygonal, bisect, split_tiles
+
+
+class TestTilers(unittest.TestCase):
+
+    def setUp(self):
+        self.area = Polygon([(0, 0), (1000, 0), (1000, 600), (0, 1000)])
+        # a plus sign with a dangling edge: (0, 0) is the only junction with ids and with coordinates
+        self.gdf = gpd.GeoDataFrame({
+            '_u_id': ['c', 'c', 'c', 'c', 'e'],
+            '_v_id': ['n', 'e', 's', 'w', 'x'],
+            'geometry': [
+                LineString([(0, 0), (0, 1)]),
+                LineString([(0, 0), (1, 0)]),
+                LineString([(0, 0), (0, -1)]),
+                LineString([(0, 0), (-1, 0)]),
+                LineString([(1, 0), (2, 0)]),
+            ],
+        })
+
+    def test_square_grid(self):
+        tiles = square_grid(self.area, 200, 'epsg:26910')
+        self.assertEqual(tiles.crs, 'epsg:26910')
+        self.assertAlmostEqual(tiles.area.sum(), self.area.area)
+        self.assertLessEqual(tiles.area.max(), 200 * 200 + 1e-6)
+        self.assertEqual(len(square_grid(box(0, 0, 400, 400), 200)), 4)
+
+    def test_square_grid_smaller_than_cell(self):
+        tiles = square_grid(box(0, 0, 10, 10), 200)
+        self.assertEqual(len(tiles), 1)
+        self.assertAlmostEqual(tiles.area[0], 100)
+
+    def test_hex_grid(self):
+        tiles = hex_grid(self.area, 200)
+        self.assertAlmostEqual(tiles.area.sum(), self.area.area, places=3)
+        hexagon_area = np.sqrt(3) / 2 * 200 ** 2
+        self.assertAlmostEqual(tiles.area.max(), hexagon_area, places=3)
+        # hexagons do not overlap
+        self.assertAlmostEqual(tiles.unary_union.area, tiles.area.sum(), places=3)
+
+    def test_check_tile_size(self):
+        check_tile_size(10)
+        for size in (0, -200, 1e-4, float('nan'), float('inf')):
+            with self.subTest(size=size):
+                with self.assertRaisesRegex(ValueError, 'Invalid tile_size'):
+                    check_tile_size(size)
+
+    def test_grids_reject_too_many_cells(self):
+        # a city-sized area in cells of 10 meters
+        area = box(0, 0, 20000, 20000)
+        for grid in (square_grid, hex_grid):
+            with self.subTest(grid=grid.__name__):
+                with self.assertRaisesRegex(ValueError, f'expected at most {MAX_GRID_CELLS}'):
+                    grid(area, 10)
+                with self.assertRaisesRegex(ValueError, 'Invalid tile_size'):
+                    grid(area, -10)
+
+    def test_junction_nodes_by_id(self):
+        np.testing.assert_array_equal(junction_nodes(self.gdf), [[0, 0]])
+        self.assertEqual(len(junction_nodes(self.gdf, min_degree=2)), 2)
+
+    def test_junction_nodes_by_coordinates(self):
+        np.testing.assert_array_equal(junction_nodes(self.gdf[['geometry']]), [[0, 0]])
+
+    def test_junction_voronoi(self):
+        gdf = gpd.GeoDataFrame({'geometry': [
+            LineString([(100, 500), (100, 600)]),
+            LineString([(100, 500), (200, 500)]),
+            LineString([(100, 500), (100, 400)]),
+            LineString([(800, 300), (800, 400)]),
+            LineString([(800, 300), (900, 300)]),
+            LineString([(800, 300), (700, 300)]),
+        ]})
+        tiles = junction_voronoi(gdf, self.area)
+        self.assertEqual(len(tiles), 2)
+        self.assertAlmostEqual(tiles.area.sum(), self.area.area)
+
+    def test_junction_voronoi_single_tile_without_junctions(self):
+        tiles = junction_voronoi(self.gdf.iloc[[4]], self.area)
+        self.assertEqual(len(tiles), 1)
+        self.assertTrue(tiles.geometry[0].equals(self.area))
+
+    def test_polygonal(self):
+        collection = GeometryCollection([box(0, 0, 1, 1), LineString([(1, 1), (2, 2)])])
+        result = polygonal(np.array([collection, box(0, 0, 2, 2)], dtype=object))
+        self.assertTrue(result[0].equals(box(0, 0, 1, 1)))
+        self.assertTrue(result[1].equals(box(0, 0, 2, 2)))
+
+    def test_bisect(self):
+        pieces, source = bisect(np.array([box(0, 0, 4, 1), box(0, 0, 1, 4)], dtype=object))
+        self.assertEqual(list(source), [0, 0, 1, 1])
+        self.assertTrue(pieces[0].equals(box(0, 0, 2, 1)))
+        self.assertTrue(pieces[3].equals(box(0, 2, 1, 4)))
+
+    def test_split_tiles(self):
+        # 16 edges along the bottom of the left tile, one in the right; the empty top halves are not cut again
+        gdf = gpd.GeoDataFrame({'geometry': [LineString([(x, 1), (x, 2)]) for x in np.linspace(1, 99, 16)] + [LineString([(150, 1), (150, 2)])]})
+        tile_gdf = gpd.GeoDataFrame({'geometry': [box(0, 0, 100, 100), box(100, 0, 200, 100)]}, index=[10, 20])
+        result = split_tiles(tile_gdf, gdf, max_cost=40)
+        self.assertEqual(list(result.columns), ['geometry', 'parent_tile'])
+        self.assertEqual(list(result.parent_tile), [10, 10, 10, 10, 10, 10, 20])
+        self.assertAlmostEqual(result.area.sum(), tile_gdf.area.sum())
+        self.assertTrue(result.geometry.iloc[-1].equals(tile_gdf.geometry[20]))
+
+    def test_split_tiles_max_depth(self):
+        gdf = gpd.GeoDataFrame({'geometry': [LineString([(1, 1), (1, 2)])] * 10})
+        tile_gdf = gpd.GeoDataFrame({'geometry': [box(0, 0, 100, 100)]})
+        self.assertEqual(len(split_tiles(tile_gdf, gdf, max_cost=1, max_depth=2)), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,6 +3,7 @@ import unittest
 from unittest.mock import patch, MagicMock, ANY
 import networkx as nx
 import geopandas as gpd
+import pandas as pd
 from shapely.geometry import Point, LineString, Polygon, MultiPolygon, MultiLineString
 from src.calculators.xn_qm_lib import (
     add_edges_from_linestring, graph_from_gdf, group_G_pts, edges_are_connected,
@@ -29,12 +30,11 @@ class TestQualityMetrics(unittest.TestCase):
         self.assertEqual(len(graph.edges), 2)
 
     def test_graph_from_gdf(self):
-        mock_gdf = MagicMock(spec=gpd.GeoDataFrame)
-        mock_gdf.iterrows.return_value = iter([
-            (0, MagicMock(geometry=LineString([(0, 0), (1, 1)]))),
-            (1, MagicMock(geometry=LineString([(1, 1), (2, 2)]))),
-        ])
-        graph = graph_from_gdf(mock_gdf)
+        gdf = gpd.GeoDataFrame({'geometry': [
+            LineString([(0, 0), (1, 1)]),
+            LineString([(1, 1), (2, 2)]),
+        ]})
+        graph = graph_from_gdf(gdf)
         self.assertEqual(len(graph.edges), 2)
 
     def test_group_G_pts(self):
@@ -54,6 +54,11 @@ class TestQualityMetrics(unittest.TestCase):
         self.assertGreater(connected, 0)
         self.assertIsInstance(pairs, list)
 
+    def test_tile_tra_score_engines_match(self):
+        self.graph.add_edge((0, 1), (0.5, 1))
+        self.assertEqual(tile_tra_score(self.graph, self.polygon, engine='components'),
+                         tile_tra_score(self.graph, self.polygon, engine='pairwise'))
+
     @patch('src.calculators.xn_qm_lib.get_stats')
     def test_get_stats(self, mock_get_stats):
         mock_get_stats.return_value = {"tra_score": 1.0}
@@ -103,6 +108,17 @@ class TestQualityMetrics(unittest.TestCase):
         self.assertEqual(result.loc["tra_score"], 1.0)
         mock_get_measures.assert_called_once_with(self.polygon, self.gdf)
 
+    @patch('src.calculators.xn_qm_lib.get_measures_from_polygon')
+    def test_qm_func_with_edge_rows(self, mock_get_measures):
+        mock_get_measures.return_value = {"tra_score": 1.0}
+        feature = pd.Series({'geometry': self.polygon, '_edge_rows': [4, 5]}, name=3)
+
+        result = qm_func(feature, self.gdf)
+
+        self.gdf.take.assert_called_once_with([4, 5])
+        mock_get_measures.assert_called_once_with(self.polygon, self.gdf.take.return_value)
+        self.assertEqual(list(result.index), ['geometry', 'tra_score'])
+
     @patch('src.calculators.xn_qm_lib.gpd.GeoDataFrame')
     @patch('src.calculators.xn_qm_lib.voronoi_diagram')
     @patch('src.calculators.xn_qm_lib.gnx.graph_edges_to_gdf')
@@ -134,7 +150,9 @@ class TestQualityMetrics(unittest.TestCase):
 
         # Mock GeoDataFrame creation and clipping
         mock_geo_dataframe.return_value = mock_voronoi_gdf
-        gpd.clip = MagicMock(return_value=mock_voronoi_gdf_clipped)
+        clip_patcher = patch.object(gpd, 'clip', return_value=mock_voronoi_gdf_clipped)
+        clip_patcher.start()
+        self.addCleanup(clip_patcher.stop)
 
         # Call the function
         result = create_voronoi_diagram(mock_graph, mock_bounds)
@@ -147,9 +165,10 @@ class TestQualityMetrics(unittest.TestCase):
         self.assertEqual(result, mock_voronoi_gdf_clipped)
 
 
+    @patch('src.calculators.xn_qm_lib.edge_incidence')
     @patch('src.calculators.xn_qm_lib.gpd.read_file')
     @patch('src.calculators.xn_qm_lib.dask_geopandas.from_geopandas')
-    def test_calculate_xn_qm(self, mock_from_geopandas, mock_read_file):
+    def test_calculate_xn_qm(self, mock_from_geopandas, mock_read_file, mock_edge_incidence):
         mock_gdf = MagicMock(spec=gpd.GeoDataFrame)
         mock_read_file.return_value = mock_gdf
         mock_from_geopandas.return_value.apply.return_value.compute.return_value = mock_gdf
@@ -163,15 +182,11 @@ class TestQualityMetrics(unittest.TestCase):
         self.assertEqual(result, -1)
 
     def test_graph_from_gdf_multilinestring(self):
-        mock_gdf = MagicMock(spec=gpd.GeoDataFrame)
-        mock_multilinestring = MultiLineString([
+        multilinestring = MultiLineString([
             LineString([(0, 0), (1, 1)]),
             LineString([(1, 1), (2, 2)])
         ])
-        mock_gdf.iterrows.return_value = iter([
-            (0, MagicMock(geometry=mock_multilinestring)),
-        ])
-        graph = graph_from_gdf(mock_gdf)
+        graph = graph_from_gdf(gpd.GeoDataFrame({'geometry': [multilinestring]}))
         self.assertEqual(len(graph.edges), 2)
 
     @patch('src.calculators.xn_qm_lib.tile_tra_score')
@@ -208,12 +223,14 @@ class TestQualityMetrics(unittest.TestCase):
         self.assertIn("tra_score", measures)
         self.assertEqual(measures["tra_score"], 1.0)
 
+    @patch('src.calculators.xn_qm_lib.edge_incidence')
     @patch('src.calculators.xn_qm_lib.create_voronoi_diagram')
     @patch('src.calculators.xn_qm_lib.ox.graph.graph_from_polygon')
     @patch('src.calculators.xn_qm_lib.gpd.read_file')
     @patch('src.calculators.xn_qm_lib.dask_geopandas.from_geopandas')
     def test_calculate_xn_qm_without_polygon(
-            self, mock_from_geopandas, mock_read_file, mock_graph_from_polygon, mock_create_voronoi
+            self, mock_from_geopandas, mock_read_file, mock_graph_from_polygon, mock_create_voronoi,
+            mock_edge_incidence
     ):
         # Mock data and behaviors
         mock_gdf = MagicMock(spec=gpd.GeoDataFrame)
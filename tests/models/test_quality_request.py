@@ -26,6 +26,9 @@ class TestRequestData(unittest.TestCase):
         self.assertEqual(request_data.data_file, 'https://example.com/data-file.zip')
         self.assertEqual(request_data.algorithm, 'fixed')
         self.assertIsNone(request_data.sub_regions_file)
+        self.assertIsNone(request_data.tiler)
+        self.assertIsNone(request_data.tile_size)
+        self.assertIsNone(request_data.output_format)
 
 
 class TestQualityRequest(unittest.TestCase):
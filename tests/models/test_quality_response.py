@@ -17,6 +17,11 @@ class TestResponseData(unittest.TestCase):
         self.assertTrue(response_data.success)
         self.assertEqual(response_data.dataset_url, 'https://example.com/dataset.zip')
         self.assertEqual(response_data.qm_dataset_url, 'https://example.com/qm-dataset.zip')
+        self.assertIsNone(response_data.output_format)
+
+    def test_response_data_with_output_format(self):
+        response_data = ResponseData(status='success', message='', success=True, dataset_url='', qm_dataset_url='', output_format='flatgeobuf')
+        self.assertEqual(response_data.output_format, 'flatgeobuf')
 
 
 class TestQualityMetricResponse(unittest.TestCase):
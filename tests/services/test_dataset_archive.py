@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+import zipfile
+import fiona
+from src.services.dataset_archive import DatasetArchive
+
+EDGES_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'xnqm', 'inputs', 'p13_edges.geojson')
+
+
+class TestDatasetArchive(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.zip_path = os.path.join(self.directory.name, 'dataset.zip')
+        self.extract_folder = os.path.join(self.directory.name, 'extracted')
+        with zipfile.ZipFile(self.zip_path, 'w', zipfile.ZIP_DEFLATED) as input_zip:
+            input_zip.writestr('dataset/', '')
+            input_zip.writestr('dataset/wa.nodes.geojson', '{"type": "FeatureCollection", "features": []}')
+            input_zip.write(EDGES_FILE, 'dataset/wa.edges.geojson')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_names(self):
+        archive = DatasetArchive(self.zip_path)
+        self.assertEqual(archive.names(), ['dataset/wa.nodes.geojson', 'dataset/wa.edges.geojson'])
+
+    def test_find(self):
+        archive = DatasetArchive(self.zip_path)
+        self.assertEqual(archive.find('edges').filename, 'dataset/wa.edges.geojson')
+        self.assertIsNone(archive.find('zones'))
+
+    def test_layer_path_reads_in_place(self):
+        archive = DatasetArchive(self.zip_path)
+        path = archive.layer_path('edges', self.extract_folder)
+        self.assertEqual(path, f'/vsizip/{self.zip_path}/dataset/wa.edges.geojson')
+        with fiona.open(path) as source, fiona.open(EDGES_FILE) as expected:
+            self.assertEqual(len(source), len(expected))
+        # nothing is extracted
+        self.assertFalse(os.path.exists(self.extract_folder))
+
+    def test_layer_path_extracts_unsupported_compression(self):
+        with zipfile.ZipFile(self.zip_path, 'w', zipfile.ZIP_BZIP2) as input_zip:
+            input_zip.writestr('dataset/wa.nodes.geojson', '{"type": "FeatureCollection", "features": []}')
+            input_zip.write(EDGES_FILE, 'dataset/wa.edges.geojson')
+        path = DatasetArchive(self.zip_path).layer_path('edges', self.extract_folder)
+        self.assertEqual(path, os.path.join(self.extract_folder, 'dataset', 'wa.edges.geojson'))
+        # only the edges are extracted
+        self.assertEqual(os.listdir(os.path.join(self.extract_folder, 'dataset')), ['wa.edges.geojson'])
+        with fiona.open(path) as source, fiona.open(EDGES_FILE) as expected:
+            self.assertEqual(len(source), len(expected))
+
+    def test_layer_path_missing_layer(self):
+        self.assertIsNone(DatasetArchive(self.zip_path).layer_path('zones', self.extract_folder))
+
+    def test_relative_path(self):
+        current_dir = os.getcwd()
+        os.chdir(self.directory.name)
+        try:
+            archive = DatasetArchive('dataset.zip')
+        finally:
+            os.chdir(current_dir)
+        self.assertEqual(archive.layer_path('edges', self.extract_folder), f'/vsizip/{self.zip_path}/dataset/wa.edges.geojson')
+
+
+if __name__ == '__main__':
+    unittest.main()
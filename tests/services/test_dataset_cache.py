@@ -0,0 +1,200 @@
+import os
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+from azure.core.exceptions import ResourceModifiedError
+from src.services.dataset_cache import DatasetCache
+from src.services.file_system_storage import FileSystemStorageClient
+from src.services.storage_service import StorageService
+
+
+class TestDatasetCache(unittest.TestCase):
+
+    @patch('src.services.storage_service.Config')
+    def setUp(self, mock_config):
+        self.directory = tempfile.TemporaryDirectory()
+        mock_config.return_value.storage_container_name = 'osw'
+        mock_config.return_value.storage_chunk_size = 4
+        mock_config.return_value.storage_max_concurrency = 2
+        core = MagicMock()
+        core.get_storage_client.return_value = FileSystemStorageClient(os.path.join(self.directory.name, 'storage'))
+        self.storage_service = StorageService(core)
+        self.storage_service.download_remote_file = MagicMock(wraps=self.storage_service.download_remote_file)
+        self.cache_folder = os.path.join(self.directory.name, 'cache')
+        self.cache = DatasetCache(self.cache_folder, 100)
+        self.downloads = os.path.join(self.directory.name, 'downloads')
+        os.makedirs(self.downloads)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def upload(self, name, data):
+        local_path = os.path.join(self.directory.name, 'upload')
+        with open(local_path, 'wb') as local_file:
+            local_file.write(data)
+        return self.storage_service.upload_local_file(local_path, name)
+
+    def get(self, url):
+        path = self.cache.open(url, os.path.join(self.downloads, os.path.basename(url)), self.storage_service)
+        self.cache.fetch(url, path, self.storage_service)
+        return path
+
+    def read(self, path):
+        with open(path, 'rb') as cached_file:
+            return cached_file.read()
+
+    def test_hit_is_not_downloaded_again(self):
+        url = self.upload('dataset.zip', b'dataset')
+        path = self.get(url)
+        self.cache.release(path)
+        self.assertEqual(self.get(url), path)
+        self.assertEqual(self.storage_service.download_remote_file.call_count, 1)
+        self.assertEqual(os.path.dirname(path), os.path.abspath(self.cache_folder))
+        self.assertTrue(path.endswith('.zip'))
+        self.assertEqual(self.read(path), b'dataset')
+
+    def test_open_resolves_the_blob_once(self):
+        url = self.upload('dataset.zip', b'dataset')
+        self.storage_service.get_remote_blob = MagicMock(wraps=self.storage_service.get_remote_blob)
+        path = self.get(url)
+        self.cache.release(path)
+        self.get(url)
+        # one lookup per message, the miss downloads the blob resolved by open
+        self.assertEqual(self.storage_service.get_remote_blob.call_count, 2)
+        remote_blob = self.storage_service.download_remote_file.call_args.kwargs['remote_blob']
+        self.assertEqual(remote_blob[1].size, 7)
+
+    def test_blob_overwritten_after_open_is_not_cached(self):
+        url = self.upload('dataset.zip', b'dataset')
+        path = self.cache.open(url, os.path.join(self.downloads, 'dataset.zip'), self.storage_service)
+        # a new version of the same size, only the etag tells them apart
+        self.upload('dataset.zip', b'DATASET')
+        with self.assertRaises(ResourceModifiedError):
+            self.cache.fetch(url, path, self.storage_service)
+        self.assertEqual(os.listdir(self.cache_folder), [])
+        self.cache.release(path)
+        self.assertEqual(self.cache.remote_blobs, {})
+
+    def test_key_ignores_query(self):
+        url = self.upload('dataset.zip', b'dataset')
+        self.assertEqual(self.get(url + '?sig=first'), self.get(url + '?sig=second'))
+        self.assertEqual(self.storage_service.download_remote_file.call_count, 1)
+
+    def test_new_version_is_downloaded(self):
+        url = self.upload('dataset.zip', b'dataset')
+        path = self.get(url)
+        self.upload('dataset.zip', b'dataset, version 2')
+        new_path = self.get(url)
+        self.assertNotEqual(new_path, path)
+        self.assertEqual(self.read(new_path), b'dataset, version 2')
+
+    def test_concurrent_messages_share_the_download(self):
+        url = self.upload('dataset.zip', b'dataset')
+        started = threading.Event()
+        release = threading.Event()
+        download = self.storage_service.download_remote_file
+
+        def slow_download(remote_path, local_path, remote_blob=None):
+            started.set()
+            release.wait(5)
+            return download(remote_path, local_path, remote_blob=remote_blob)
+
+        self.storage_service.download_remote_file = MagicMock(side_effect=slow_download)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            first = executor.submit(self.get, url)
+            self.assertTrue(started.wait(5))
+            others = [executor.submit(self.get, url) for _ in range(3)]
+            release.set()
+            paths = {first.result()} | {other.result() for other in others}
+        self.assertEqual(len(paths), 1)
+        self.assertEqual(self.storage_service.download_remote_file.call_count, 1)
+        self.assertEqual(self.cache.pins[paths.pop()], 4)
+
+    def test_failed_download_is_shared_and_retried(self):
+        url = self.upload('dataset.zip', b'dataset')
+        started = threading.Event()
+        release = threading.Event()
+
+        def failing_download(remote_path, local_path, remote_blob=None):
+            with open(local_path, 'wb') as local_file:
+                local_file.write(b'data')
+            started.set()
+            release.wait(5)
+            raise IOError('Connection reset')
+
+        download = self.storage_service.download_remote_file
+        self.storage_service.download_remote_file = MagicMock(side_effect=failing_download)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            first = executor.submit(self.get, url)
+            self.assertTrue(started.wait(5))
+            second = executor.submit(self.get, url)
+            release.set()
+            for waiter in (first, second):
+                with self.assertRaisesRegex(IOError, 'Connection reset'):
+                    waiter.result()
+        self.assertEqual(os.listdir(self.cache_folder), [])
+        self.assertEqual(self.cache.downloads, {})
+
+        self.storage_service.download_remote_file = download
+        self.assertEqual(self.read(self.get(url)), b'dataset')
+
+    def test_least_recently_used_files_are_evicted(self):
+        urls = [self.upload(f'dataset-{index}.zip', bytes(40)) for index in range(3)]
+        paths = []
+        for index, url in enumerate(urls[:2]):
+            paths.append(self.get(url))
+            self.cache.release(paths[-1])
+            os.utime(paths[-1], (index, index))
+        # using the first file makes the second one the least recently used
+        self.cache.release(self.get(urls[0]))
+        self.cache.release(self.get(urls[2]))
+        self.assertTrue(os.path.exists(paths[0]))
+        self.assertFalse(os.path.exists(paths[1]))
+
+    def test_pinned_files_are_not_evicted(self):
+        first_path = self.get(self.upload('dataset-1.zip', bytes(60)))
+        second_path = self.get(self.upload('dataset-2.zip', bytes(60)))
+        # over the quota until a message is done with its file
+        self.assertTrue(os.path.exists(first_path))
+        self.assertTrue(os.path.exists(second_path))
+        os.utime(first_path, (0, 0))
+        self.cache.release(first_path)
+        self.assertFalse(os.path.exists(first_path))
+        self.assertTrue(os.path.exists(second_path))
+
+    def test_files_larger_than_the_quota_are_not_cached(self):
+        url = self.upload('dataset.zip', bytes(200))
+        self.assertEqual(self.get(url), os.path.join(self.downloads, 'dataset.zip'))
+        self.assertEqual(os.listdir(self.cache_folder), [])
+
+    def test_files_without_properties_are_not_cached(self):
+        storage_service = MagicMock()
+        storage_service.get_remote_blob.return_value = None
+        fallback_path = os.path.join(self.downloads, 'dataset.zip')
+        path = self.cache.open('https://example.com/osw/dataset.zip', fallback_path, storage_service)
+        self.assertEqual(path, fallback_path)
+        self.cache.fetch('https://example.com/osw/dataset.zip', path, storage_service)
+        storage_service.download_remote_file.assert_called_once_with('https://example.com/osw/dataset.zip', fallback_path, remote_blob=None)
+        self.cache.release(path)
+
+    def test_disabled(self):
+        cache = DatasetCache(os.path.join(self.directory.name, 'disabled'), 0)
+        storage_service = MagicMock()
+        fallback_path = os.path.join(self.downloads, 'dataset.zip')
+        self.assertEqual(cache.open('https://example.com/osw/dataset.zip', fallback_path, storage_service), fallback_path)
+        storage_service.get_remote_blob.assert_not_called()
+        self.assertFalse(os.path.exists(os.path.join(self.directory.name, 'disabled')))
+
+    def test_partial_downloads_are_removed(self):
+        with open(os.path.join(self.cache_folder, 'dataset.zip.part'), 'wb') as part_file:
+            part_file.write(b'data')
+        with open(os.path.join(self.cache_folder, 'dataset.zip'), 'wb') as cached_file:
+            cached_file.write(b'data')
+        DatasetCache(self.cache_folder, 100)
+        self.assertEqual(os.listdir(self.cache_folder), ['dataset.zip'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import threading
+import unittest
+from unittest.mock import patch
+from src.services.job_executor import JobExecutor
+
+
+class TestJobExecutor(unittest.TestCase):
+
+    def test_cpu_shares(self):
+        executor = JobExecutor(4)
+        self.assertEqual(executor.cpu_shares(['fixed', 'ixn']), {'fixed': 1, 'ixn': 3})
+        self.assertEqual(executor.cpu_shares(['ixn']), {'ixn': 4})
+        self.assertEqual(executor.cpu_shares(['fixed']), {'fixed': 1})
+
+    def test_cpu_shares_at_least_one_core(self):
+        self.assertEqual(JobExecutor(1).cpu_shares(['fixed', 'ixn']), {'fixed': 1, 'ixn': 1})
+        self.assertEqual(JobExecutor(0).cpu_budget, 1)
+
+    def test_run_concurrently(self):
+        # both tasks only finish once the other one has started
+        barrier = threading.Barrier(2, timeout=5)
+        results = JobExecutor(2).run({'fixed': lambda: barrier.wait() is not None and 'fixed done', 'ixn': lambda: barrier.wait() is not None and 'ixn done'})
+        self.assertEqual(results, {'fixed': 'fixed done', 'ixn': 'ixn done'})
+
+    @patch('src.services.job_executor.logger')
+    def test_run_logs_timing(self, mock_logger):
+        JobExecutor(2).run({'fixed': lambda: None})
+        self.assertIn('Time taken to calculate quality metrics for fixed', mock_logger.info.call_args.args[0])
+
+    @patch('src.services.job_executor.logger')
+    def test_run_raises_after_all_tasks(self, mock_logger):
+        finished = []
+
+        def failing():
+            raise ValueError('bad edges')
+
+        with self.assertRaises(ValueError):
+            JobExecutor(2).run({'fixed': failing, 'ixn': lambda: finished.append('ixn')})
+        self.assertEqual(finished, ['ixn'])
+        mock_logger.error.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
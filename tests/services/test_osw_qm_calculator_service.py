@@ -1,8 +1,13 @@
+import json
+import os
 import tempfile
 import unittest
+import zipfile
 from unittest.mock import patch, MagicMock, mock_open
 from src.calculators import QMXNLibCalculator, QMFixedCalculator
 from src.services.osw_qm_calculator_service import OswQmCalculator
+from src.calculators.edges_dataset import EdgesDataset
+from src.calculators.output_archive import OutputArchive
 
 
 
@@ -13,28 +18,87 @@ class TestOswQmCalculator(unittest.TestCase):
     def test_initialization(self):
         self.assertEqual(self.calculator.cores_to_use, 4)
 
-    @patch('src.services.osw_qm_calculator_service.zipfile.ZipFile')
-    @patch('src.services.osw_qm_calculator_service.OswQmCalculator.extract_zip')
+    @patch('src.calculators.output_archive.zipfile.ZipFile')
+    @patch('src.services.osw_qm_calculator_service.DatasetArchive')
     @patch('src.services.osw_qm_calculator_service.OswQmCalculator.get_osw_qm_calculator')
     @patch('src.services.osw_qm_calculator_service.OswQmCalculator.zip_folder')
-    def test_calculate_quality_metric(self, mock_zip_folder, mock_get_calculator, mock_extract_zip, mock_zipfile):
-        mock_extract_zip.return_value = ['mock_path/edges_file.geojson']
+    def test_calculate_quality_metric(self, mock_zip_folder, mock_get_calculator, mock_dataset_archive, mock_zipfile):
+        mock_dataset_archive.return_value.layer_path.return_value = 'mock_path/edges_file.geojson'
         mock_calculator = MagicMock()
         mock_get_calculator.return_value = mock_calculator
 
         with tempfile.NamedTemporaryFile() as temp_input, tempfile.NamedTemporaryFile() as temp_output:
             self.calculator.calculate_quality_metric(temp_input.name, ['fixed'], temp_output.name)
 
-        mock_zipfile.assert_called_once()
-        mock_extract_zip.assert_called_once()
-        mock_get_calculator.assert_called_once_with('fixed', None, 'mock_path/edges_file.geojson', unittest.mock.ANY)
+        # the output is written straight into a compressed zip, not zipped from a folder
+        mock_zipfile.assert_any_call(temp_output.name, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=6)
+        mock_dataset_archive.assert_called_once_with(temp_input.name)
+        mock_dataset_archive.return_value.layer_path.assert_called_once_with('edges', unittest.mock.ANY)
+        mock_get_calculator.assert_called_once_with('fixed', None, 'mock_path/edges_file.geojson', 'fixed_qm.geojson', unittest.mock.ANY, 1, unittest.mock.ANY, None)
+        self.assertIsInstance(mock_get_calculator.call_args.args[6], OutputArchive)
         mock_calculator.calculate_quality_metric.assert_called_once()
-        mock_zip_folder.assert_called_once()
+        mock_zip_folder.assert_not_called()
 
-    @patch('src.services.osw_qm_calculator_service.zipfile.ZipFile')
-    @patch('src.services.osw_qm_calculator_service.OswQmCalculator.extract_zip')
-    def test_calculate_quality_metric_no_edges_file(self, mock_extract_zip, mock_zipfile):
-        mock_extract_zip.return_value = []
+    @patch('src.calculators.output_archive.zipfile.ZipFile')
+    @patch('src.services.osw_qm_calculator_service.DatasetArchive')
+    @patch('src.services.osw_qm_calculator_service.OswQmCalculator.get_osw_qm_calculator')
+    @patch('src.services.osw_qm_calculator_service.OswQmCalculator.zip_folder')
+    def test_calculate_quality_metric_shares_edges(self, mock_zip_folder, mock_get_calculator, mock_dataset_archive, mock_zipfile):
+        mock_dataset_archive.return_value.layer_path.return_value = 'mock_path/edges_file.geojson'
+
+        with tempfile.NamedTemporaryFile() as temp_input, tempfile.NamedTemporaryFile() as temp_output:
+            self.calculator.calculate_quality_metric(temp_input.name, ['fixed', 'ixn'], temp_output.name)
+
+        fixed_edges, ixn_edges = [call.args[4] for call in mock_get_calculator.call_args_list]
+        self.assertIsInstance(fixed_edges, EdgesDataset)
+        self.assertIs(fixed_edges, ixn_edges)
+        self.assertEqual(fixed_edges.file_path, 'mock_path/edges_file.geojson')
+        # fixed keeps one of the 4 cores for its thread
+        self.assertEqual([call.args[5] for call in mock_get_calculator.call_args_list], [1, 3])
+        self.assertEqual(mock_get_calculator.return_value.calculate_quality_metric.call_count, 2)
+
+    @patch('src.calculators.output_archive.zipfile.ZipFile')
+    @patch('src.services.osw_qm_calculator_service.DatasetArchive')
+    @patch('src.services.osw_qm_calculator_service.OswQmCalculator.get_osw_qm_calculator')
+    @patch('src.services.osw_qm_calculator_service.OswQmCalculator.zip_folder')
+    def test_calculate_quality_metric_output_extension(self, mock_zip_folder, mock_get_calculator, mock_dataset_archive, mock_zipfile):
+        mock_dataset_archive.return_value.layer_path.return_value = 'mock_path/edges_file.geojson'
+        calculator = OswQmCalculator(cores_to_use=4, output_format='geoparquet')
+
+        with tempfile.NamedTemporaryFile() as temp_input, tempfile.NamedTemporaryFile() as temp_output:
+            calculator.calculate_quality_metric(temp_input.name, ['fixed'], temp_output.name)
+
+        self.assertEqual(mock_get_calculator.call_args.args[3], 'fixed_qm.parquet')
+
+    @patch('src.calculators.output_archive.zipfile.ZipFile')
+    @patch('src.services.osw_qm_calculator_service.DatasetArchive')
+    @patch('src.services.osw_qm_calculator_service.OswQmCalculator.get_osw_qm_calculator')
+    @patch('src.services.osw_qm_calculator_service.OswQmCalculator.zip_folder')
+    def test_calculate_quality_metric_raises_algorithm_error(self, mock_zip_folder, mock_get_calculator, mock_dataset_archive, mock_zipfile):
+        mock_dataset_archive.return_value.layer_path.return_value = 'mock_path/edges_file.geojson'
+        mock_get_calculator.return_value.calculate_quality_metric.side_effect = ValueError('bad edges')
+
+        with tempfile.NamedTemporaryFile() as temp_input, tempfile.NamedTemporaryFile() as temp_output:
+            with self.assertRaises(ValueError):
+                self.calculator.calculate_quality_metric(temp_input.name, ['fixed'], temp_output.name)
+        mock_zip_folder.assert_not_called()
+
+    def test_get_osw_qm_calculator_cores(self):
+        calculator = self.calculator.get_osw_qm_calculator('ixn', None, 'edges.geojson', 'output.geojson', cores_to_use=3)
+        # the share bounds the workers, the tiles are still partitioned for the whole budget
+        self.assertEqual(calculator.max_workers, 3)
+        self.assertEqual(calculator.partition_count, 4)
+        self.assertEqual(self.calculator.get_osw_qm_calculator('ixn', None, 'edges.geojson', 'output.geojson').max_workers, 4)
+
+    def test_get_osw_qm_calculator_with_edges(self):
+        edges = EdgesDataset('edges.geojson')
+        self.assertIs(self.calculator.get_osw_qm_calculator('fixed', None, 'edges.geojson', 'output.geojson', edges).edges, edges)
+        self.assertIs(self.calculator.get_osw_qm_calculator('ixn', None, 'edges.geojson', 'output.geojson', edges).edges, edges)
+
+    @patch('src.calculators.output_archive.zipfile.ZipFile')
+    @patch('src.services.osw_qm_calculator_service.DatasetArchive')
+    def test_calculate_quality_metric_no_edges_file(self, mock_dataset_archive, mock_zipfile):
+        mock_dataset_archive.return_value.layer_path.return_value = None
 
         with tempfile.NamedTemporaryFile() as temp_input, tempfile.NamedTemporaryFile() as temp_output:
             with self.assertRaises(Exception) as context:
@@ -47,25 +111,63 @@ class TestOswQmCalculator(unittest.TestCase):
 
         calculator = self.calculator.get_osw_qm_calculator('ixn', 'ixn_file', 'edges.geojson', 'output.geojson')
         self.assertIsInstance(calculator, QMXNLibCalculator)
-
-    @patch('src.services.osw_qm_calculator_service.zipfile.ZipFile')
+        self.assertEqual(calculator.topology, 'geometry')
+
+    def test_get_osw_qm_calculator_osw_topology(self):
+        calculator = OswQmCalculator(cores_to_use=4, topology='osw').get_osw_qm_calculator('ixn', None, 'edges.geojson', 'output.geojson')
+        self.assertEqual(calculator.topology, 'osw')
+
+    def test_get_osw_qm_calculator_with_pool(self):
+        pool = MagicMock()
+        calculator = OswQmCalculator(cores_to_use=4, pool=pool).get_osw_qm_calculator('ixn', None, 'edges.geojson', 'output.geojson')
+        self.assertIs(calculator.pool, pool)
+
+    def test_get_osw_qm_calculator_with_result_store(self):
+        result_store = MagicMock()
+        calculator = OswQmCalculator(cores_to_use=4, result_store=result_store).get_osw_qm_calculator('ixn', None, 'edges.geojson', 'output.geojson')
+        self.assertIs(calculator.result_store, result_store)
+
+    def test_get_osw_qm_calculator_with_stream_ingest(self):
+        calculator = OswQmCalculator(cores_to_use=4, ingest='stream', chunk_size=500).get_osw_qm_calculator('ixn', None, 'edges.geojson', 'output.geojson')
+        self.assertEqual(calculator.ingest, 'stream')
+        self.assertEqual(calculator.chunk_size, 500)
+
+    def test_get_osw_qm_calculator_with_output_format(self):
+        calculator = OswQmCalculator(cores_to_use=4, output_format='flatgeobuf')
+        self.assertEqual(calculator.get_osw_qm_calculator('ixn', None, 'edges.geojson', 'output.fgb').output_format, 'flatgeobuf')
+        self.assertEqual(calculator.get_osw_qm_calculator('fixed', None, 'edges.geojson', 'output.fgb').output_format, 'flatgeobuf')
+
+    def test_get_osw_qm_calculator_with_tiler(self):
+        calculator = OswQmCalculator(cores_to_use=4, tiler='square', tile_size=100, max_tile_cost=50).get_osw_qm_calculator('ixn', None, 'edges.geojson', 'output.geojson')
+        self.assertEqual(calculator.tiler, 'square')
+        self.assertEqual(calculator.tile_size, 100)
+        self.assertEqual(calculator.max_tile_cost, 50)
+
+    def test_calculate_quality_metric_writes_compressed_zip(self):
+        with tempfile.TemporaryDirectory() as temp_folder:
+            input_path = os.path.join(temp_folder, 'dataset.zip')
+            output_path = os.path.join(temp_folder, 'qm-output.zip')
+            with zipfile.ZipFile(input_path, 'w', zipfile.ZIP_DEFLATED) as input_zip:
+                input_zip.writestr('p13.nodes.geojson', '{"type": "FeatureCollection", "features": []}')
+                input_zip.write('tests/xnqm/inputs/p13_edges.geojson', 'p13.edges.geojson')
+
+            self.calculator.calculate_quality_metric(input_path, ['fixed'], output_path)
+
+            with zipfile.ZipFile(output_path) as output_zip:
+                self.assertEqual(output_zip.namelist(), ['fixed_qm.geojson'])
+                self.assertEqual(output_zip.getinfo('fixed_qm.geojson').compress_type, zipfile.ZIP_DEFLATED)
+                features = json.loads(output_zip.read('fixed_qm.geojson'))['features']
+            self.assertTrue(all('fixed_score' in feature['properties'] for feature in features))
+            # nothing but the zip is left behind
+            self.assertEqual(sorted(os.listdir(temp_folder)), ['dataset.zip', 'qm-output.zip'])
+
+    @patch('src.calculators.output_archive.zipfile.ZipFile')
     def test_zip_folder(self, mock_zipfile):
         with tempfile.TemporaryDirectory() as temp_folder:
             with tempfile.NamedTemporaryFile(dir=temp_folder) as temp_file:
                 output_zip = tempfile.NamedTemporaryFile().name
                 self.calculator.zip_folder(temp_folder, output_zip)
-                mock_zipfile.assert_called_once_with(output_zip, 'w')
-
-    @patch('src.services.osw_qm_calculator_service.zipfile.ZipFile')
-    @patch('os.walk')
-    def test_extract_zip(self, mock_walk, mock_zipfile):
-        mock_zip = MagicMock()
-        mock_zipfile.return_value = mock_zip
-        mock_walk.return_value = [('/mock', [], ['file1.geojson', 'file2.geojson'])]
-        with tempfile.TemporaryDirectory() as temp_folder:
-            extracted_files = self.calculator.extract_zip(mock_zip, temp_folder)
-        self.assertEqual(extracted_files, ['/mock/file1.geojson', '/mock/file2.geojson'])
-        mock_zip.extractall.assert_called_once_with(temp_folder)
+                mock_zipfile.assert_called_once_with(output_zip, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=6)
 
     @patch('builtins.open', new_callable=mock_open, read_data='{"features": [{"id": 1}]}')
     @patch('src.services.osw_qm_calculator_service.Config')
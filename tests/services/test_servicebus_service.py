@@ -1,21 +1,51 @@
+import importlib.util
+import os
+import tempfile
+import threading
+import time
 import unittest
+from types import SimpleNamespace
 from unittest.mock import patch, MagicMock
 from src.services.servicebus_service import ServiceBusService
 from src.models.quality_request import RequestData, QualityRequest
 from src.models.quality_response import QualityMetricResponse
+from src.services.dataset_cache import DatasetCache
 from python_ms_core.core.queue.models.queue_message import QueueMessage
 
 
 class TestServiceBusService(unittest.TestCase):
+    @patch('src.services.servicebus_service.TileResultStore')
+    @patch('src.services.servicebus_service.RoadNetworkSource')
+    @patch('src.services.servicebus_service.WorkerPool')
     @patch('src.services.servicebus_service.Config')
     @patch('src.services.servicebus_service.Core')
-    def setUp(self, mock_core, mock_config):
+    def setUp(self, mock_core, mock_config, mock_worker_pool, mock_road_network, mock_tile_results):
         # Mock Config
         mock_config.return_value.connection_string = 'mock-connection-string'
         mock_config.return_value.incoming_topic_name = 'mock-incoming-topic'
         mock_config.return_value.outgoing_topic_name = 'mock-outgoing-topic'
         mock_config.return_value.max_concurrent_messages = 5
         mock_config.return_value.incoming_topic_subscription = 'mock-subscription'
+        mock_config.return_value.worker_pool_size = 3
+        mock_config.return_value.worker_max_tasks = 10
+        mock_config.return_value.road_network_extract = 'extract.osm'
+        mock_config.return_value.ixn_tiler = 'osmnx'
+        mock_config.return_value.ixn_tile_size = 200
+        mock_config.return_value.ixn_max_tile_cost = 500
+        mock_config.return_value.ixn_ingest = 'stream'
+        mock_config.return_value.ixn_chunk_size = '5000'
+        mock_config.return_value.output_format = 'geojson'
+        mock_config.return_value.output_compression = 'deflate'
+        mock_config.return_value.output_compression_level = '9'
+        mock_config.return_value.get_road_network_cache_folder.return_value = '/cache'
+        mock_config.return_value.get_tile_result_store_path.return_value = '/cache/tile_results.sqlite'
+        mock_config.return_value.tile_result_cache = True
+        mock_config.return_value.tile_result_max_entries = 1000
+        mock_config.return_value.get_dataset_cache_folder.return_value = '/cache/datasets'
+        mock_config.return_value.dataset_cache_max_bytes = '0'
+        self.mock_worker_pool = mock_worker_pool
+        self.mock_road_network = mock_road_network
+        self.mock_tile_results = mock_tile_results
 
         # Mock Core
         mock_core.return_value.get_topic.return_value = MagicMock()
@@ -51,6 +81,12 @@ class TestServiceBusService(unittest.TestCase):
         self.assertIsInstance(self.service.core, MagicMock)
         self.assertIsInstance(self.service.config, MagicMock)
         self.assertIsInstance(self.service.storage_service, MagicMock)
+        self.mock_worker_pool.assert_called_once_with(3, 10)
+        self.service.worker_pool.start.assert_called_once()
+        self.mock_road_network.assert_called_once_with('extract.osm', '/cache')
+        self.mock_tile_results.assert_called_once_with('/cache/tile_results.sqlite', 1000)
+        self.assertEqual(self.service.dataset_cache.directory, '/cache/datasets')
+        self.assertFalse(self.service.dataset_cache.enabled)
 
     @patch('src.services.servicebus_service.OswQmCalculator')
     @patch('src.services.servicebus_service.shutil.rmtree')
@@ -67,6 +103,16 @@ class TestServiceBusService(unittest.TestCase):
         # Assertions
         self.service.storage_service.download_remote_file.assert_called_once()
         mock_calculator_instance.calculate_quality_metric.assert_called_once()
+        self.assertIs(mock_calculator.call_args.kwargs['pool'], self.service.worker_pool.get.return_value)
+        self.assertIs(mock_calculator.call_args.kwargs['road_network'], self.service.road_network)
+        self.assertEqual(mock_calculator.call_args.kwargs['tiler'], 'osmnx')
+        self.assertEqual(mock_calculator.call_args.kwargs['tile_size'], 200)
+        self.assertEqual(mock_calculator.call_args.kwargs['max_tile_cost'], 500)
+        self.assertEqual(mock_calculator.call_args.kwargs['ingest'], 'stream')
+        self.assertEqual(mock_calculator.call_args.kwargs['chunk_size'], 5000)
+        self.assertEqual(mock_calculator.call_args.kwargs['compression'], 'deflate')
+        self.assertEqual(mock_calculator.call_args.kwargs['compression_level'], 9)
+        self.assertIs(mock_calculator.call_args.kwargs['result_store'], self.service.tile_results)
         self.service.storage_service.upload_local_file.assert_called_once()
         mock_rmtree.assert_called_once()
 
@@ -91,6 +137,193 @@ class TestServiceBusService(unittest.TestCase):
         self.service.storage_service.upload_local_file.assert_called_once()
         mock_rmtree.assert_called_once()
 
+    @patch('src.services.servicebus_service.OswQmCalculator')
+    @patch('src.services.servicebus_service.shutil.rmtree')
+    def test_process_message_downloads_concurrently(self, mock_rmtree, mock_calculator):
+        self.test_message.data['sub_regions_file'] = 'https://example.com/osw/test_upload/sub_regions.geojson'
+        sub_regions_started = threading.Event()
+        sub_regions_release = threading.Event()
+
+        def download(remote_path, local_path, remote_blob=None):
+            if remote_path == self.test_message.data['sub_regions_file']:
+                sub_regions_started.set()
+                sub_regions_release.wait(5)
+            else:
+                # the dataset only arrives once the sub regions download is running
+                self.assertTrue(sub_regions_started.wait(5))
+            return ''
+
+        def calculate(input_file, algorithm_names, output_path, ixn_file, ixn_download):
+            # the calculation starts while the sub regions file is still downloading
+            self.assertFalse(ixn_download.done())
+            sub_regions_release.set()
+
+        self.service.storage_service.download_remote_file = MagicMock(side_effect=download)
+        self.service.storage_service.upload_local_file = MagicMock(return_value='https://example.com/qm-output.zip')
+        mock_calculator.return_value.calculate_quality_metric.side_effect = calculate
+
+        with patch.object(self.service, 'send_response') as mock_send_response:
+            self.service.process_message(self.test_message)
+
+        self.assertEqual(self.service.storage_service.download_remote_file.call_count, 2)
+        ixn_file, ixn_download = mock_calculator.return_value.calculate_quality_metric.call_args.args[3:]
+        self.assertTrue(ixn_file.endswith('sub_regions.geojson'))
+        self.assertTrue(ixn_download.done())
+        self.assertTrue(mock_send_response.call_args.args[0].data.success)
+
+    @patch('src.services.servicebus_service.OswQmCalculator')
+    @patch('src.services.servicebus_service.shutil.rmtree')
+    def test_process_message_sub_region_download_failure(self, mock_rmtree, mock_calculator):
+        self.test_message.data['sub_regions_file'] = 'https://example.com/osw/test_upload/sub_regions.geojson'
+
+        def download(remote_path, local_path, remote_blob=None):
+            if remote_path == self.test_message.data['sub_regions_file']:
+                raise Exception('Sub regions download failed')
+            return ''
+
+        self.service.storage_service.download_remote_file = MagicMock(side_effect=download)
+        self.service.storage_service.upload_local_file = MagicMock()
+
+        with patch.object(self.service, 'send_response') as mock_send_response:
+            self.service.process_message(self.test_message)
+
+        self.service.storage_service.upload_local_file.assert_not_called()
+        response = mock_send_response.call_args.args[0]
+        self.assertFalse(response.data.success)
+        self.assertEqual(response.data.message, 'Sub regions download failed')
+
+    @patch('src.services.servicebus_service.OswQmCalculator')
+    @patch('src.services.servicebus_service.shutil.rmtree')
+    def test_process_message_dataset_download_failure_waits_for_sub_regions(self, mock_rmtree, mock_calculator):
+        self.test_message.data['sub_regions_file'] = 'https://example.com/osw/test_upload/sub_regions.geojson'
+        sub_regions_started = threading.Event()
+        events = []
+
+        def download(remote_path, local_path, remote_blob=None):
+            if remote_path == self.test_message.data['sub_regions_file']:
+                sub_regions_started.set()
+                time.sleep(0.2)
+                events.append('sub regions downloaded')
+                return ''
+            self.assertTrue(sub_regions_started.wait(5))
+            raise Exception('Dataset download failed')
+
+        self.service.storage_service.download_remote_file = MagicMock(side_effect=download)
+        mock_rmtree.side_effect = lambda *args, **kwargs: events.append('folder removed')
+
+        with patch.object(self.service, 'send_response') as mock_send_response:
+            self.service.process_message(self.test_message)
+
+        mock_calculator.return_value.calculate_quality_metric.assert_not_called()
+        self.assertEqual(mock_send_response.call_args.args[0].data.message, 'Dataset download failed')
+        # the sub regions download is done before its folder is removed
+        self.assertEqual(events, ['sub regions downloaded', 'folder removed'])
+        self.assertTrue(mock_rmtree.call_args.args[0].endswith('message-id-from-msg'))
+
+    @patch('src.services.servicebus_service.OswQmCalculator')
+    @patch('src.services.servicebus_service.shutil.rmtree')
+    def test_process_message_uses_dataset_cache(self, mock_rmtree, mock_calculator):
+        cache_folder = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_folder.cleanup)
+        self.service.dataset_cache = DatasetCache(cache_folder.name, 1000)
+        self.test_message.data['data_file'] = 'https://example.com/osw/test_upload/abc.zip?sig=first'
+
+        def download(remote_path, local_path, remote_blob=None):
+            with open(local_path, 'wb') as local_file:
+                local_file.write(b'dataset')
+            return ''
+
+        self.service.storage_service.get_remote_blob.return_value = (MagicMock(), SimpleNamespace(etag='"etag"', size=7))
+        self.service.storage_service.download_remote_file = MagicMock(side_effect=download)
+        self.service.storage_service.upload_local_file = MagicMock(return_value='https://example.com/qm-output.zip')
+
+        with patch.object(self.service, 'send_response') as mock_send_response:
+            self.service.process_message(self.test_message)
+            # the same dataset with another SAS token and other algorithms
+            self.test_message.data['data_file'] = 'https://example.com/osw/test_upload/abc.zip?sig=second'
+            self.test_message.data['algorithm'] = 'ixn'
+            self.service.process_message(self.test_message)
+
+        self.service.storage_service.download_remote_file.assert_called_once()
+        first_path, second_path = [call.args[0] for call in mock_calculator.return_value.calculate_quality_metric.call_args_list]
+        self.assertEqual(first_path, second_path)
+        self.assertEqual(os.path.dirname(first_path), self.service.dataset_cache.directory)
+        self.assertTrue(first_path.endswith('.zip'))
+        self.assertTrue(all(call.args[0].data.success for call in mock_send_response.call_args_list))
+        # the files are unpinned once the messages are done
+        self.assertEqual(len(self.service.dataset_cache.pins), 0)
+
+    @patch('src.services.servicebus_service.OswQmCalculator')
+    @patch('src.services.servicebus_service.shutil.rmtree')
+    def test_process_message_with_tiler(self, mock_rmtree, mock_calculator):
+        self.test_message.data['tiler'] = 'hex'
+        self.test_message.data['tile_size'] = 150
+        self.service.storage_service.upload_local_file = MagicMock(return_value='https://example.com/qm-output.zip')
+
+        self.service.process_message(self.test_message)
+
+        self.assertEqual(mock_calculator.call_args.kwargs['tiler'], 'hex')
+        self.assertEqual(mock_calculator.call_args.kwargs['tile_size'], 150.0)
+
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), 'pyarrow is not installed')
+    @patch('src.services.servicebus_service.OswQmCalculator')
+    @patch('src.services.servicebus_service.shutil.rmtree')
+    def test_process_message_with_output_format(self, mock_rmtree, mock_calculator):
+        self.test_message.data['output_format'] = 'GeoParquet'
+        self.service.storage_service.upload_local_file = MagicMock(return_value='https://example.com/qm-output.zip')
+
+        with patch.object(self.service, 'send_response') as mock_send_response:
+            self.service.process_message(self.test_message)
+
+        self.assertEqual(mock_calculator.call_args.kwargs['output_format'], 'geoparquet')
+        response = mock_send_response.call_args.args[0]
+        self.assertTrue(response.data.success)
+        self.assertEqual(response.data.output_format, 'geoparquet')
+
+    @patch('src.calculators.output_formats.importlib.util.find_spec', return_value=None)
+    def test_process_message_geoparquet_without_pyarrow(self, mock_find_spec):
+        self.test_message.data['output_format'] = 'geoparquet'
+
+        with patch.object(self.service, 'send_response') as mock_send_response:
+            self.service.process_message(self.test_message)
+
+        self.service.storage_service.download_remote_file.assert_not_called()
+        response = mock_send_response.call_args.args[0]
+        self.assertFalse(response.data.success)
+        self.assertIn('needs pyarrow', response.data.message)
+
+    def test_process_message_unknown_output_format(self):
+        self.test_message.data['output_format'] = 'shapefile'
+
+        with patch.object(self.service, 'send_response') as mock_send_response:
+            self.service.process_message(self.test_message)
+
+        self.service.storage_service.download_remote_file.assert_not_called()
+        response = mock_send_response.call_args.args[0]
+        self.assertFalse(response.data.success)
+        self.assertIn('Unknown output_format shapefile', response.data.message)
+
+    def test_process_message_invalid_tile_size(self):
+        for tile_size in (0, -200, 1e-4):
+            with self.subTest(tile_size=tile_size):
+                self.test_message.data['tile_size'] = tile_size
+                with patch.object(self.service, 'send_response') as mock_send_response:
+                    self.service.process_message(self.test_message)
+                self.service.storage_service.download_remote_file.assert_not_called()
+                response = mock_send_response.call_args.args[0]
+                self.assertFalse(response.data.success)
+                self.assertIn(f'Invalid tile_size {float(tile_size)}', response.data.message)
+
+    def test_process_message_invalid_tiler(self):
+        self.test_message.data['tiler'] = 'triangle'
+        self.test_message.data['algorithm'] = 'fixed'
+        with patch.object(self.service, 'send_response') as mock_send_response:
+            self.service.process_message(self.test_message)
+        self.service.storage_service.download_remote_file.assert_not_called()
+        response = mock_send_response.call_args.args[0]
+        self.assertFalse(response.data.success)
+        self.assertIn('Unknown tiler triangle', response.data.message)
+
     @patch('src.services.servicebus_service.logger')
     def test_process_message_failure(self, mock_logger):
         self.test_message.data['data_file'] = 'invalid_file_path'
@@ -125,10 +358,23 @@ class TestServiceBusService(unittest.TestCase):
         result = self.service.get_directory_path(url)
         self.assertEqual(result, expected_path)
 
+    @patch('src.services.servicebus_service.TileResultStore')
+    @patch('src.services.servicebus_service.RoadNetworkSource')
+    @patch('src.services.servicebus_service.WorkerPool')
+    @patch('src.services.servicebus_service.Config')
+    @patch('src.services.servicebus_service.Core')
+    def test_tile_result_cache_disabled(self, mock_core, mock_config, mock_worker_pool, mock_road_network, mock_tile_results):
+        mock_config.return_value.tile_result_cache = False
+        mock_config.return_value.dataset_cache_max_bytes = 0
+        service = ServiceBusService()
+        mock_tile_results.assert_not_called()
+        self.assertIsNone(service.tile_results)
+
     @patch('src.services.servicebus_service.threading.Thread.join')
     def test_stop(self, mock_join):
         self.service.stop()
         mock_join.assert_called_once_with(timeout=0)
+        self.service.worker_pool.close.assert_called_once()
 
 
 if __name__ == '__main__':
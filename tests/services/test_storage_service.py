@@ -1,6 +1,13 @@
+import os
+import tempfile
+import threading
+import time
 import unittest
 from unittest.mock import MagicMock, patch
-from src.services.storage_service import StorageService
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceModifiedError
+from src.services.storage_service import StorageService, bounded_map, download_to_file, upload_from_file
+from src.services.file_system_storage import FileSystemStorageClient, FileSystemBlobClient
 
 class TestStorageService(unittest.TestCase):
 
@@ -12,19 +19,26 @@ class TestStorageService(unittest.TestCase):
 
         # Mocking Config values
         self.mock_config.return_value.storage_container_name = 'test-container'
+        self.mock_config.return_value.storage_chunk_size = '4'
+        self.mock_config.return_value.storage_max_concurrency = '2'
 
         # Mocking Core and Storage Client
         self.mock_storage_client = MagicMock()
-        self.mock_container = MagicMock()
+        # a container without a container client, whose files are looked up by URL
+        self.mock_container = MagicMock(spec=['create_file'])
         self.mock_storage_client.get_container.return_value = self.mock_container
         self.mock_core.return_value.get_storage_client.return_value = self.mock_storage_client
 
         # Initializing the service
         self.service = StorageService(core=self.mock_core())
 
+    def test_initialization(self):
+        self.assertEqual(self.service.chunk_size, 4)
+        self.assertEqual(self.service.max_concurrency, 2)
+
     def test_upload_local_file(self):
-        # Mocking file creation and upload behavior
-        mock_azure_file = MagicMock()
+        # Mocking file creation and upload behavior of a file that can only be uploaded whole
+        mock_azure_file = MagicMock(spec=['upload', 'get_remote_url'])
         self.mock_container.create_file.return_value = mock_azure_file
         mock_azure_file.get_remote_url.return_value = 'https://example.com/remote-path'
 
@@ -38,13 +52,14 @@ class TestStorageService(unittest.TestCase):
 
         # Assertions
         self.mock_container.create_file.assert_called_once_with(mock_remote_path)
-        mock_azure_file.upload.assert_called_once_with(file_data)
+        # the file is streamed, not read into memory
+        mock_azure_file.upload.assert_called_once_with(mock_file.return_value)
         mock_file.assert_called_once_with(mock_local_path, 'rb')
         self.assertEqual(remote_url, 'https://example.com/remote-path')
 
     def test_download_remote_file(self):
-        # Mocking file entity and stream
-        mock_file_entity = MagicMock()
+        # Mocking file entity and stream of a file that can only be downloaded whole
+        mock_file_entity = MagicMock(spec=['get_stream'])
         mock_file_entity.get_stream.return_value = b'file content'
         self.mock_storage_client.get_file_from_url.return_value = mock_file_entity
 
@@ -62,5 +77,194 @@ class TestStorageService(unittest.TestCase):
         mock_file.assert_called_once_with(mock_local_path, 'wb')
         mock_file().write.assert_called_once_with(b'file content')
 
+    def test_get_blob_client_of_container_client(self):
+        # files made by create_file hold the client of their container
+        mock_azure_file = MagicMock()
+        mock_azure_file.file_path = 'remote/test.txt'
+        blob_client = self.service.get_blob_client(mock_azure_file)
+        mock_azure_file.blob_client.get_blob_client.assert_called_once_with('remote/test.txt')
+        self.assertIs(blob_client, mock_azure_file.blob_client.get_blob_client.return_value)
+
+    def test_get_blob_client_without_blocks(self):
+        self.assertIsNone(self.service.get_blob_client(MagicMock(spec=['get_stream', 'upload'])))
+
+    def test_get_remote_blob_without_blob_client(self):
+        self.mock_storage_client.get_file_from_url.return_value = MagicMock(spec=['get_stream'])
+        self.assertIsNone(self.service.get_remote_blob('remote/test.txt'))
+
+    def test_get_remote_blob_of_container_client(self):
+        self.service.storage_container = MagicMock()
+        container_client = self.service.storage_container.container_client
+        blob_client, properties = self.service.get_remote_blob(
+            'https://example.blob.core.windows.net/osw/test_upload/my%20dataset.zip?sig=token')
+        # the container is not listed to find the blob
+        self.mock_storage_client.get_file_from_url.assert_not_called()
+        container_client.get_blob_client.assert_called_once_with('test_upload/my dataset.zip')
+        self.assertIs(blob_client, container_client.get_blob_client.return_value)
+        self.assertIs(properties, blob_client.get_blob_properties.return_value)
+
+    def test_download_remote_file_of_resolved_blob(self):
+        blob_client = MagicMock()
+        blob_client.download_blob.return_value.readall.return_value = b'data'
+        properties = MagicMock(size=4, etag='"etag"')
+        with patch('builtins.open', unittest.mock.mock_open()) as mock_file:
+            self.service.download_remote_file('remote/test.txt', 'test_local.txt', remote_blob=(blob_client, properties))
+        self.mock_storage_client.get_file_from_url.assert_not_called()
+        blob_client.get_blob_properties.assert_not_called()
+        self.assertEqual(blob_client.download_blob.call_args.kwargs['etag'], '"etag"')
+        mock_file.return_value.write.assert_called_once_with(b'data')
+
+
+class TestStorageServiceOnFileSystem(unittest.TestCase):
+
+    @patch('src.services.storage_service.Config')
+    def setUp(self, mock_config):
+        self.directory = tempfile.TemporaryDirectory()
+        mock_config.return_value.storage_container_name = 'osw'
+        mock_config.return_value.storage_chunk_size = 4
+        mock_config.return_value.storage_max_concurrency = 2
+        core = MagicMock()
+        core.get_storage_client.return_value = FileSystemStorageClient(self.directory.name)
+        self.service = StorageService(core)
+        self.local_path = os.path.join(self.directory.name, 'dataset.zip')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_local_file(self, data):
+        with open(self.local_path, 'wb') as local_file:
+            local_file.write(data)
+
+    def test_round_trip(self):
+        for data in (b'', b'abc', b'abcd', b'quality metrics output'):
+            with self.subTest(data=data):
+                self.write_local_file(data)
+                remote_url = self.service.upload_local_file(self.local_path, 'jobs/qm-output.zip')
+                self.assertEqual(remote_url, FileSystemBlobClient(os.path.join(self.directory.name, 'osw'), 'jobs/qm-output.zip').url)
+                download_path = os.path.join(self.directory.name, 'downloaded.zip')
+                self.assertEqual(self.service.download_remote_file(remote_url, download_path), '')
+                with open(download_path, 'rb') as downloaded:
+                    self.assertEqual(downloaded.read(), data)
+
+    def test_download_logs_throughput(self):
+        self.write_local_file(b'quality metrics output')
+        remote_url = self.service.upload_local_file(self.local_path, 'qm-output.zip')
+        with self.assertLogs('StorageService', 'INFO') as logs:
+            self.service.download_remote_file(remote_url, os.path.join(self.directory.name, 'downloaded.zip'))
+        self.assertRegex(logs.output[-1], r'Downloaded 22 bytes to .*downloaded.zip in [0-9.]+ seconds \([0-9.]+ MB/s\)')
+
+    def test_get_remote_blob(self):
+        self.write_local_file(b'quality metrics output')
+        remote_url = self.service.upload_local_file(self.local_path, 'qm-output.zip')
+        _, properties = self.service.get_remote_blob(remote_url)
+        self.assertEqual(properties.size, 22)
+        # a new version of the blob has a new etag
+        self.write_local_file(b'quality metrics output, again')
+        self.service.upload_local_file(self.local_path, 'qm-output.zip')
+        self.assertNotEqual(self.service.get_remote_blob(remote_url)[1].etag, properties.etag)
+
+    def test_upload_leaves_no_blocks_behind(self):
+        self.write_local_file(b'quality metrics output')
+        self.service.upload_local_file(self.local_path, 'qm-output.zip')
+        self.assertEqual(os.listdir(os.path.join(self.directory.name, 'osw', '.blocks')), [])
+
+
+class TestChunkedTransfers(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.blob_client = FileSystemBlobClient(self.directory.name, 'blob.bin')
+        self.local_path = os.path.join(self.directory.name, 'local.bin')
+        self.data = os.urandom(1000)
+        with open(self.local_path, 'wb') as local_file:
+            local_file.write(self.data)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_upload_from_file(self):
+        self.blob_client.stage_block = MagicMock(wraps=self.blob_client.stage_block)
+        self.assertEqual(upload_from_file(self.blob_client, self.local_path, 64, 3), 16)
+        self.assertEqual(self.blob_client.stage_block.call_args_list[0].args[0], '00000000')
+        self.assertTrue(all(len(call.args[1]) <= 64 for call in self.blob_client.stage_block.call_args_list))
+        self.assertEqual(self.blob_client.download_blob().readall(), self.data)
+
+    def test_download_to_file(self):
+        upload_from_file(self.blob_client, self.local_path, 1000, 1)
+        self.blob_client.download_blob = MagicMock(wraps=self.blob_client.download_blob)
+        download_path = os.path.join(self.directory.name, 'downloaded.bin')
+        properties = download_to_file(self.blob_client, download_path, 300, 2)
+        self.assertEqual(properties.size, 1000)
+        self.assertEqual(properties.etag, self.blob_client.get_blob_properties().etag)
+        condition = {'etag': properties.etag, 'match_condition': MatchConditions.IfNotModified}
+        self.assertEqual([call.kwargs for call in self.blob_client.download_blob.call_args_list], [
+            {'offset': 0, 'length': 300, **condition}, {'offset': 300, 'length': 300, **condition},
+            {'offset': 600, 'length': 300, **condition}, {'offset': 900, 'length': 100, **condition},
+        ])
+        with open(download_path, 'rb') as downloaded:
+            self.assertEqual(downloaded.read(), self.data)
+
+    def test_download_to_file_of_overwritten_blob(self):
+        upload_from_file(self.blob_client, self.local_path, 1000, 1)
+        download_blob = self.blob_client.download_blob
+
+        def overwrite_after_first_range(**kwargs):
+            data = download_blob(**kwargs)
+            if kwargs['offset'] == 0:
+                # a new version of the same size, only the etag tells them apart
+                with open(self.local_path, 'wb') as local_file:
+                    local_file.write(os.urandom(1000))
+                upload_from_file(self.blob_client, self.local_path, 1000, 1)
+            return data
+
+        self.blob_client.download_blob = MagicMock(side_effect=overwrite_after_first_range)
+        with self.assertRaises(ResourceModifiedError):
+            download_to_file(self.blob_client, os.path.join(self.directory.name, 'downloaded.bin'), 300, 1)
+
+    def test_download_to_file_of_given_version(self):
+        upload_from_file(self.blob_client, self.local_path, 1000, 1)
+        properties = self.blob_client.get_blob_properties()
+        self.blob_client.get_blob_properties = MagicMock()
+        download_path = os.path.join(self.directory.name, 'downloaded.bin')
+        self.assertIs(download_to_file(self.blob_client, download_path, 300, 2, properties), properties)
+        self.blob_client.get_blob_properties.assert_not_called()
+
+    def test_bounded_map(self):
+        lock = threading.Lock()
+        running = [0, 0]
+
+        def work(item):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+            return item * 2
+
+        consumed = []
+
+        def items():
+            for item in range(10):
+                consumed.append(item)
+                yield item
+
+        results = bounded_map(work, items(), 3)
+        self.assertEqual(next(results), 0)
+        # the items are read lazily, only the calls in flight are ahead of the consumer
+        self.assertLessEqual(len(consumed), 4)
+        self.assertEqual(list(results), [item * 2 for item in range(1, 10)])
+        self.assertLessEqual(running[1], 3)
+
+    def test_bounded_map_raises(self):
+        def work(item):
+            if item == 2:
+                raise ValueError('bad block')
+            return item
+
+        with self.assertRaises(ValueError):
+            list(bounded_map(work, range(5), 2))
+
+
 if __name__ == '__main__':
     unittest.main()
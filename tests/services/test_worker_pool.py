@@ -0,0 +1,44 @@
+import os
+import unittest
+from unittest.mock import patch
+import dask
+from src.services.worker_pool import WorkerPool
+
+
+class TestWorkerPool(unittest.TestCase):
+
+    def setUp(self):
+        self.worker_pool = WorkerPool(1, max_tasks_per_child=1)
+        self.addCleanup(self.worker_pool.close)
+
+    def test_get_reuses_pool(self):
+        pool = self.worker_pool.get()
+        self.assertIs(self.worker_pool.get(), pool)
+        self.assertEqual(pool.apply(abs, (-3,)), 3)
+
+    def test_workers_are_recycled(self):
+        pool = self.worker_pool.get()
+        first = pool.apply(os.getpid)
+        second = pool.apply(os.getpid)
+        self.assertNotEqual(first, second)
+
+    def test_dask_compute_on_pool(self):
+        result = dask.delayed(sum)([1, 2, 3]).compute(scheduler='multiprocessing', pool=self.worker_pool.get())
+        self.assertEqual(result, 6)
+
+    def test_close(self):
+        self.worker_pool.get()
+        self.worker_pool.close()
+        self.assertIsNone(self.worker_pool._pool)
+        # closing twice is a no-op
+        self.worker_pool.close()
+
+    @patch('src.services.worker_pool.multiprocessing.get_all_start_methods')
+    def test_falls_back_to_spawn(self, mock_start_methods):
+        mock_start_methods.return_value = ['spawn']
+        self.assertEqual(WorkerPool(1).start_method, 'spawn')
+        self.assertIsNone(WorkerPool(1, max_tasks_per_child=0).max_tasks_per_child)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -13,8 +13,25 @@ class TestConfig(unittest.TestCase):
         self.assertEqual(config.incoming_topic_subscription, '')
         self.assertEqual(config.outgoing_topic_name, '')
         self.assertEqual(config.storage_container_name, 'osw')
+        self.assertEqual(config.storage_chunk_size, 8 * 1024 * 1024)
+        self.assertEqual(config.storage_max_concurrency, 4)
+        self.assertEqual(config.dataset_cache_max_bytes, 10 * 1024 * 1024 * 1024)
         self.assertEqual(config.max_concurrent_messages, 1)
         self.assertEqual(config.partition_count, 2)
+        self.assertEqual(config.ixn_topology, 'geometry')
+        self.assertEqual(config.worker_pool_size, 2)
+        self.assertEqual(config.worker_max_tasks, 100)
+        self.assertEqual(config.road_network_extract, '')
+        self.assertEqual(config.ixn_tiler, 'osmnx')
+        self.assertEqual(config.ixn_tile_size, 200)
+        self.assertEqual(config.ixn_max_tile_cost, 0)
+        self.assertEqual(config.ixn_ingest, 'memory')
+        self.assertEqual(config.ixn_chunk_size, 10000)
+        self.assertEqual(config.output_format, 'geojson')
+        self.assertEqual(config.output_compression, 'deflate')
+        self.assertEqual(config.output_compression_level, 6)
+        self.assertTrue(config.tile_result_cache)
+        self.assertEqual(config.tile_result_max_entries, 1000000)
 
     def test_algorithm_dictionary(self):
         config = Config()
@@ -30,6 +47,30 @@ class TestConfig(unittest.TestCase):
         download_folder = config.get_download_folder()
         self.assertEqual(download_folder, '/mock/root/downloads')
 
+    @patch('src.config.os.path.dirname')
+    def test_get_dataset_cache_folder(self, mock_dirname):
+        mock_dirname.side_effect = lambda path: '/mock/root'
+        config = Config()
+        self.assertEqual(config.get_dataset_cache_folder(), '/mock/root/cache/datasets')
+        config.dataset_cache_dir = '/data/datasets'
+        self.assertEqual(config.get_dataset_cache_folder(), '/data/datasets')
+
+    @patch('src.config.os.path.dirname')
+    def test_get_road_network_cache_folder(self, mock_dirname):
+        mock_dirname.side_effect = lambda path: '/mock/root'
+        config = Config()
+        self.assertEqual(config.get_road_network_cache_folder(), '/mock/root/cache/road_networks')
+        config.road_network_cache_dir = '/data/networks'
+        self.assertEqual(config.get_road_network_cache_folder(), '/data/networks')
+
+    @patch('src.config.os.path.dirname')
+    def test_get_tile_result_store_path(self, mock_dirname):
+        mock_dirname.side_effect = lambda path: '/mock/root'
+        config = Config()
+        self.assertEqual(config.get_tile_result_store_path(), '/mock/root/cache/tile_results.sqlite')
+        config.tile_result_store = '/data/tile_results.sqlite'
+        self.assertEqual(config.get_tile_result_store_path(), '/data/tile_results.sqlite')
+
     @patch('src.config.os.path.dirname')
     def test_get_assets_folder(self, mock_dirname):
         mock_dirname.side_effect = lambda path: '/mock/root/src'
@@ -43,7 +84,19 @@ class TestConfig(unittest.TestCase):
         'QUALITY_RES_TOPIC': 'test_outgoing_topic',
         'CONTAINER_NAME': 'test_container',
         'MAX_CONCURRENT_MESSAGES': '5',
-        'PARTITION_COUNT': '10'
+        'PARTITION_COUNT': '10',
+        'WORKER_POOL_SIZE': '4',
+        'WORKER_MAX_TASKS': '20',
+        'TILE_RESULT_CACHE': 'false',
+        'TILE_RESULT_MAX_ENTRIES': '5000',
+        'IXN_INGEST': 'stream',
+        'IXN_CHUNK_SIZE': '2000',
+        'OUTPUT_FORMAT': 'geoparquet',
+        'OUTPUT_COMPRESSION': 'stored',
+        'OUTPUT_COMPRESSION_LEVEL': '1',
+        'STORAGE_CHUNK_SIZE': '1048576',
+        'STORAGE_MAX_CONCURRENCY': '8',
+        'DATASET_CACHE_MAX_BYTES': '0'
     })
     def test_environment_variable_overrides(self):
         config = Config()
@@ -53,6 +106,18 @@ class TestConfig(unittest.TestCase):
         self.assertEqual(config.storage_container_name, 'osw')
         self.assertEqual(config.max_concurrent_messages, 5)  # Casts to int
         self.assertEqual(config.partition_count, 10)  # Casts to int
+        self.assertEqual(config.worker_pool_size, 4)
+        self.assertEqual(config.worker_max_tasks, 20)
+        self.assertFalse(config.tile_result_cache)
+        self.assertEqual(config.tile_result_max_entries, 5000)
+        self.assertEqual(config.ixn_ingest, 'stream')
+        self.assertEqual(config.ixn_chunk_size, 2000)
+        self.assertEqual(config.output_format, 'geoparquet')
+        self.assertEqual(config.output_compression, 'stored')
+        self.assertEqual(config.output_compression_level, 1)
+        self.assertEqual(config.storage_chunk_size, 1048576)
+        self.assertEqual(config.storage_max_concurrency, 8)
+        self.assertEqual(config.dataset_cache_max_bytes, 0)
 
 
 if __name__ == '__main__':